@@ -797,6 +797,19 @@ class PropertyMapping(SerializerModel, ManagedModel):
         verbose_name_plural = _("Property Mappings")
 
 
+class AuthenticatedSessionQuerySet(QuerySet):
+    """QuerySet for AuthenticatedSessions, which notifies receivers of
+    `authenticated_sessions_deleted` of all sessions deleted at once"""
+
+    def delete(self):
+        from authentik.core.signals import authenticated_sessions_deleted
+
+        session_keys = list(self.values_list("session_key", flat=True))
+        result = super().delete()
+        authenticated_sessions_deleted.send(sender=AuthenticatedSession, session_keys=session_keys)
+        return result
+
+
 class AuthenticatedSession(ExpiringModel):
     """Additional session class for authenticated users. Augments the standard django session
     to achieve the following:
@@ -815,6 +828,8 @@ class AuthenticatedSession(ExpiringModel):
     last_user_agent = models.TextField(blank=True)
     last_used = models.DateTimeField(auto_now=True)
 
+    objects = AuthenticatedSessionQuerySet.as_manager()
+
     class Meta:
         verbose_name = _("Authenticated Session")
         verbose_name_plural = _("Authenticated Sessions")
@@ -822,6 +837,15 @@ class AuthenticatedSession(ExpiringModel):
     def __str__(self) -> str:
         return f"Authenticated Session {self.session_key[:10]}"
 
+    def delete(self, *args, **kwargs):
+        from authentik.core.signals import authenticated_sessions_deleted
+
+        result = super().delete(*args, **kwargs)
+        authenticated_sessions_deleted.send(
+            sender=AuthenticatedSession, session_keys=[self.session_key]
+        )
+        return result
+
     @staticmethod
     def from_request(request: HttpRequest, user: User) -> Optional["AuthenticatedSession"]:
         """Create a new session from a http request"""
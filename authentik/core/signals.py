@@ -23,6 +23,8 @@ from authentik.core.models import (
 password_changed = Signal()
 # Arguments: credentials: dict[str, any], request: HttpRequest, stage: Stage
 login_failed = Signal()
+# Sent with the session keys of AuthenticatedSessions after they've been deleted
+authenticated_sessions_deleted = Signal()
 
 LOGGER = get_logger()
 
@@ -34,13 +34,16 @@ def clean_expired_models(self: SystemTask):
             cls.objects.all().exclude(expiring=False).exclude(expiring=True, expires__gt=now())
         )
         amount = objects.count()
-        for obj in objects:
-            obj.expire_action()
+        if cls.expire_action is ExpiringModel.expire_action:
+            # The default expire action only deletes the object, which can be done in bulk
+            objects.delete()
+        else:
+            for obj in objects:
+                obj.expire_action()
         LOGGER.debug("Expired models", model=cls, amount=amount)
         messages.append(f"Expired {amount} {cls._meta.verbose_name_plural}")
     # Special case
-    amount = 0
-
+    expired = []
     for session in AuthenticatedSession.objects.all():
         match CONFIG.get("session_storage", "cache"):
             case "cache":
@@ -52,21 +55,22 @@ def clean_expired_models(self: SystemTask):
                 except Exception as exc:
                     LOGGER.debug("Failed to get session from cache", exc=exc)
                 if not value:
-                    session.delete()
-                    amount += 1
+                    expired.append(session.pk)
             case "db":
                 if not (
                     DBSessionStore.get_model_class()
                     .objects.filter(session_key=session.session_key, expire_date__gt=now())
                     .exists()
                 ):
-                    session.delete()
-                    amount += 1
+                    expired.append(session.pk)
             case _:
                 # Should never happen, as we check for other values in authentik/root/settings.py
                 raise ImproperlyConfigured(
                     "Invalid session_storage setting, allowed values are db and cache"
                 )
+    # Delete all expired sessions at once, so tokens issued in them are revoked in bulk
+    AuthenticatedSession.objects.filter(pk__in=expired).delete()
+    amount = len(expired)
     LOGGER.debug("Expired sessions", model=AuthenticatedSession, amount=amount)
 
     messages.append(f"Expired {amount} {AuthenticatedSession._meta.verbose_name_plural}")
@@ -1,22 +1,36 @@
+from time import sleep
+from typing import Any
+
 from django.db.models import Model
 from django.http import HttpResponseBadRequest, HttpResponseNotFound
 from google.auth.exceptions import GoogleAuthError, TransportError
 from googleapiclient.discovery import build
 from googleapiclient.errors import Error, HttpError
-from googleapiclient.http import HttpRequest
+from googleapiclient.http import MAX_BATCH_LIMIT, HttpRequest
 from httplib2 import HttpLib2Error, HttpLib2ErrorWithResponse
 
 from authentik.enterprise.providers.google_workspace.models import GoogleWorkspaceProvider
-from authentik.lib.sync.outgoing import HTTP_CONFLICT
+from authentik.lib.sync.outgoing import (
+    HTTP_CONFLICT,
+    HTTP_SERVICE_UNAVAILABLE,
+    HTTP_TOO_MANY_REQUESTS,
+)
 from authentik.lib.sync.outgoing.base import BaseOutgoingSyncClient
+from authentik.lib.sync.outgoing.discovery import get_discovered
 from authentik.lib.sync.outgoing.exceptions import (
     BadRequestSyncException,
+    BaseSyncException,
     NotFoundSyncException,
     ObjectExistsSyncException,
     StopSync,
     TransientSyncException,
 )
 
+# How often calls that were rate limited are retried within a batch request before giving up
+BATCH_RETRIES = 3
+# Seconds to wait before retrying rate limited calls, doubled with every retry
+BATCH_BACKOFF = 1
+
 
 class GoogleWorkspaceSyncClient[TModel: Model, TConnection: Model, TSchema: dict](
     BaseOutgoingSyncClient[TModel, TConnection, TSchema, GoogleWorkspaceProvider]
@@ -24,6 +38,7 @@ class GoogleWorkspaceSyncClient[TModel: Model, TConnection: Model, TSchema: dict
     """Base client for syncing to google workspace"""
 
     domains: list
+    can_request_many = True
 
     def __init__(self, provider: GoogleWorkspaceProvider) -> None:
         super().__init__(provider)
@@ -33,40 +48,114 @@ class GoogleWorkspaceSyncClient[TModel: Model, TConnection: Model, TSchema: dict
             cache_discovery=False,
             **provider.google_credentials(),
         )
+        # Number of calls per batch request, reduced when Google starts rate limiting us
+        self._batch_size = MAX_BATCH_LIMIT
         self.__prefetch_domains()
 
     def __prefetch_domains(self):
-        self.domains = []
-        domains = self._request(self.directory_service.domains().list(customer="my_customer"))
-        for domain in domains.get("domains", []):
+        self.domains = get_discovered(self.provider, "domains", self.__fetch_domains)
+
+    def __fetch_domains(self) -> list[str]:
+        domains = []
+        response = self._request(self.directory_service.domains().list(customer="my_customer"))
+        for domain in response.get("domains", []):
             domain_name = domain.get("domainName")
-            self.domains.append(domain_name)
+            domains.append(domain_name)
+        return domains
 
     def _request(self, request: HttpRequest):
         try:
             response = request.execute()
-        except GoogleAuthError as exc:
-            if isinstance(exc, TransportError):
-                raise TransientSyncException(f"Failed to send request: {str(exc)}") from exc
-            raise StopSync(exc) from exc
-        except HttpLib2Error as exc:
-            if isinstance(exc, HttpLib2ErrorWithResponse):
-                self._response_handle_status_code(request.body, exc.response.status, exc)
-            raise TransientSyncException(f"Failed to send request: {str(exc)}") from exc
-        except HttpError as exc:
-            self._response_handle_status_code(request.body, exc.status_code, exc)
-            raise TransientSyncException(f"Failed to send request: {str(exc)}") from exc
-        except Error as exc:
-            raise TransientSyncException(f"Failed to send request: {str(exc)}") from exc
+        except (GoogleAuthError, HttpLib2Error, Error) as exc:
+            raise self._convert_exception(request, exc) from exc
         return response
 
-    def _response_handle_status_code(self, request: dict, status_code: int, root_exc: Exception):
+    def _convert_exception(self, request: HttpRequest, exc: Exception) -> BaseSyncException:
+        """Convert an exception raised by the Google API client to a sync exception"""
+        if isinstance(exc, GoogleAuthError):
+            if isinstance(exc, TransportError):
+                return TransientSyncException(f"Failed to send request: {str(exc)}")
+            return StopSync(exc)
+        status_code = self._status_code(exc)
         if status_code == HttpResponseNotFound.status_code:
-            raise NotFoundSyncException("Object not found") from root_exc
+            return NotFoundSyncException("Object not found")
         if status_code == HTTP_CONFLICT:
-            raise ObjectExistsSyncException("Object exists") from root_exc
+            return ObjectExistsSyncException("Object exists")
         if status_code == HttpResponseBadRequest.status_code:
-            raise BadRequestSyncException("Bad request", request) from root_exc
+            return BadRequestSyncException("Bad request", request.body)
+        return TransientSyncException(f"Failed to send request: {str(exc)}")
+
+    def _status_code(self, exc: Exception) -> int | None:
+        if isinstance(exc, HttpLib2ErrorWithResponse):
+            return exc.response.status
+        if isinstance(exc, HttpError):
+            return exc.status_code
+        return None
+
+    def request_many(self, *requests: HttpRequest) -> list[Any | BaseSyncException]:
+        """Send multiple requests combined into batch requests, returning either the response
+        or the exception of each request. Calls which are rate limited are retried with
+        an exponential backoff, and the size of following batches is reduced"""
+        results: list[Any | BaseSyncException] = [None] * len(requests)
+        pending = list(range(len(requests)))
+        for attempt in range(BATCH_RETRIES + 1):
+            if attempt > 0:
+                sleep(BATCH_BACKOFF * 2 ** (attempt - 1))
+            rate_limited = []
+            for offset in range(0, len(pending), self._batch_size):
+                chunk = pending[offset : offset + self._batch_size]
+                responses = self._execute_batch([requests[idx] for idx in chunk])
+                for idx, response in zip(chunk, responses, strict=True):
+                    if not isinstance(response, Exception):
+                        results[idx] = response
+                        continue
+                    if self._status_code(response) in [
+                        HTTP_TOO_MANY_REQUESTS,
+                        HTTP_SERVICE_UNAVAILABLE,
+                    ]:
+                        rate_limited.append(idx)
+                    results[idx] = self._convert_exception(requests[idx], response)
+            if not rate_limited:
+                break
+            self.logger.info(
+                "Rate limited by Google, backing off", calls=len(rate_limited), attempt=attempt
+            )
+            self._batch_size = max(self._batch_size // 2, 1)
+            pending = rate_limited
+        return results
+
+    def _execute_batch(self, requests: list[HttpRequest]) -> list[Any | Exception]:
+        """Send requests in a single batch request, returning either the response or the
+        exception raised by the Google API client for each request"""
+        if len(requests) == 1:
+            # Not worth the overhead of a batch request
+            try:
+                return [requests[0].execute()]
+            except (GoogleAuthError, HttpLib2Error, Error) as exc:
+                return [exc]
+        results: dict[str, Any] = {}
+
+        def callback(request_id: str, response: Any, exception: HttpError | None):
+            results[request_id] = exception or response
+
+        batch = self.directory_service.new_batch_http_request(callback=callback)
+        for idx, request in enumerate(requests):
+            batch.add(request, request_id=str(idx))
+        try:
+            batch.execute()
+        except (GoogleAuthError, HttpLib2Error, Error) as exc:
+            return [exc] * len(requests)
+        return [results.get(str(idx)) for idx in range(len(requests))]
+
+    def google_id(self, response: dict) -> str:
+        """Get the ID of the object created by `create_request` from its response"""
+        raise NotImplementedError()
+
+    def connection_fields(self, response: dict) -> dict[str, Any]:
+        return {"google_id": self.google_id(response), "attributes": response}
+
+    def update_connection(self, connection: TConnection, response: dict):
+        connection.attributes = response
 
     def check_email_valid(self, *emails: str):
         for email in emails:
@@ -10,11 +10,10 @@ from authentik.enterprise.providers.google_workspace.models import (
     GoogleWorkspaceProviderUser,
 )
 from authentik.lib.sync.mapper import PropertyMappingManager
-from authentik.lib.sync.outgoing.base import Direction
+from authentik.lib.sync.outgoing.base import Direction, group_member_pks
 from authentik.lib.sync.outgoing.exceptions import (
     NotFoundSyncException,
     ObjectExistsSyncException,
-    TransientSyncException,
 )
 from authentik.lib.sync.outgoing.models import OutgoingSyncDeleteAction
 
@@ -59,13 +58,30 @@ class GoogleWorkspaceGroupClient(
                 )
             google_group.delete()
 
-    def create(self, group: Group):
+    def check_schema(self, schema: dict):
+        self.check_email_valid(schema["email"])
+
+    def create_request(self, schema: dict):
+        return self.directory_service.groups().insert(body=schema)
+
+    def update_request(self, schema: dict, connection: GoogleWorkspaceProviderGroup):
+        return self.directory_service.groups().update(
+            groupKey=connection.google_id,
+            body=schema,
+        )
+
+    def google_id(self, response: dict) -> str:
+        return response["id"]
+
+    def written(self, obj: Group, connection: GoogleWorkspaceProviderGroup):
+        self.create_sync_members(obj, connection)
+
+    def create(self, group: Group, google_group: dict):
         """Create group from scratch and create a connection object"""
-        google_group = self.to_schema(group, None)
-        self.check_email_valid(google_group["email"])
+        self.check_schema(google_group)
         with transaction.atomic():
             try:
-                response = self._request(self.directory_service.groups().insert(body=google_group))
+                response = self._request(self.create_request(google_group))
             except ObjectExistsSyncException:
                 # group already exists in google workspace, so we can connect them manually
                 # for groups we need to fetch the group from google as we connect on
@@ -87,17 +103,11 @@ class GoogleWorkspaceGroupClient(
                     attributes=response,
                 )
 
-    def update(self, group: Group, connection: GoogleWorkspaceProviderGroup):
+    def update(self, group: Group, connection: GoogleWorkspaceProviderGroup, google_group: dict):
         """Update existing group"""
-        google_group = self.to_schema(group, connection)
-        self.check_email_valid(google_group["email"])
+        self.check_schema(google_group)
         try:
-            response = self._request(
-                self.directory_service.groups().update(
-                    groupKey=connection.google_id,
-                    body=google_group,
-                )
-            )
+            response = self._request(self.update_request(google_group, connection))
             connection.attributes = response
             connection.save()
         except NotFoundSyncException:
@@ -111,7 +121,7 @@ class GoogleWorkspaceGroupClient(
 
     def create_sync_members(self, obj: Group, google_group: GoogleWorkspaceProviderGroup):
         """Sync all members after a group was created"""
-        users = list(obj.users.order_by("id").values_list("id", flat=True))
+        users = group_member_pks(obj)
         connections = GoogleWorkspaceProviderUser.objects.filter(
             provider=self.provider, user__pk__in=users
         ).values_list("google_id", flat=True)
@@ -125,24 +135,26 @@ class GoogleWorkspaceGroupClient(
             return self._patch_remove_users(group, users_set)
 
     def _patch(self, google_group_id: str, direction: Direction, members: list[str]):
+        """Add or remove members, combining the calls for all members into batch requests"""
+        requests = []
         for user in members:
-            try:
-                if direction == Direction.add:
-                    self._request(
-                        self.directory_service.members().insert(
-                            groupKey=google_group_id, body={"email": user}
-                        )
+            if direction == Direction.add:
+                requests.append(
+                    self.directory_service.members().insert(
+                        groupKey=google_group_id, body={"email": user}
                     )
-                if direction == Direction.remove:
-                    self._request(
-                        self.directory_service.members().delete(
-                            groupKey=google_group_id, memberKey=user
-                        )
+                )
+            if direction == Direction.remove:
+                requests.append(
+                    self.directory_service.members().delete(
+                        groupKey=google_group_id, memberKey=user
                     )
-            except ObjectExistsSyncException:
-                pass
-            except TransientSyncException:
-                raise
+                )
+        for result in self.request_many(*requests):
+            if isinstance(result, ObjectExistsSyncException):
+                continue
+            if isinstance(result, Exception):
+                raise result
 
     def _patch_add_users(self, group: Group, users_set: set[int]):
         """Add users in users_set to group"""
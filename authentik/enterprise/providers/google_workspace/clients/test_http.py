@@ -1,7 +1,10 @@
+from email.parser import Parser
 from json import dumps
 
 from httplib2 import Response
 
+BATCH_URI = "https://admin.googleapis.com/batch"
+
 
 class MockHTTP:
 
@@ -35,7 +38,39 @@ class MockHTTP:
     ):
         key = (uri, method.upper())
         self._recorded_requests.append((uri, method, body, headers))
+        if key == (BATCH_URI, "POST") and key not in self._responses:
+            return self._batch(body, headers)
         if key not in self._responses and self.raise_on_unrecorded:
             raise AssertionError(key)
         body, meta = self._responses[key]
         return Response(meta), body.encode("utf-8")
+
+    def _batch(self, body: str, headers: dict):
+        """Answer each call of a batch request with its recorded response"""
+        message = Parser().parsestr(f"content-type: {headers['content-type']}\r\n\r\n{body}")
+        boundary = "batch_response"
+        parts = []
+        for part in message.get_payload():
+            request_line, raw_request = part.get_payload().split("\n", 1)
+            method, path, _ = request_line.split(" ", 2)
+            request = Parser().parsestr(raw_request)
+            response, content = self.request(
+                f"https://{request['host']}{path}",
+                method=method,
+                body=request.get_payload() or None,
+                headers=dict(request.items()),
+            )
+            content_id = part["Content-ID"].replace("<", "<response-", 1)
+            parts.append(
+                f"--{boundary}\r\n"
+                "Content-Type: application/http\r\n"
+                f"Content-ID: {content_id}\r\n\r\n"
+                f"HTTP/1.1 {response.status} {response.reason}\r\n"
+                "Content-Type: application/json\r\n\r\n"
+                f"{content.decode('utf-8')}\r\n"
+            )
+        parts.append(f"--{boundary}--")
+        return (
+            Response({"status": "200", "content-type": f"multipart/mixed; boundary={boundary}"}),
+            "".join(parts).encode("utf-8"),
+        )
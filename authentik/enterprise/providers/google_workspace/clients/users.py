@@ -58,15 +58,26 @@ class GoogleWorkspaceUserClient(GoogleWorkspaceSyncClient[User, GoogleWorkspaceP
             google_user.delete()
         return response
 
-    def create(self, user: User):
-        """Create user from scratch and create a connection object"""
-        google_user = self.to_schema(user, None)
+    def check_schema(self, schema: dict):
         self.check_email_valid(
-            google_user["primaryEmail"], *[x["address"] for x in google_user.get("emails", [])]
+            schema["primaryEmail"], *[x["address"] for x in schema.get("emails", [])]
         )
+
+    def create_request(self, schema: dict):
+        return self.directory_service.users().insert(body=schema)
+
+    def update_request(self, schema: dict, connection: GoogleWorkspaceProviderUser):
+        return self.directory_service.users().update(userKey=connection.google_id, body=schema)
+
+    def google_id(self, response: dict) -> str:
+        return response["primaryEmail"]
+
+    def create(self, user: User, google_user: dict):
+        """Create user from scratch and create a connection object"""
+        self.check_schema(google_user)
         with transaction.atomic():
             try:
-                response = self._request(self.directory_service.users().insert(body=google_user))
+                response = self._request(self.create_request(google_user))
             except ObjectExistsSyncException:
                 # user already exists in google workspace, so we can connect them manually
                 return GoogleWorkspaceProviderUser.objects.create(
@@ -82,15 +93,10 @@ class GoogleWorkspaceUserClient(GoogleWorkspaceSyncClient[User, GoogleWorkspaceP
                     attributes=response,
                 )
 
-    def update(self, user: User, connection: GoogleWorkspaceProviderUser):
+    def update(self, user: User, connection: GoogleWorkspaceProviderUser, google_user: dict):
         """Update existing user"""
-        google_user = self.to_schema(user, connection)
-        self.check_email_valid(
-            google_user["primaryEmail"], *[x["address"] for x in google_user.get("emails", [])]
-        )
-        response = self._request(
-            self.directory_service.users().update(userKey=connection.google_id, body=google_user)
-        )
+        self.check_schema(google_user)
+        response = self._request(self.update_request(google_user, connection))
         connection.attributes = response
         connection.save()
 
@@ -0,0 +1,21 @@
+# Generated by Django 5.0.7 on 2024-07-25 09:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        (
+            "authentik_providers_google_workspace",
+            "0004_googleworkspaceprovidergroup_sync_hash_and_more",
+        ),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="googleworkspaceprovider",
+            name="sync_checkpoint",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
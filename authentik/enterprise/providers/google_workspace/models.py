@@ -39,6 +39,8 @@ class GoogleWorkspaceProviderUser(SerializerModel):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     provider = models.ForeignKey("GoogleWorkspaceProvider", on_delete=models.CASCADE)
     attributes = models.JSONField(default=dict)
+    # Hash of the data last written to the remote system
+    sync_hash = models.TextField(null=True, default=None)
 
     @property
     def serializer(self) -> type[Serializer]:
@@ -65,6 +67,8 @@ class GoogleWorkspaceProviderGroup(SerializerModel):
     group = models.ForeignKey(Group, on_delete=models.CASCADE)
     provider = models.ForeignKey("GoogleWorkspaceProvider", on_delete=models.CASCADE)
     attributes = models.JSONField(default=dict)
+    # Hash of the data last written to the remote system
+    sync_hash = models.TextField(null=True, default=None)
 
     @property
     def serializer(self) -> type[Serializer]:
@@ -110,6 +114,9 @@ class GoogleWorkspaceProvider(OutgoingSyncProvider, BackchannelProvider):
         help_text=_("Property mappings used for group creation/updating."),
     )
 
+    # The Google Workspace API has strict per-user rate limits
+    default_sync_page_concurrency = 2
+
     def client_for_model(
         self,
         model: type[User | Group | GoogleWorkspaceProviderUser | GoogleWorkspaceProviderGroup],
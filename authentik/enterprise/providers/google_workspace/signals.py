@@ -4,6 +4,7 @@ from authentik.enterprise.providers.google_workspace.models import GoogleWorkspa
 from authentik.enterprise.providers.google_workspace.tasks import (
     google_workspace_sync,
     google_workspace_sync_direct,
+    google_workspace_sync_journal,
     google_workspace_sync_m2m,
 )
 from authentik.lib.sync.outgoing.signals import register_signals
@@ -13,4 +14,5 @@ register_signals(
     task_sync_single=google_workspace_sync,
     task_sync_direct=google_workspace_sync_direct,
     task_sync_m2m=google_workspace_sync_m2m,
+    task_sync_journal=google_workspace_sync_journal,
 )
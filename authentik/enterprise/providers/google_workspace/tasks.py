@@ -35,3 +35,10 @@ def google_workspace_sync_direct(*args, **kwargs):
 @CELERY_APP.task(autoretry_for=(TransientSyncException,), retry_backoff=True)
 def google_workspace_sync_m2m(*args, **kwargs):
     return sync_tasks.sync_signal_m2m(*args, **kwargs)
+
+
+@CELERY_APP.task()
+def google_workspace_sync_journal(window: int):
+    return sync_tasks.sync_signal_journal(
+        window, google_workspace_sync_direct, google_workspace_sync_m2m
+    )
@@ -7,6 +7,9 @@ from django.test import TestCase
 from authentik.blueprints.tests import apply_blueprint
 from authentik.core.models import Application, Group, User
 from authentik.core.tests.utils import create_test_user
+from authentik.enterprise.providers.google_workspace.clients.groups import (
+    GoogleWorkspaceGroupClient,
+)
 from authentik.enterprise.providers.google_workspace.clients.test_http import MockHTTP
 from authentik.enterprise.providers.google_workspace.models import (
     GoogleWorkspaceProvider,
@@ -16,6 +19,7 @@ from authentik.enterprise.providers.google_workspace.models import (
 from authentik.enterprise.providers.google_workspace.tasks import google_workspace_sync
 from authentik.events.models import Event, EventAction
 from authentik.lib.generators import generate_id
+from authentik.lib.sync.outgoing.exceptions import TransientSyncException
 from authentik.lib.sync.outgoing.models import OutgoingSyncDeleteAction
 from authentik.lib.tests.utils import load_fixture
 from authentik.tenants.models import Tenant
@@ -135,7 +139,7 @@ class GoogleWorkspaceGroupTests(TestCase):
             group.name = "new name"
             group.save()
             self.assertFalse(Event.objects.filter(action=EventAction.SYSTEM_EXCEPTION).exists())
-            self.assertEqual(len(http.requests()), 4)
+            self.assertEqual(len(http.requests()), 3)
 
     def test_group_create_delete(self):
         """Test group deletion"""
@@ -167,7 +171,7 @@ class GoogleWorkspaceGroupTests(TestCase):
 
             group.delete()
             self.assertFalse(Event.objects.filter(action=EventAction.SYSTEM_EXCEPTION).exists())
-            self.assertEqual(len(http.requests()), 4)
+            self.assertEqual(len(http.requests()), 3)
 
     def test_group_create_member_add(self):
         """Test group creation"""
@@ -209,7 +213,7 @@ class GoogleWorkspaceGroupTests(TestCase):
             ).first()
             self.assertIsNotNone(google_group)
             self.assertFalse(Event.objects.filter(action=EventAction.SYSTEM_EXCEPTION).exists())
-            self.assertEqual(len(http.requests()), 8)
+            self.assertEqual(len(http.requests()), 5)
 
     def test_group_create_member_remove(self):
         """Test group creation"""
@@ -257,7 +261,7 @@ class GoogleWorkspaceGroupTests(TestCase):
             group.users.remove(user)
 
             self.assertFalse(Event.objects.filter(action=EventAction.SYSTEM_EXCEPTION).exists())
-            self.assertEqual(len(http.requests()), 10)
+            self.assertEqual(len(http.requests()), 6)
 
     def test_group_create_delete_do_nothing(self):
         """Test group deletion (delete action = do nothing)"""
@@ -285,7 +289,7 @@ class GoogleWorkspaceGroupTests(TestCase):
             self.assertIsNotNone(google_group)
 
             group.delete()
-            self.assertEqual(len(http.requests()), 3)
+            self.assertEqual(len(http.requests()), 2)
             self.assertFalse(
                 GoogleWorkspaceProviderGroup.objects.filter(
                     provider=self.provider, group__name=uid
@@ -331,4 +335,38 @@ class GoogleWorkspaceGroupTests(TestCase):
                 ).exists()
             )
             self.assertFalse(Event.objects.filter(action=EventAction.SYSTEM_EXCEPTION).exists())
-            self.assertEqual(len(http.requests()), 5)
+            self.assertEqual(len(http.requests()), 4)
+
+    def test_write_many_written_error(self):
+        """Test that an error after a group has been written only fails that group"""
+        http = MockHTTP()
+        http.add_response(
+            f"https://admin.googleapis.com/admin/directory/v1/customer/my_customer/domains?key={self.api_key}&alt=json",
+            domains_list_v1_mock,
+        )
+        http.add_response(
+            f"https://admin.googleapis.com/admin/directory/v1/groups?key={self.api_key}&alt=json",
+            method="POST",
+            body={"id": generate_id()},
+        )
+        self.app.backchannel_providers.remove(self.provider)
+        groups = [Group.objects.create(name=generate_id()) for _ in range(2)]
+        self.app.backchannel_providers.add(self.provider)
+        with (
+            patch(
+                "authentik.enterprise.providers.google_workspace.models.GoogleWorkspaceProvider.google_credentials",
+                MagicMock(return_value={"developerKey": self.api_key, "http": http}),
+            ),
+            patch.object(
+                GoogleWorkspaceGroupClient,
+                "written",
+                MagicMock(side_effect=[TransientSyncException("Failed to add members"), None]),
+            ),
+        ):
+            client = GoogleWorkspaceGroupClient(self.provider)
+            results = dict(client.write_many(groups))
+        self.assertIsInstance(results[groups[0]], TransientSyncException)
+        self.assertIsNone(results[groups[1]])
+        self.assertEqual(
+            GoogleWorkspaceProviderGroup.objects.filter(provider=self.provider).count(), 2
+        )
@@ -7,7 +7,8 @@ from django.test import TestCase
 
 from authentik.blueprints.tests import apply_blueprint
 from authentik.core.models import Application, Group, User
-from authentik.enterprise.providers.google_workspace.clients.test_http import MockHTTP
+from authentik.enterprise.providers.google_workspace.clients.test_http import BATCH_URI, MockHTTP
+from authentik.enterprise.providers.google_workspace.clients.users import GoogleWorkspaceUserClient
 from authentik.enterprise.providers.google_workspace.models import (
     GoogleWorkspaceProvider,
     GoogleWorkspaceProviderMapping,
@@ -15,6 +16,7 @@ from authentik.enterprise.providers.google_workspace.models import (
 )
 from authentik.enterprise.providers.google_workspace.tasks import google_workspace_sync
 from authentik.events.models import Event, EventAction
+from authentik.lib.config import CONFIG
 from authentik.lib.generators import generate_id
 from authentik.lib.sync.outgoing.models import OutgoingSyncDeleteAction
 from authentik.lib.tests.utils import load_fixture
@@ -146,7 +148,7 @@ class GoogleWorkspaceUserTests(TestCase):
             user.name = "new name"
             user.save()
             self.assertFalse(Event.objects.filter(action=EventAction.SYSTEM_EXCEPTION).exists())
-            self.assertEqual(len(http.requests()), 4)
+            self.assertEqual(len(http.requests()), 3)
 
     def test_user_create_delete(self):
         """Test user deletion"""
@@ -181,7 +183,7 @@ class GoogleWorkspaceUserTests(TestCase):
 
             user.delete()
             self.assertFalse(Event.objects.filter(action=EventAction.SYSTEM_EXCEPTION).exists())
-            self.assertEqual(len(http.requests()), 4)
+            self.assertEqual(len(http.requests()), 3)
 
     def test_user_create_delete_suspend(self):
         """Test user deletion (delete action = Suspend)"""
@@ -218,8 +220,8 @@ class GoogleWorkspaceUserTests(TestCase):
             self.assertIsNotNone(google_user)
 
             user.delete()
-            self.assertEqual(len(http.requests()), 4)
-            _, _, body, _ = http.requests()[3]
+            self.assertEqual(len(http.requests()), 3)
+            _, _, body, _ = http.requests()[2]
             self.assertEqual(
                 loads(body),
                 {
@@ -262,13 +264,50 @@ class GoogleWorkspaceUserTests(TestCase):
             self.assertIsNotNone(google_user)
 
             user.delete()
-            self.assertEqual(len(http.requests()), 3)
+            self.assertEqual(len(http.requests()), 2)
             self.assertFalse(
                 GoogleWorkspaceProviderUser.objects.filter(
                     provider=self.provider, user__username=uid
                 ).exists()
             )
 
+    def test_user_write_many(self):
+        """Test writing multiple users in a batch request"""
+        http = MockHTTP()
+        http.add_response(
+            f"https://admin.googleapis.com/admin/directory/v1/customer/my_customer/domains?key={self.api_key}&alt=json",
+            domains_list_v1_mock,
+        )
+        http.add_response(
+            f"https://admin.googleapis.com/admin/directory/v1/users?key={self.api_key}&alt=json",
+            method="POST",
+            body={"primaryEmail": f"{generate_id()}@goauthentik.io"},
+        )
+        self.app.backchannel_providers.remove(self.provider)
+        users = [
+            User.objects.create(username=uid, email=f"{uid}@goauthentik.io")
+            for uid in [generate_id() for _ in range(3)]
+        ]
+        self.app.backchannel_providers.add(self.provider)
+        with patch(
+            "authentik.enterprise.providers.google_workspace.models.GoogleWorkspaceProvider.google_credentials",
+            MagicMock(return_value={"developerKey": self.api_key, "http": http}),
+        ):
+            client = GoogleWorkspaceUserClient(self.provider)
+            self.assertEqual(list(client.write_many(users)), [(user, None) for user in users])
+            self.assertEqual(
+                GoogleWorkspaceProviderUser.objects.filter(
+                    provider=self.provider, user__in=users
+                ).count(),
+                3,
+            )
+            # Domain list, the batch request and the 3 calls within it
+            self.assertEqual(len(http.requests()), 5)
+            self.assertEqual(http.requests()[1][:2], (BATCH_URI, "POST"))
+            # Users which haven't changed since they were written aren't sent again
+            self.assertEqual(list(client.write_many(users)), [(user, None) for user in users])
+            self.assertEqual(len(http.requests()), 5)
+
     def test_sync_task(self):
         """Test user discovery"""
         uid = generate_id()
@@ -309,4 +348,10 @@ class GoogleWorkspaceUserTests(TestCase):
                 ).exists()
             )
             self.assertFalse(Event.objects.filter(action=EventAction.SYSTEM_EXCEPTION).exists())
-            self.assertEqual(len(http.requests()), 5)
+            self.assertEqual(len(http.requests()), 4)
+
+    def test_sync_page_concurrency(self):
+        """Test the default page concurrency of the provider, and overriding it"""
+        self.assertEqual(self.provider.sync_page_concurrency, 2)
+        with CONFIG.patch("outgoing_sync.page_concurrency", 8):
+            self.assertEqual(self.provider.sync_page_concurrency, 8)
@@ -1,6 +1,7 @@
-from asyncio import run
+from asyncio import AbstractEventLoop, Semaphore, gather, new_event_loop
 from collections.abc import Coroutine
 from dataclasses import asdict
+from threading import local
 from typing import Any
 
 from azure.core.exceptions import (
@@ -9,6 +10,8 @@ from azure.core.exceptions import (
     ServiceResponseError,
 )
 from azure.identity.aio import ClientSecretCredential
+from deepmerge import always_merger
+from django.db import connection as db_connection
 from django.db.models import Model
 from django.http import HttpResponseBadRequest, HttpResponseNotFound
 from kiota_abstractions.api_error import APIError
@@ -24,16 +27,25 @@ from msgraph_core import GraphClientFactory
 
 from authentik.enterprise.providers.microsoft_entra.models import MicrosoftEntraProvider
 from authentik.events.utils import sanitize_item
-from authentik.lib.sync.outgoing import HTTP_CONFLICT
+from authentik.lib.sync.outgoing import (
+    HTTP_CONFLICT,
+    HTTP_SERVICE_UNAVAILABLE,
+    HTTP_TOO_MANY_REQUESTS,
+)
 from authentik.lib.sync.outgoing.base import BaseOutgoingSyncClient
+from authentik.lib.sync.outgoing.discovery import get_discovered
 from authentik.lib.sync.outgoing.exceptions import (
     BadRequestSyncException,
+    BaseSyncException,
     NotFoundSyncException,
     ObjectExistsSyncException,
     StopSync,
     TransientSyncException,
 )
 
+# Maximum number of requests sent to the Graph API at the same time
+REQUEST_CONCURRENCY = 8
+
 
 def get_request_adapter(
     credentials: ClientSecretCredential, scopes: list[str] | None = None
@@ -51,12 +63,41 @@ def get_request_adapter(
     )
 
 
+# Graph clients keep their HTTP connections and tokens bound to the event loop they were
+# first used in, so each thread keeps a single event loop and re-uses clients
+_state = local()
+
+
+def get_event_loop() -> AbstractEventLoop:
+    """Get the event loop of the current thread, which is kept open between requests"""
+    loop = getattr(_state, "loop", None)
+    if loop is None or loop.is_closed():
+        loop = _state.loop = new_event_loop()
+    return loop
+
+
+def get_graph_client(provider: MicrosoftEntraProvider, credentials: dict) -> GraphServiceClient:
+    """Get the Graph client of the current thread for `provider`, replacing it if the
+    credentials of the provider have changed"""
+    clients: dict | None = getattr(_state, "clients", None)
+    if clients is None:
+        clients = _state.clients = {}
+    key = (db_connection.schema_name, provider.pk)
+    fingerprint = (provider.tenant_id, provider.client_id, provider.client_secret)
+    cached_fingerprint, client = clients.get(key, (None, None))
+    if cached_fingerprint != fingerprint:
+        client = GraphServiceClient(request_adapter=get_request_adapter(**credentials))
+        clients[key] = (fingerprint, client)
+    return client
+
+
 class MicrosoftEntraSyncClient[TModel: Model, TConnection: Model, TSchema: dict](
     BaseOutgoingSyncClient[TModel, TConnection, TSchema, MicrosoftEntraProvider]
 ):
     """Base client for syncing to microsoft entra"""
 
     domains: list
+    can_request_many = True
 
     def __init__(self, provider: MicrosoftEntraProvider) -> None:
         super().__init__(provider)
@@ -64,44 +105,94 @@ class MicrosoftEntraSyncClient[TModel: Model, TConnection: Model, TSchema: dict]
         self.__prefetch_domains()
 
     @property
-    def client(self):
-        return GraphServiceClient(request_adapter=get_request_adapter(**self.credentials))
+    def client(self) -> GraphServiceClient:
+        return get_graph_client(self.provider, self.credentials)
 
     def _request[T](self, request: Coroutine[Any, Any, T]) -> T:
         try:
-            return run(request)
-        except ClientAuthenticationError as exc:
-            raise StopSync(exc, None, None) from exc
-        except ODataError as exc:
-            raise StopSync(exc, None, None) from exc
-        except (ServiceRequestError, ServiceResponseError) as exc:
-            raise TransientSyncException("Failed to sent request") from exc
+            return get_event_loop().run_until_complete(request)
+        except (ClientAuthenticationError, ServiceRequestError, ServiceResponseError) as exc:
+            raise self._convert_exception(exc) from exc
         except APIError as exc:
-            if exc.response_status_code == HttpResponseNotFound.status_code:
-                raise NotFoundSyncException("Object not found") from exc
-            if exc.response_status_code == HttpResponseBadRequest.status_code:
-                raise BadRequestSyncException("Bad request", exc.response_headers) from exc
-            if exc.response_status_code == HTTP_CONFLICT:
-                raise ObjectExistsSyncException("Object exists", exc.response_headers) from exc
-            raise exc
+            converted = self._convert_exception(exc)
+            if converted is exc:
+                raise
+            raise converted from exc
+
+    def request_many[
+        T
+    ](self, *requests: Coroutine[Any, Any, T]) -> list[T | BaseSyncException | Exception]:
+        """Send multiple requests concurrently, returning either the result or
+        the exception of each request"""
+
+        async def send_all():
+            semaphore = Semaphore(REQUEST_CONCURRENCY)
+
+            async def send(request: Coroutine[Any, Any, T]) -> T:
+                async with semaphore:
+                    return await request
+
+            return await gather(*(send(request) for request in requests), return_exceptions=True)
+
+        return [
+            self._convert_exception(result) if isinstance(result, Exception) else result
+            for result in get_event_loop().run_until_complete(send_all())
+        ]
+
+    def _convert_exception(self, exc: Exception) -> Exception:
+        """Convert an exception raised by the Graph client to a sync exception, or return the
+        exception itself if it isn't known"""
+        if isinstance(exc, ClientAuthenticationError):
+            return StopSync(exc, None, None)
+        if isinstance(exc, ServiceRequestError | ServiceResponseError):
+            return TransientSyncException("Failed to sent request")
+        if not isinstance(exc, APIError):
+            return exc
+        # Requests are retried by the Graph client's retry handler (honouring the Retry-After
+        # header) before they fail, so this only happens when the API is still throttling us
+        if exc.response_status_code in [HTTP_TOO_MANY_REQUESTS, HTTP_SERVICE_UNAVAILABLE]:
+            return TransientSyncException("Rate limited")
+        if isinstance(exc, ODataError):
+            return StopSync(exc, None, None)
+        if exc.response_status_code == HttpResponseNotFound.status_code:
+            return NotFoundSyncException("Object not found")
+        if exc.response_status_code == HttpResponseBadRequest.status_code:
+            return BadRequestSyncException("Bad request", exc.response_headers)
+        if exc.response_status_code == HTTP_CONFLICT:
+            return ObjectExistsSyncException("Object exists", exc.response_headers)
+        return exc
+
+    def connection_fields(self, response: TSchema) -> dict[str, Any]:
+        return {"microsoft_id": response.id, "attributes": self.entity_as_dict(response)}
+
+    def update_connection(self, connection: TConnection, response: TSchema | None):
+        if response:
+            always_merger.merge(connection.attributes, self.entity_as_dict(response))
 
     def __prefetch_domains(self):
-        self.domains = []
+        self.domains = get_discovered(self.provider, "domains", self.__fetch_domains)
+
+    def __fetch_domains(self) -> list[str]:
+        domains = []
         organizations = self._request(self.client.organization.get())
         next_link = True
         while next_link:
             for org in organizations.value:
-                self.domains.extend([x.name for x in org.verified_domains])
+                domains.extend([x.name for x in org.verified_domains])
             next_link = organizations.odata_next_link
             if not next_link:
                 break
             organizations = self._request(self.client.organization.with_url(next_link).get())
+        return domains
 
     def check_email_valid(self, *emails: str):
         for email in emails:
             if not any(email.endswith(f"@{domain_name}") for domain_name in self.domains):
                 raise BadRequestSyncException(f"Invalid email domain: {email}")
 
+    def schema_hash(self, schema: Entity) -> str:
+        return super().schema_hash(self.entity_as_dict(schema))
+
     def entity_as_dict(self, entity: Entity) -> dict:
         """Create a dictionary of a model instance, making sure to remove (known) things
         we can't JSON serialize"""
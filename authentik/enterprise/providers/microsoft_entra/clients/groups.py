@@ -13,12 +13,11 @@ from authentik.enterprise.providers.microsoft_entra.models import (
     MicrosoftEntraProviderUser,
 )
 from authentik.lib.sync.mapper import PropertyMappingManager
-from authentik.lib.sync.outgoing.base import Direction
+from authentik.lib.sync.outgoing.base import Direction, group_member_pks
 from authentik.lib.sync.outgoing.exceptions import (
     NotFoundSyncException,
     ObjectExistsSyncException,
     StopSync,
-    TransientSyncException,
 )
 from authentik.lib.sync.outgoing.models import OutgoingSyncDeleteAction
 
@@ -61,12 +60,21 @@ class MicrosoftEntraGroupClient(
                 self._request(self.client.groups.by_group_id(microsoft_group.microsoft_id).delete())
             microsoft_group.delete()
 
-    def create(self, group: Group):
+    def create_request(self, schema: MSGroup):
+        return self.client.groups.post(schema)
+
+    def update_request(self, schema: MSGroup, connection: MicrosoftEntraProviderGroup):
+        schema.id = connection.microsoft_id
+        return self.client.groups.by_group_id(connection.microsoft_id).patch(schema)
+
+    def written(self, obj: Group, connection: MicrosoftEntraProviderGroup):
+        self.create_sync_members(obj, connection)
+
+    def create(self, group: Group, microsoft_group: MSGroup):
         """Create group from scratch and create a connection object"""
-        microsoft_group = self.to_schema(group, None)
         with transaction.atomic():
             try:
-                response = self._request(self.client.groups.post(microsoft_group))
+                response = self._request(self.create_request(microsoft_group))
             except ObjectExistsSyncException:
                 # group already exists in microsoft entra, so we can connect them manually
                 # for groups we need to fetch the group from microsoft as we connect on
@@ -100,14 +108,12 @@ class MicrosoftEntraGroupClient(
                     attributes=self.entity_as_dict(response),
                 )
 
-    def update(self, group: Group, connection: MicrosoftEntraProviderGroup):
+    def update(
+        self, group: Group, connection: MicrosoftEntraProviderGroup, microsoft_group: MSGroup
+    ):
         """Update existing group"""
-        microsoft_group = self.to_schema(group, connection)
-        microsoft_group.id = connection.microsoft_id
         try:
-            response = self._request(
-                self.client.groups.by_group_id(connection.microsoft_id).patch(microsoft_group)
-            )
+            response = self._request(self.update_request(microsoft_group, connection))
             if response:
                 always_merger.merge(connection.attributes, self.entity_as_dict(response))
                 connection.save()
@@ -122,7 +128,7 @@ class MicrosoftEntraGroupClient(
 
     def create_sync_members(self, obj: Group, microsoft_group: MicrosoftEntraProviderGroup):
         """Sync all members after a group was created"""
-        users = list(obj.users.order_by("id").values_list("id", flat=True))
+        users = group_member_pks(obj)
         connections = MicrosoftEntraProviderUser.objects.filter(
             provider=self.provider, user__pk__in=users
         ).values_list("microsoft_id", flat=True)
@@ -136,27 +142,29 @@ class MicrosoftEntraGroupClient(
             return self._patch_remove_users(group, users_set)
 
     def _patch(self, microsoft_group_id: str, direction: Direction, members: list[str]):
+        """Add or remove members, sending the requests for all members concurrently"""
+        requests = []
         for user in members:
-            try:
-                if direction == Direction.add:
-                    request_body = ReferenceCreate(
-                        odata_id=f"https://graph.microsoft.com/v1.0/directoryObjects/{user}",
-                    )
-                    self._request(
-                        self.client.groups.by_group_id(microsoft_group_id).members.ref.post(
-                            request_body
-                        )
-                    )
-                if direction == Direction.remove:
-                    self._request(
-                        self.client.groups.by_group_id(microsoft_group_id)
-                        .members.by_directory_object_id(user)
-                        .ref.delete()
+            if direction == Direction.add:
+                request_body = ReferenceCreate(
+                    odata_id=f"https://graph.microsoft.com/v1.0/directoryObjects/{user}",
+                )
+                requests.append(
+                    self.client.groups.by_group_id(microsoft_group_id).members.ref.post(
+                        request_body
                     )
-            except ObjectExistsSyncException:
-                pass
-            except TransientSyncException:
-                raise
+                )
+            if direction == Direction.remove:
+                requests.append(
+                    self.client.groups.by_group_id(microsoft_group_id)
+                    .members.by_directory_object_id(user)
+                    .ref.delete()
+                )
+        for result in self.request_many(*requests):
+            if isinstance(result, ObjectExistsSyncException):
+                continue
+            if isinstance(result, Exception):
+                raise result
 
     def _patch_add_users(self, group: Group, users_set: set[int]):
         """Add users in users_set to group"""
@@ -86,13 +86,21 @@ class MicrosoftEntraUserClient(MicrosoftEntraSyncClient[User, MicrosoftEntraProv
             "onPremisesImmutableId",
         ]
 
-    def create(self, user: User):
+    def check_schema(self, schema: MSUser):
+        self.check_email_valid(schema.user_principal_name)
+
+    def create_request(self, schema: MSUser):
+        return self.client.users.post(schema)
+
+    def update_request(self, schema: MSUser, connection: MicrosoftEntraProviderUser):
+        return self.client.users.by_user_id(connection.microsoft_id).patch(schema)
+
+    def create(self, user: User, microsoft_user: MSUser):
         """Create user from scratch and create a connection object"""
-        microsoft_user = self.to_schema(user, None)
-        self.check_email_valid(microsoft_user.user_principal_name)
+        self.check_schema(microsoft_user)
         with transaction.atomic():
             try:
-                response = self._request(self.client.users.post(microsoft_user))
+                response = self._request(self.create_request(microsoft_user))
             except ObjectExistsSyncException:
                 # user already exists in microsoft entra, so we can connect them manually
                 request_configuration = (
@@ -126,13 +134,10 @@ class MicrosoftEntraUserClient(MicrosoftEntraSyncClient[User, MicrosoftEntraProv
                     attributes=self.entity_as_dict(response),
                 )
 
-    def update(self, user: User, connection: MicrosoftEntraProviderUser):
+    def update(self, user: User, connection: MicrosoftEntraProviderUser, microsoft_user: MSUser):
         """Update existing user"""
-        microsoft_user = self.to_schema(user, connection)
-        self.check_email_valid(microsoft_user.user_principal_name)
-        response = self._request(
-            self.client.users.by_user_id(connection.microsoft_id).patch(microsoft_user)
-        )
+        self.check_schema(microsoft_user)
+        response = self._request(self.update_request(microsoft_user, connection))
         if response:
             always_merger.merge(connection.attributes, self.entity_as_dict(response))
             connection.save()
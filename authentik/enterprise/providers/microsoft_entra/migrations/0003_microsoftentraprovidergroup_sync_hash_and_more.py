@@ -0,0 +1,26 @@
+# Generated by Django 5.0.6 on 2024-06-20 10:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        (
+            "authentik_providers_microsoft_entra",
+            "0002_microsoftentraprovidergroup_attributes_and_more",
+        ),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="microsoftentraprovidergroup",
+            name="sync_hash",
+            field=models.TextField(default=None, null=True),
+        ),
+        migrations.AddField(
+            model_name="microsoftentraprovideruser",
+            name="sync_hash",
+            field=models.TextField(default=None, null=True),
+        ),
+    ]
@@ -30,6 +30,8 @@ class MicrosoftEntraProviderUser(SerializerModel):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     provider = models.ForeignKey("MicrosoftEntraProvider", on_delete=models.CASCADE)
     attributes = models.JSONField(default=dict)
+    # Hash of the data last written to the remote system
+    sync_hash = models.TextField(null=True, default=None)
 
     @property
     def serializer(self) -> type[Serializer]:
@@ -56,6 +58,8 @@ class MicrosoftEntraProviderGroup(SerializerModel):
     group = models.ForeignKey(Group, on_delete=models.CASCADE)
     provider = models.ForeignKey("MicrosoftEntraProvider", on_delete=models.CASCADE)
     attributes = models.JSONField(default=dict)
+    # Hash of the data last written to the remote system
+    sync_hash = models.TextField(null=True, default=None)
 
     @property
     def serializer(self) -> type[Serializer]:
@@ -99,6 +103,9 @@ class MicrosoftEntraProvider(OutgoingSyncProvider, BackchannelProvider):
         help_text=_("Property mappings used for group creation/updating."),
     )
 
+    # The Microsoft Graph API has strict per-user rate limits
+    default_sync_page_concurrency = 2
+
     def client_for_model(
         self,
         model: type[User | Group | MicrosoftEntraProviderUser | MicrosoftEntraProviderGroup],
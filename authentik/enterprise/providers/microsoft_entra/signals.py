@@ -4,6 +4,7 @@ from authentik.enterprise.providers.microsoft_entra.models import MicrosoftEntra
 from authentik.enterprise.providers.microsoft_entra.tasks import (
     microsoft_entra_sync,
     microsoft_entra_sync_direct,
+    microsoft_entra_sync_journal,
     microsoft_entra_sync_m2m,
 )
 from authentik.lib.sync.outgoing.signals import register_signals
@@ -13,4 +14,5 @@ register_signals(
     task_sync_single=microsoft_entra_sync,
     task_sync_direct=microsoft_entra_sync_direct,
     task_sync_m2m=microsoft_entra_sync_m2m,
+    task_sync_journal=microsoft_entra_sync_journal,
 )
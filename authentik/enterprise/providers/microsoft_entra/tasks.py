@@ -35,3 +35,10 @@ def microsoft_entra_sync_direct(*args, **kwargs):
 @CELERY_APP.task(autoretry_for=(TransientSyncException,), retry_backoff=True)
 def microsoft_entra_sync_m2m(*args, **kwargs):
     return sync_tasks.sync_signal_m2m(*args, **kwargs)
+
+
+@CELERY_APP.task()
+def microsoft_entra_sync_journal(window: int):
+    return sync_tasks.sync_signal_journal(
+        window, microsoft_entra_sync_direct, microsoft_entra_sync_m2m
+    )
@@ -15,6 +15,7 @@ from rest_framework.test import APITestCase
 from authentik.blueprints.tests import apply_blueprint
 from authentik.core.models import Application, Group, User
 from authentik.core.tests.utils import create_test_admin_user
+from authentik.enterprise.providers.microsoft_entra.clients.users import MicrosoftEntraUserClient
 from authentik.enterprise.providers.microsoft_entra.models import (
     MicrosoftEntraProvider,
     MicrosoftEntraProviderMapping,
@@ -325,6 +326,49 @@ class MicrosoftEntraUserTests(APITestCase):
             user_patch.assert_not_called()
             user_delete.assert_not_called()
 
+    def test_user_write_many(self):
+        """Test writing multiple users with concurrent requests"""
+        self.app.backchannel_providers.remove(self.provider)
+        users = [
+            User.objects.create(username=uid, email=f"{uid}@goauthentik.io")
+            for uid in [generate_id() for _ in range(3)]
+        ]
+        self.app.backchannel_providers.add(self.provider)
+        with (
+            patch(
+                "authentik.enterprise.providers.microsoft_entra.models.MicrosoftEntraProvider.microsoft_credentials",
+                MagicMock(return_value={"credentials": self.creds}),
+            ),
+            patch(
+                "msgraph.generated.organization.organization_request_builder.OrganizationRequestBuilder.get",
+                AsyncMock(
+                    return_value=OrganizationCollectionResponse(
+                        value=[
+                            Organization(verified_domains=[VerifiedDomain(name="goauthentik.io")])
+                        ]
+                    )
+                ),
+            ),
+            patch(
+                "msgraph.generated.users.users_request_builder.UsersRequestBuilder.post",
+                AsyncMock(side_effect=lambda _: MSUser(id=generate_id())),
+            ) as user_create,
+        ):
+            client = MicrosoftEntraUserClient(self.provider)
+            self.assertIs(client.client, MicrosoftEntraUserClient(self.provider).client)
+            results = list(client.write_many(users))
+            self.assertEqual(results, [(user, None) for user in users])
+            self.assertEqual(user_create.call_count, 3)
+            self.assertEqual(
+                MicrosoftEntraProviderUser.objects.filter(
+                    provider=self.provider, user__in=users
+                ).count(),
+                3,
+            )
+            # Users which haven't changed since they were written aren't sent again
+            self.assertEqual(list(client.write_many(users)), [(user, None) for user in users])
+            self.assertEqual(user_create.call_count, 3)
+
     def test_sync_task(self):
         """Test user discovery"""
         uid = generate_id()
@@ -35,14 +35,22 @@ class PropertyMappingManager:
         self.context_keys = context_keys
         self.compile()
 
+    def _evaluator(self, mapping: PropertyMapping) -> PropertyMappingEvaluator:
+        evaluator = PropertyMappingEvaluator(
+            mapping, **{key: None for key in self.context_keys if key != "user"}
+        )
+        # `user` is only added to the context by the evaluator when it is set,
+        # however it still needs to be part of the compiled expression's signature
+        if "user" in self.context_keys:
+            evaluator._context.setdefault("user", None)
+        return evaluator
+
     def compile(self):
         self._evaluators = []
         for mapping in self.query_set:
             if not isinstance(mapping, self.mapping_subclass):
                 continue
-            evaluator = PropertyMappingEvaluator(
-                mapping, **{key: None for key in self.context_keys}
-            )
+            evaluator = self._evaluator(mapping)
             # Compile and cache expression
             evaluator.compile()
             self._evaluators.append(evaluator)
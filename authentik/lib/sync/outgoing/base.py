@@ -1,7 +1,10 @@
 """Basic outgoing sync Client"""
 
+from collections.abc import Generator
 from enum import StrEnum
-from typing import TYPE_CHECKING
+from hashlib import sha256
+from json import dumps
+from typing import TYPE_CHECKING, Any
 
 from deepmerge import always_merger
 from django.db import DatabaseError
@@ -9,18 +12,28 @@ from structlog.stdlib import get_logger
 
 from authentik.core.expression.exceptions import (
     PropertyMappingExpressionException,
+    SkipObjectException,
 )
 from authentik.events.models import Event, EventAction
 from authentik.lib.expression.exceptions import ControlFlowException
 from authentik.lib.sync.mapper import PropertyMappingManager
-from authentik.lib.sync.outgoing.exceptions import NotFoundSyncException, StopSync
+from authentik.lib.sync.outgoing.exceptions import (
+    BaseSyncException,
+    NotFoundSyncException,
+    ObjectExistsSyncException,
+    StopSync,
+)
 from authentik.lib.utils.errors import exception_to_string
 
 if TYPE_CHECKING:
     from django.db.models import Model
 
+    from authentik.core.models import Group
     from authentik.lib.sync.outgoing.models import OutgoingSyncProvider
 
+# Attribute the members of groups are prefetched to by full syncs
+PREFETCHED_MEMBERS = "prefetched_sync_members"
+
 
 class Direction(StrEnum):
 
@@ -28,6 +41,15 @@ class Direction(StrEnum):
     remove = "remove"
 
 
+def group_member_pks(group: "Group") -> list[int]:
+    """Get the primary keys of all members of `group`, ordered by primary key. Uses
+    the members prefetched by full syncs when available"""
+    members = getattr(group, PREFETCHED_MEMBERS, None)
+    if members is not None:
+        return [user.pk for user in members]
+    return list(group.users.order_by("id").values_list("id", flat=True))
+
+
 class BaseOutgoingSyncClient[
     TModel: "Model", TConnection: "Model", TSchema: dict, TProvider: "OutgoingSyncProvider"
 ]:
@@ -39,42 +61,210 @@ class BaseOutgoingSyncClient[
     mapper: PropertyMappingManager
 
     can_discover = False
+    # Whether multiple objects can be written at once, see self.request_many
+    can_request_many = False
 
     def __init__(self, provider: TProvider):
         self.logger = get_logger().bind(provider=provider.name)
         self.provider = provider
+        # Connections of the objects currently written by write_many, by object primary key
+        self._prefetched_connections: dict[Any, TConnection | None] = {}
 
-    def create(self, obj: TModel) -> TConnection:
-        """Create object in remote destination"""
+    def create(self, obj: TModel, schema: TSchema) -> TConnection:
+        """Create object in remote destination, from `obj` converted to the destination
+        schema"""
         raise NotImplementedError()
 
-    def update(self, obj: TModel, connection: TConnection):
-        """Update object in remote destination"""
+    def update(self, obj: TModel, connection: TConnection, schema: TSchema):
+        """Update object in remote destination, from `obj` converted to the destination
+        schema"""
         raise NotImplementedError()
 
     def write(self, obj: TModel) -> tuple[TConnection, bool]:
         """Write object to destination. Uses self.create and self.update, but
         can be overwritten for further logic"""
-        connection = self.connection_type.objects.filter(
-            provider=self.provider, **{self.connection_type_query: obj}
-        ).first()
+        connection = self.get_connection(obj)
         try:
             if not connection:
-                connection = self.create(obj)
-                return connection, True
+                return self._write_create(obj), True
             try:
-                self.update(obj, connection)
+                schema = self.to_schema(obj, connection)
+                sync_hash = self.schema_hash(schema)
+                if connection.sync_hash == sync_hash:
+                    self.logger.debug("Object unchanged since last write, skipping", obj=obj)
+                    return connection, False
+                self.update(obj, connection, schema)
+                self.set_sync_hash(connection, sync_hash)
                 return connection, False
             except NotFoundSyncException:
                 connection.delete()
-                connection = self.create(obj)
-                return connection, True
+                return self._write_create(obj), True
         except DatabaseError as exc:
             self.logger.warning("Failed to write object", obj=obj, exc=exc)
             if connection:
                 connection.delete()
         return None, False
 
+    def _write_create(self, obj: TModel) -> TConnection | None:
+        schema = self.to_schema(obj, None)
+        # Hash the schema before it's sent, as clients may modify it
+        sync_hash = self.schema_hash(schema)
+        connection = self.create(obj, schema)
+        self.set_sync_hash(connection, sync_hash)
+        return connection
+
+    def schema_hash(self, schema: TSchema) -> str:
+        """Hash of an object converted to the destination schema, used to detect if an object
+        has changed since it was last written"""
+        return sha256(dumps(schema, sort_keys=True, default=str).encode()).hexdigest()
+
+    def set_sync_hash(self, connection: TConnection | None, sync_hash: str):
+        """Save the hash of the data written for an object on its connection"""
+        if not connection:
+            return
+        connection.sync_hash = sync_hash
+        self.connection_type.objects.filter(pk=connection.pk).update(sync_hash=sync_hash)
+
+    def get_connection(self, obj: TModel) -> TConnection | None:
+        """Get the connection of `obj`, if it has been written before"""
+        if obj.pk in self._prefetched_connections:
+            return self._prefetched_connections[obj.pk]
+        return self.connection_type.objects.filter(
+            provider=self.provider, **{self.connection_type_query: obj}
+        ).first()
+
+    def prefetch_connections(self, objects: list[TModel]) -> dict[Any, TConnection]:
+        """Get the connections of all `objects` which have been written before in a single
+        query, by object primary key"""
+        return {
+            getattr(connection, f"{self.connection_type_query}_id"): connection
+            for connection in self.connection_type.objects.filter(
+                provider=self.provider, **{f"{self.connection_type_query}__in": objects}
+            )
+        }
+
+    def create_request(self, schema: TSchema) -> Any:
+        """Get the request creating an object, sent by self.request_many"""
+        raise NotImplementedError()
+
+    def update_request(self, schema: TSchema, connection: TConnection) -> Any:
+        """Get the request updating an object, sent by self.request_many"""
+        raise NotImplementedError()
+
+    def request_many(self, *requests: Any) -> list[Any | Exception]:
+        """Send multiple requests at once, returning either the response or the exception of
+        each request. Only called when self.can_request_many is set"""
+        raise NotImplementedError()
+
+    def connection_fields(self, response: Any) -> dict[str, Any]:
+        """Get the fields of the connection of an object created by write_many, from the
+        response of its create request"""
+        raise NotImplementedError()
+
+    def update_connection(self, connection: TConnection, response: Any):
+        """Update the connection of an object updated by write_many, from the response of
+        its update request"""
+
+    def check_schema(self, schema: TSchema):
+        """Check an object before it's sent. Can raise BadRequestSyncException"""
+
+    def written(self, obj: TModel, connection: TConnection):
+        """Called after `obj` has been written by write_many, or was skipped as unchanged"""
+
+    def write_many(
+        self, objects: list[TModel]
+    ) -> Generator[tuple[TModel, BaseSyncException | SkipObjectException | None]]:
+        """Write multiple objects to destination, yielding each object with the exception
+        raised while writing it, if any. When the destination supports sending multiple requests
+        at once, the requests for all changed objects are sent with self.request_many, otherwise
+        objects are written one by one using self.write"""
+        if not self.can_request_many:
+            yield from self._write_each(objects)
+            return
+        connections = self.prefetch_connections(objects)
+        results = []
+        pending = []
+        for obj in objects:
+            connection = connections.get(obj.pk)
+            try:
+                schema = self.to_schema(obj, connection)
+                self.check_schema(schema)
+            except (SkipObjectException, BaseSyncException) as exc:
+                results.append((obj, exc))
+                continue
+            sync_hash = self.schema_hash(schema)
+            if connection and connection.sync_hash == sync_hash:
+                results.append((obj, self._written(obj, connection)))
+                continue
+            pending.append((obj, connection, schema, sync_hash))
+        responses = self.request_many(
+            *(
+                (
+                    self.update_request(schema, connection)
+                    if connection
+                    else self.create_request(schema)
+                )
+                for _, connection, schema, _ in pending
+            )
+        )
+        # Objects which need special handling are written one by one
+        single = []
+        for (obj, existing, _, sync_hash), response in zip(pending, responses, strict=True):
+            if isinstance(response, NotFoundSyncException) and existing:
+                # Same as self.write, the object was deleted in the destination so re-create it
+                existing.delete()
+                single.append(obj)
+                continue
+            if isinstance(response, ObjectExistsSyncException) and not existing:
+                # self.create connects the object to the existing object
+                single.append(obj)
+                continue
+            if isinstance(response, Exception):
+                results.append((obj, response))
+                continue
+            connection = self._save_connection(obj, existing, response, sync_hash)
+            results.append((obj, self._written(obj, connection)))
+        yield from results
+        yield from self._write_each(single)
+
+    def _written(self, obj: TModel, connection: TConnection) -> BaseSyncException | None:
+        try:
+            self.written(obj, connection)
+        except BaseSyncException as exc:
+            return exc
+        return None
+
+    def _save_connection(
+        self, obj: TModel, connection: TConnection | None, response: Any, sync_hash: str
+    ) -> TConnection:
+        if not connection:
+            return self.connection_type.objects.create(
+                provider=self.provider,
+                sync_hash=sync_hash,
+                **self.connection_fields(response),
+                **{self.connection_type_query: obj},
+            )
+        self.update_connection(connection, response)
+        connection.sync_hash = sync_hash
+        connection.save()
+        return connection
+
+    def _write_each(
+        self, objects: list[TModel]
+    ) -> Generator[tuple[TModel, BaseSyncException | SkipObjectException | None]]:
+        connections = self.prefetch_connections(objects)
+        self._prefetched_connections = {obj.pk: connections.get(obj.pk) for obj in objects}
+        try:
+            for obj in objects:
+                try:
+                    self.write(obj)
+                except (SkipObjectException, BaseSyncException) as exc:
+                    yield obj, exc
+                    continue
+                yield obj, None
+        finally:
+            self._prefetched_connections = {}
+
     def delete(self, obj: TModel):
         """Delete object from destination"""
         raise NotImplementedError()
@@ -0,0 +1,38 @@
+"""Cache of state discovered from the remote systems of outgoing sync providers"""
+
+from collections.abc import Callable
+from typing import TYPE_CHECKING
+
+from django.core.cache import cache
+
+from authentik.lib.config import CONFIG
+from authentik.lib.utils.reflection import class_to_path
+
+if TYPE_CHECKING:
+    from authentik.lib.sync.outgoing.models import OutgoingSyncProvider
+
+CACHE_KEY_PREFIX = "goauthentik.io/lib/sync/outgoing/discovery/"
+
+
+def discovery_cache_key(provider: "OutgoingSyncProvider", name: str) -> str:
+    """Cache key holding the state `name` discovered for `provider`"""
+    return f"{CACHE_KEY_PREFIX}{class_to_path(provider.__class__)}/{provider.pk}/{name}"
+
+
+def get_discovered[T](provider: "OutgoingSyncProvider", name: str, discover: Callable[[], T]) -> T:
+    """Get the state `name` (for example the capabilities or the domains) of the remote system
+    of `provider`. `discover` is only called when the state isn't cached yet, its result is
+    shared by all clients of the provider. Exceptions raised by `discover` are not cached."""
+    key = discovery_cache_key(provider, name)
+    value = cache.get(key)
+    if value is None:
+        value = discover()
+        cache.set(key, value, CONFIG.get_int("outgoing_sync.discovery_cache_timeout", 3600))
+    return value
+
+
+def invalidate_discovered(provider: "OutgoingSyncProvider"):
+    """Remove all cached state of `provider`, which will be discovered again
+    by the next client"""
+    keys = cache.keys(discovery_cache_key(provider, "*")) or []
+    cache.delete_many(keys)
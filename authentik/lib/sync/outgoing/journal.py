@@ -0,0 +1,118 @@
+"""Journal of changes to be synced to outgoing sync providers"""
+
+from collections import defaultdict
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from time import time
+from typing import Any
+
+from celery import Task
+from django.core.cache import cache
+from django.db.models import Model
+from django_redis import get_redis_connection
+
+from authentik.lib.config import CONFIG
+from authentik.lib.utils.reflection import class_to_path
+
+CACHE_KEY_PREFIX = "goauthentik.io/lib/sync/outgoing/journal/"
+# Entries are kept well beyond their window, in case flushing is delayed
+CACHE_TIMEOUT = 60 * 60 * 24
+# Seconds to wait after the end of a window before flushing it, to allow for
+# small clock differences between workers
+FLUSH_DELAY = 1
+
+
+@dataclass
+class JournalEntries:
+    """Changes recorded within a window, with repeated changes of the same object collapsed"""
+
+    # Primary keys of objects to write, by model path
+    writes: dict[str, set[str]] = field(default_factory=lambda: defaultdict(set))
+    # Primary keys of users added to/removed from groups, by group primary key and m2m action
+    memberships: dict[str, dict[str, set[int]]] = field(
+        default_factory=lambda: defaultdict(lambda: defaultdict(set))
+    )
+
+    def __bool__(self) -> bool:
+        return bool(self.writes) or bool(self.memberships)
+
+
+class SyncJournal:
+    """Record changes to users, groups and group memberships, which are merged over a short
+    window and flushed by a single task, instead of syncing each change on its own.
+
+    Each change is recorded in its own cache key, so changing the same object multiple times
+    within a window only causes one write, and for group memberships the last action wins"""
+
+    def __init__(self, provider_type: type[Model]) -> None:
+        self.uid = class_to_path(provider_type)
+
+    @staticmethod
+    def window_length() -> int:
+        """Length of a window in seconds, 0 if changes should be synced directly"""
+        return max(CONFIG.get_int("outgoing_sync.debounce_seconds", 5), 0)
+
+    def current_window(self) -> int:
+        """Get the number of the window changes are currently recorded in"""
+        return int(time() // self.window_length())
+
+    def _prefix(self, window: int) -> str:
+        return f"{CACHE_KEY_PREFIX}{self.uid}/{window}/"
+
+    def record_write(self, instance: Model) -> int:
+        """Record that `instance` has been changed and should be written"""
+        window = self.current_window()
+        cache.set(
+            f"{self._prefix(window)}write/{class_to_path(instance.__class__)}/{instance.pk}",
+            True,
+            CACHE_TIMEOUT,
+        )
+        return window
+
+    def record_membership(self, group_pk: Any, action: str, user_pks: Iterable[int]) -> int:
+        """Record that users have been added to (`post_add`) or removed
+        from (`post_remove`) a group"""
+        window = self.current_window()
+        prefix = f"{self._prefix(window)}member/{group_pk}/"
+        cache.set_many({f"{prefix}{user_pk}": action for user_pk in user_pks}, CACHE_TIMEOUT)
+        return window
+
+    def schedule(self, window: int, task: Task):
+        """Schedule `task` to flush `window` after it has ended, unless it already is scheduled"""
+        if not cache.add(f"{self._prefix(window)}scheduled", True, CACHE_TIMEOUT):
+            return
+        countdown = (window + 1) * self.window_length() - time()
+        task.apply_async((window,), countdown=max(countdown, 0) + FLUSH_DELAY)
+
+    def _get_and_delete(self, keys: list[str]) -> dict[str, Any]:
+        """Get and remove `keys` in a single transaction, so a change recorded for the same
+        key in between (e.g. a user being removed from a group just after being added)
+        isn't deleted without having been read"""
+        if not keys:
+            return {}
+        cache_keys = [cache.make_key(key) for key in keys]
+        pipeline = get_redis_connection().pipeline(transaction=True)
+        pipeline.mget(cache_keys)
+        pipeline.delete(*cache_keys)
+        values, _ = pipeline.execute()
+        return {
+            key: cache.client.decode(value)
+            for key, value in zip(keys, values, strict=True)
+            if value is not None
+        }
+
+    def pop(self, window: int) -> JournalEntries:
+        """Get and remove all changes recorded in `window`"""
+        prefix = self._prefix(window)
+        # Changes recorded after this point schedule another flush
+        cache.delete(f"{prefix}scheduled")
+        keys = [key for key in cache.keys(f"{prefix}*") or [] if key != f"{prefix}scheduled"]
+        values = self._get_and_delete(keys)
+        entries = JournalEntries()
+        for key, value in values.items():
+            kind, parent, pk = key.removeprefix(prefix).split("/")
+            if kind == "write":
+                entries.writes[parent].add(pk)
+            if kind == "member":
+                entries.memberships[parent][value].add(int(pk))
+        return entries
@@ -2,9 +2,10 @@ from typing import Any, Self
 
 import pglock
 from django.db import connection
-from django.db.models import Model, QuerySet, TextChoices
+from django.db.models import JSONField, Model, QuerySet, TextChoices
 
 from authentik.core.models import Group, User
+from authentik.lib.config import CONFIG
 from authentik.lib.sync.outgoing.base import BaseOutgoingSyncClient
 
 
@@ -18,6 +19,12 @@ class OutgoingSyncDeleteAction(TextChoices):
 
 
 class OutgoingSyncProvider(Model):
+    # Progress of a full sync which was interrupted, used to resume it
+    sync_checkpoint = JSONField(default=dict, blank=True)
+
+    # Number of pages synced in parallel during a full sync, unless configured otherwise.
+    # Providers whose API has strict rate limits use a lower default
+    default_sync_page_concurrency = 4
 
     class Meta:
         abstract = True
@@ -30,6 +37,14 @@ class OutgoingSyncProvider(Model):
     def get_object_qs[T: User | Group](self, type: type[T]) -> QuerySet[T]:
         raise NotImplementedError
 
+    @property
+    def sync_page_concurrency(self) -> int:
+        """Number of pages synced in parallel during a full sync"""
+        concurrency = CONFIG.get("outgoing_sync.page_concurrency")
+        if concurrency is None:
+            concurrency = self.default_sync_page_concurrency
+        return max(int(concurrency), 1)
+
     @property
     def sync_lock(self) -> pglock.advisory:
         """Postgres lock for syncing SCIM to prevent multiple parallel syncs happening"""
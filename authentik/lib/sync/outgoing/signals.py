@@ -8,6 +8,8 @@ from django.db.models.signals import m2m_changed, post_save, pre_delete
 from authentik.core.models import Group, User
 from authentik.lib.sync.outgoing import PAGE_SIZE, PAGE_TIMEOUT
 from authentik.lib.sync.outgoing.base import Direction
+from authentik.lib.sync.outgoing.discovery import invalidate_discovered
+from authentik.lib.sync.outgoing.journal import SyncJournal
 from authentik.lib.sync.outgoing.models import OutgoingSyncProvider
 from authentik.lib.utils.reflection import class_to_path
 
@@ -17,12 +19,19 @@ def register_signals(
     task_sync_single: Callable[[int], None],
     task_sync_direct: Callable[[int], None],
     task_sync_m2m: Callable[[int], None],
+    task_sync_journal: Callable[[int], None],
 ):
-    """Register sync signals"""
+    """Register sync signals. Changes to users, groups and group memberships are recorded in a
+    journal, which is flushed by `task_sync_journal` after a short window"""
     uid = class_to_path(provider_type)
+    journal = SyncJournal(provider_type)
 
     def post_save_provider(sender: type[Model], instance: OutgoingSyncProvider, created: bool, **_):
         """Trigger sync when Provider is saved"""
+        # The provider might now point to a different remote system, so don't resume
+        # an interrupted sync either
+        invalidate_discovered(instance)
+        provider_type.objects.filter(pk=instance.pk).update(sync_checkpoint={})
         users_paginator = Paginator(instance.get_object_qs(User), PAGE_SIZE)
         groups_paginator = Paginator(instance.get_object_qs(Group), PAGE_SIZE)
         soft_time_limit = (users_paginator.num_pages + groups_paginator.num_pages) * PAGE_TIMEOUT
@@ -39,7 +48,12 @@ def register_signals(
             Q(backchannel_application__isnull=False) | Q(application__isnull=False)
         ).exists():
             return
-        task_sync_direct.delay(class_to_path(instance.__class__), instance.pk, Direction.add.value)
+        if not journal.window_length():
+            task_sync_direct.delay(
+                class_to_path(instance.__class__), instance.pk, Direction.add.value
+            )
+            return
+        journal.schedule(journal.record_write(instance), task_sync_journal)
 
     post_save.connect(model_post_save, User, dispatch_uid=uid, weak=False)
     post_save.connect(model_post_save, Group, dispatch_uid=uid, weak=False)
@@ -69,10 +83,22 @@ def register_signals(
             return
         # reverse: instance is a Group, pk_set is a list of user pks
         # non-reverse: instance is a User, pk_set is a list of groups
+        if not journal.window_length():
+            if reverse:
+                task_sync_m2m.delay(str(instance.pk), action, list(pk_set))
+            else:
+                for group_pk in pk_set:
+                    task_sync_m2m.delay(group_pk, action, [instance.pk])
+            return
+        if not pk_set:
+            return
         if reverse:
-            task_sync_m2m.delay(str(instance.pk), action, list(pk_set))
+            windows = {journal.record_membership(instance.pk, action, pk_set)}
         else:
-            for group_pk in pk_set:
-                task_sync_m2m.delay(group_pk, action, [instance.pk])
+            windows = {
+                journal.record_membership(group_pk, action, [instance.pk]) for group_pk in pk_set
+            }
+        for window in windows:
+            journal.schedule(window, task_sync_journal)
 
     m2m_changed.connect(model_m2m_changed, User.ak_groups.through, dispatch_uid=uid, weak=False)
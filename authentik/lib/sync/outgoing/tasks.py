@@ -1,10 +1,12 @@
-from collections.abc import Callable
-from dataclasses import asdict
+from collections import deque
+from collections.abc import Callable, Generator
+from dataclasses import asdict, dataclass, field, replace
+from uuid import uuid4
 
 from celery.exceptions import Retry
-from celery.result import allow_join_result
+from celery.result import AsyncResult, allow_join_result
 from django.core.paginator import Paginator
-from django.db.models import Model, QuerySet
+from django.db.models import Model, Prefetch, QuerySet
 from django.db.models.query import Q
 from django.utils.text import slugify
 from django.utils.translation import gettext_lazy as _
@@ -17,16 +19,30 @@ from authentik.events.models import TaskStatus
 from authentik.events.system_tasks import SystemTask
 from authentik.events.utils import sanitize_item
 from authentik.lib.sync.outgoing import PAGE_SIZE, PAGE_TIMEOUT
-from authentik.lib.sync.outgoing.base import Direction
+from authentik.lib.sync.outgoing.base import PREFETCHED_MEMBERS, Direction
+from authentik.lib.sync.outgoing.discovery import invalidate_discovered
 from authentik.lib.sync.outgoing.exceptions import (
     BadRequestSyncException,
     StopSync,
     TransientSyncException,
 )
+from authentik.lib.sync.outgoing.journal import SyncJournal
 from authentik.lib.sync.outgoing.models import OutgoingSyncProvider
 from authentik.lib.utils.reflection import class_to_path, path_to_class
 
 
+@dataclass
+class SyncCheckpoint:
+    """Progress of a full sync, saved after every completed page so an interrupted
+    sync can be resumed by its retry or the next scheduled run"""
+
+    run: str = field(default_factory=lambda: uuid4().hex)
+    # Object type currently being synced, and primary key and number of its last completed page
+    object_type: str | None = None
+    pk: str | None = None
+    page: int = 0
+
+
 class SyncTasks:
     """Container for all sync 'tasks' (this class doesn't actually contain celery
     tasks due to celery's magic, however exposes a number of functions to be called from tasks)"""
@@ -74,38 +90,148 @@ class SyncTasks:
         messages = []
         messages.append(_("Starting full provider sync"))
         self.logger.debug("Starting provider sync")
-        users_paginator = Paginator(provider.get_object_qs(User), PAGE_SIZE)
-        groups_paginator = Paginator(provider.get_object_qs(Group), PAGE_SIZE)
         with allow_join_result(), provider.sync_lock as lock_acquired:
             if not lock_acquired:
                 self.logger.debug("Failed to acquire sync lock, skipping", provider=provider.name)
                 return
+            # Discover the remote system again once per full sync, all pages share the result
+            invalidate_discovered(provider)
+            checkpoint = self.load_checkpoint(provider)
+            self.logger = self.logger.bind(run=checkpoint.run)
+            if checkpoint.object_type:
+                self.logger.info("Resuming provider sync", checkpoint=checkpoint)
+                messages.append(
+                    _(
+                        "Resuming interrupted full provider sync {run}".format_map(
+                            {"run": checkpoint.run}
+                        )
+                    )
+                )
             try:
-                for page in users_paginator.page_range:
-                    messages.append(_("Syncing page %(page)d of users" % {"page": page}))
-                    for msg in sync_objects.apply_async(
-                        args=(class_to_path(User), page, provider_pk),
-                        time_limit=PAGE_TIMEOUT,
-                        soft_time_limit=PAGE_TIMEOUT,
-                    ).get():
-                        messages.append(LogEvent(**msg))
-                for page in groups_paginator.page_range:
-                    messages.append(_("Syncing page %(page)d of groups" % {"page": page}))
-                    for msg in sync_objects.apply_async(
-                        args=(class_to_path(Group), page, provider_pk),
-                        time_limit=PAGE_TIMEOUT,
-                        soft_time_limit=PAGE_TIMEOUT,
-                    ).get():
-                        messages.append(LogEvent(**msg))
+                self.sync_types(task, provider, checkpoint, sync_objects, messages)
             except TransientSyncException as exc:
                 self.logger.warning("transient sync exception", exc=exc)
+                task.set_status(
+                    TaskStatus.WARNING,
+                    *messages,
+                    _("Sync interrupted, resuming after the last completed page"),
+                )
                 raise task.retry(exc=exc) from exc
             except StopSync as exc:
                 task.set_error(exc)
                 return
         task.set_status(TaskStatus.SUCCESSFUL, *messages)
 
-    def sync_objects(self, object_type: str, page: int, provider_pk: int):
+    def load_checkpoint(self, provider: OutgoingSyncProvider) -> SyncCheckpoint:
+        """Get the checkpoint of an interrupted sync of `provider`, or a new one"""
+        try:
+            return SyncCheckpoint(**provider.sync_checkpoint)
+        except TypeError:
+            return SyncCheckpoint()
+
+    def save_checkpoint(self, provider: OutgoingSyncProvider, checkpoint: SyncCheckpoint | None):
+        """Save (or clear) the checkpoint without triggering the provider's signals"""
+        self._provider_model.objects.filter(pk=provider.pk).update(
+            sync_checkpoint=asdict(checkpoint) if checkpoint else {}
+        )
+
+    def sync_types(
+        self,
+        task: SystemTask,
+        provider: OutgoingSyncProvider,
+        checkpoint: SyncCheckpoint,
+        sync_objects: Callable[[int, int], list[str]],
+        messages: list,
+    ):
+        """Sync all users and groups, starting after the last page completed according to
+        `checkpoint`. After every completed page the checkpoint is saved, and the task's
+        messages are updated so the progress so far is kept when the sync fails"""
+        # Groups are only synced once all users are synced, so their members exist
+        types = [User, Group]
+        paths = [class_to_path(object_type) for object_type in types]
+        start = paths.index(checkpoint.object_type) if checkpoint.object_type in paths else 0
+        for idx in range(start, len(types)):
+            after_pk, first_page = None, 1
+            if checkpoint.object_type == paths[idx]:
+                after_pk, first_page = checkpoint.pk, checkpoint.page + 1
+            for page, end_pk, page_messages in self.sync_pages(
+                provider, types[idx], sync_objects, after_pk, first_page
+            ):
+                if types[idx] == User:
+                    messages.append(_("Syncing page %(page)d of users" % {"page": page}))
+                else:
+                    messages.append(_("Syncing page %(page)d of groups" % {"page": page}))
+                for msg in page_messages:
+                    messages.append(LogEvent(**msg))
+                if end_pk is not None:
+                    checkpoint = replace(checkpoint, object_type=paths[idx], pk=end_pk, page=page)
+                elif idx + 1 < len(types):
+                    # The last page of this type is done, continue with the next one
+                    checkpoint = replace(checkpoint, object_type=paths[idx + 1], pk=None, page=0)
+                else:
+                    checkpoint = None
+                self.save_checkpoint(provider, checkpoint)
+                task.set_status(TaskStatus.UNKNOWN, *messages)
+
+    def sync_pages(
+        self,
+        provider: OutgoingSyncProvider,
+        object_type: type[User | Group],
+        sync_objects: Callable[[int, int], list[str]],
+        after_pk: str | None = None,
+        first_page: int = 1,
+    ) -> Generator[tuple[int, str | None, list[dict]]]:
+        """Sync all pages of `object_type` with up to `provider.sync_page_concurrency` pages
+        being synced in parallel, starting after `after_pk`. Yields the page number, the primary
+        key the page ends at and the messages of each page, in order of the pages"""
+        pending: deque[tuple[int, str | None, AsyncResult]] = deque()
+        bounds = self.page_bounds(provider.get_object_qs(object_type), after_pk)
+        for page, (start_pk, end_pk) in enumerate(bounds, start=first_page):
+            if len(pending) >= provider.sync_page_concurrency:
+                page_done, page_end_pk, result = pending.popleft()
+                yield page_done, page_end_pk, result.get()
+            result = sync_objects.apply_async(
+                args=(class_to_path(object_type), page, provider.pk),
+                kwargs={"start_pk": start_pk, "end_pk": end_pk},
+                time_limit=PAGE_TIMEOUT,
+                soft_time_limit=PAGE_TIMEOUT,
+            )
+            pending.append((page, end_pk, result))
+        while pending:
+            page_done, page_end_pk, result = pending.popleft()
+            yield page_done, page_end_pk, result.get()
+
+    def page_bounds(
+        self, queryset: QuerySet, after_pk: str | None = None
+    ) -> list[tuple[str | None, str | None]]:
+        """Split `queryset` into pages of PAGE_SIZE objects by primary key, starting after
+        `after_pk`. Each page is given as the primary key it starts after (exclusive) and ends
+        at (inclusive), None meaning unbounded. Unlike LIMIT/OFFSET, querying a page costs the
+        same regardless of where it is in the queryset. The last page is unbounded to include
+        objects created since"""
+        if after_pk is not None:
+            queryset = queryset.filter(pk__gt=after_pk)
+        boundaries = []
+        count = 0
+        for count, pk in enumerate(
+            queryset.order_by("pk").values_list("pk", flat=True).iterator(), start=1
+        ):
+            if count % PAGE_SIZE == 0:
+                boundaries.append(str(pk))
+        if boundaries and count % PAGE_SIZE == 0:
+            # Don't create an empty last page
+            boundaries.pop()
+        # There's always at least one page, so clients can run discovery
+        return list(zip([after_pk, *boundaries], [*boundaries, None], strict=True))
+
+    def sync_objects(
+        self,
+        object_type: str,
+        page: int,
+        provider_pk: int,
+        start_pk: str | None = None,
+        end_pk: str | None = None,
+    ):
         _object_type = path_to_class(object_type)
         self.logger = get_logger().bind(
             provider_type=class_to_path(self._provider_model),
@@ -120,15 +246,28 @@ class SyncTasks:
             client = provider.client_for_model(_object_type)
         except TransientSyncException:
             return messages
-        paginator = Paginator(provider.get_object_qs(_object_type), PAGE_SIZE)
+        queryset = provider.get_object_qs(_object_type)
+        if start_pk is not None:
+            queryset = queryset.filter(pk__gt=start_pk)
+        if end_pk is not None:
+            queryset = queryset.filter(pk__lte=end_pk)
+        if _object_type == Group:
+            queryset = queryset.prefetch_related(
+                Prefetch(
+                    "users",
+                    queryset=User.objects.order_by("pk").only("pk"),
+                    to_attr=PREFETCHED_MEMBERS,
+                )
+            )
         if client.can_discover:
             self.logger.debug("starting discover")
             client.discover()
         self.logger.debug("starting sync for page", page=page)
-        for obj in paginator.page(page).object_list:
+        for obj, write_exc in client.write_many(list(queryset)):
             obj: Model
             try:
-                client.write(obj)
+                if write_exc:
+                    raise write_exc
             except SkipObjectException:
                 self.logger.debug("skipping object due to SkipObject", obj=obj)
                 continue
@@ -261,3 +400,92 @@ class SyncTasks:
                 raise Retry() from exc
             except StopSync as exc:
                 self.logger.warning(exc, provider_pk=provider.pk)
+
+    def sync_signal_journal(
+        self,
+        window: int,
+        task_sync_direct: Callable[[str, str | int, str], None],
+        task_sync_m2m: Callable[[str, str, list[int]], None],
+    ):
+        """Flush all changes recorded in the journal within `window`. Objects which fail to sync
+        due to a transient error are synced again by `task_sync_direct`/`task_sync_m2m`,
+        which are retried"""
+        self.logger = get_logger().bind(
+            provider_type=class_to_path(self._provider_model),
+        )
+        entries = SyncJournal(self._provider_model).pop(window)
+        if not entries:
+            return
+        self.logger.debug(
+            "Flushing journal",
+            window=window,
+            writes=sum(len(pks) for pks in entries.writes.values()),
+            groups=len(entries.memberships),
+        )
+        for provider in self._provider_model.objects.filter(
+            Q(backchannel_application__isnull=False) | Q(application__isnull=False)
+        ):
+            # Write objects first, so that users exist before they're added to groups
+            for model, pks in entries.writes.items():
+                self._flush_writes(provider, model, pks, task_sync_direct)
+            if entries.memberships:
+                self._flush_memberships(provider, entries.memberships, task_sync_m2m)
+
+    def _flush_writes(
+        self,
+        provider: OutgoingSyncProvider,
+        model: str,
+        pks: set[str],
+        task_sync_direct: Callable[[str, str | int, str], None],
+    ):
+        model_class: type[Model] = path_to_class(model)
+        # Only objects within the provider's restrictions are synced
+        instances = list(provider.get_object_qs(model_class).filter(pk__in=pks))
+        if not instances:
+            return
+        try:
+            client = provider.client_for_model(model_class)
+        except TransientSyncException:
+            for instance in instances:
+                task_sync_direct.delay(model, instance.pk, Direction.add.value)
+            return
+        for instance in instances:
+            try:
+                client.write(instance)
+            except TransientSyncException as exc:
+                self.logger.warning("failed to sync object", exc=exc, obj=instance)
+                task_sync_direct.delay(model, instance.pk, Direction.add.value)
+            except StopSync as exc:
+                self.logger.warning(exc, provider_pk=provider.pk)
+
+    def _flush_memberships(
+        self,
+        provider: OutgoingSyncProvider,
+        memberships: dict[str, dict[str, set[int]]],
+        task_sync_m2m: Callable[[str, str, list[int]], None],
+    ):
+        # Only groups within the provider's restrictions are synced
+        groups = list(provider.get_object_qs(Group).filter(pk__in=memberships.keys()))
+        if not groups:
+            return
+        try:
+            client = provider.client_for_model(Group)
+        except TransientSyncException:
+            for group in groups:
+                for action, user_pks in memberships[str(group.pk)].items():
+                    task_sync_m2m.delay(str(group.pk), action, list(user_pks))
+            return
+        for group in groups:
+            for action, user_pks in memberships[str(group.pk)].items():
+                try:
+                    operation = None
+                    if action == "post_add":
+                        operation = Direction.add
+                    if action == "post_remove":
+                        operation = Direction.remove
+                    client.update_group(group, operation, user_pks)
+                except TransientSyncException as exc:
+                    self.logger.warning("failed to sync group membership", exc=exc, group=group)
+                    task_sync_m2m.delay(str(group.pk), action, list(user_pks))
+                except StopSync as exc:
+                    self.logger.warning(exc, provider_pk=provider.pk)
@@ -1,9 +1,19 @@
 """Test HTTP Helpers"""
 
+from unittest.mock import patch
+
 from django.test import RequestFactory, TestCase
+from requests import Request
 
 from authentik.core.models import Token, TokenIntents, UserTypes
 from authentik.core.tests.utils import create_test_admin_user
+from authentik.lib.config import CONFIG
+from authentik.lib.utils.http import (
+    METRIC_OTHER_HOST,
+    PooledHTTPAdapter,
+    get_http_adapter,
+    get_http_session,
+)
 from authentik.lib.views import bad_request_message
 from authentik.root.middleware import ClientIPMiddleware
 
@@ -64,3 +74,41 @@ class TestHTTP(TestCase):
             },
         )
         self.assertEqual(ClientIPMiddleware.get_client_ip(request), "1.2.3.4")
+
+    def test_http_session_pool(self):
+        """Test sessions sharing the connection pool of the process"""
+        first = get_http_session()
+        second = get_http_session()
+        self.assertIs(
+            first.get_adapter("https://goauthentik.io"),
+            second.get_adapter("https://goauthentik.io"),
+        )
+        self.assertIs(first.get_adapter("https://goauthentik.io"), get_http_adapter())
+        # Closing a session keeps the shared pool open
+        pool = get_http_adapter().poolmanager.connection_from_url("https://goauthentik.io")
+        first.close()
+        self.assertIs(
+            get_http_adapter().poolmanager.connection_from_url("https://goauthentik.io"), pool
+        )
+
+    def test_http_default_timeout(self):
+        """Test default timeout of requests without timeout"""
+        request = Request("GET", "https://goauthentik.io").prepare()
+        with (
+            CONFIG.patch("http.timeout", 3),
+            patch("requests.adapters.HTTPAdapter.send") as send,
+        ):
+            send.return_value.status_code = 200
+            get_http_adapter().send(request)
+            self.assertEqual(send.call_args.args[2], 3)
+            get_http_adapter().send(request, timeout=10)
+            self.assertEqual(send.call_args.args[2], 10)
+
+    def test_http_metric_host(self):
+        """Test hosts beyond the limit being labelled as other in the request metric"""
+        adapter = PooledHTTPAdapter()
+        with patch("authentik.lib.utils.http.METRIC_MAX_HOSTS", 2):
+            self.assertEqual(adapter.metric_host("a.goauthentik.io"), "a.goauthentik.io")
+            self.assertEqual(adapter.metric_host("b.goauthentik.io"), "b.goauthentik.io")
+            self.assertEqual(adapter.metric_host("c.goauthentik.io"), METRIC_OTHER_HOST)
+            self.assertEqual(adapter.metric_host("a.goauthentik.io"), "a.goauthentik.io")
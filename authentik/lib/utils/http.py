@@ -1,14 +1,31 @@
 """http helpers"""
 
+from os import getpid
+from threading import Lock
+from time import perf_counter
+from urllib.parse import urlparse
 from uuid import uuid4
 
+from prometheus_client import Histogram
+from requests.adapters import HTTPAdapter
+from requests.models import Response
 from requests.sessions import PreparedRequest, Session
 from structlog.stdlib import get_logger
+from urllib3.util import Retry
 
 from authentik import get_full_version
 from authentik.lib.config import CONFIG
 
 LOGGER = get_logger()
+HIST_HTTP_REQUEST_TIME = Histogram(
+    "authentik_http_outgoing_request_duration_seconds",
+    "Duration of outgoing HTTP requests, by destination host",
+    ["host", "status"],
+)
+# Number of destination hosts with their own label per process, requests to any further hosts
+# (e.g. webhooks or expressions sending requests to arbitrary URLs) are labelled "other"
+METRIC_MAX_HOSTS = 50
+METRIC_OTHER_HOST = "other"
 
 
 def authentik_user_agent() -> str:
@@ -33,8 +50,76 @@ class DebugSession(Session):
         return resp
 
 
+class PooledHTTPAdapter(HTTPAdapter):
+    """HTTP adapter shared by all sessions of a process, so connections to the same host
+    are kept alive and re-used instead of every session opening its own. Requests without
+    a timeout use the configured default timeout"""
+
+    def __init__(self):
+        super().__init__(
+            pool_connections=CONFIG.get_int("http.pool_hosts", 32),
+            pool_maxsize=CONFIG.get_int("http.pool_size", 10),
+            # Only retry failures to connect and read errors of idempotent requests,
+            # responses are passed on as they are
+            max_retries=Retry(
+                total=CONFIG.get_int("http.retries", 2),
+                redirect=False,
+                status=0,
+                backoff_factor=0.5,
+                raise_on_status=False,
+            ),
+        )
+        self._metric_hosts: set[str] = set()
+
+    def metric_host(self, host: str) -> str:
+        """Get the label of `host` in the request duration metric. The first METRIC_MAX_HOSTS
+        hosts get their own label, so the number of series stays bounded"""
+        if host in self._metric_hosts:
+            return host
+        if len(self._metric_hosts) >= METRIC_MAX_HOSTS:
+            return METRIC_OTHER_HOST
+        self._metric_hosts.add(host)
+        return host
+
+    def send(self, request: PreparedRequest, stream=False, timeout=None, *args, **kwargs):
+        if timeout is None:
+            timeout = CONFIG.get_int("http.timeout", 30)
+        host = self.metric_host(urlparse(request.url).hostname or "")
+        start = perf_counter()
+        status = "error"
+        try:
+            response: Response = super().send(request, stream, timeout, *args, **kwargs)
+            status = str(response.status_code)
+            return response
+        finally:
+            HIST_HTTP_REQUEST_TIME.labels(host=host, status=status).observe(perf_counter() - start)
+
+    def close(self):
+        # Connections are shared with other sessions, which might still be using them
+        pass
+
+
+_adapters: dict[int, PooledHTTPAdapter] = {}
+_adapters_lock = Lock()
+
+
+def get_http_adapter() -> PooledHTTPAdapter:
+    """Get the HTTP adapter of this process. Forked processes (gunicorn and celery workers)
+    get their own, as connections can't be shared across processes"""
+    pid = getpid()
+    with _adapters_lock:
+        if pid not in _adapters:
+            _adapters.clear()
+            _adapters[pid] = PooledHTTPAdapter()
+        return _adapters[pid]
+
+
 def get_http_session() -> Session:
-    """Get a requests session with common headers"""
+    """Get a requests session with common headers, which uses the
+    shared connection pool of this process"""
     session = DebugSession() if CONFIG.get_bool("debug") else Session()
     session.headers["User-Agent"] = authentik_user_agent()
+    adapter = get_http_adapter()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
     return session
@@ -0,0 +1,130 @@
+"""haveibeenpwned lookups with a local range cache and optional offline dataset"""
+
+from array import array
+from bisect import bisect_left
+from dataclasses import dataclass
+from mmap import ACCESS_READ, mmap
+from threading import Lock
+
+from django.core.cache import cache
+from structlog.stdlib import get_logger
+
+from authentik.lib.config import CONFIG
+from authentik.lib.utils.http import get_http_session
+
+LOGGER = get_logger()
+CACHE_KEY_PREFIX = "goauthentik.io/policies/password/hibp/"
+HIBP_RANGE_URL = "https://api.pwnedpasswords.com/range/"
+# Length of an SHA1 hash in hex, of which the first PREFIX_LENGTH characters are
+# used to query a range
+HASH_LENGTH = 40
+PREFIX_LENGTH = 5
+SUFFIX_LENGTH = HASH_LENGTH - PREFIX_LENGTH
+
+
+@dataclass
+class HIBPRange:
+    """All hash suffixes of a range, concatenated in sorted order so they can be searched
+    with binary search, instead of keeping (and caching) the response text of ~30KB"""
+
+    suffixes: bytes
+    counts: array
+
+    @staticmethod
+    def parse(text: str) -> "HIBPRange":
+        """Parse a range response with one `SUFFIX:COUNT` line per hash"""
+        entries = []
+        for line in text.splitlines():
+            suffix, _, count = line.partition(":")
+            # Padding entries (count 0) are not actual hashes
+            if len(suffix) != SUFFIX_LENGTH or not count.strip().isdigit() or int(count) < 1:
+                continue
+            entries.append((suffix.upper().encode(), int(count)))
+        entries.sort()
+        return HIBPRange(
+            suffixes=b"".join(suffix for suffix, _ in entries),
+            counts=array("I", (count for _, count in entries)),
+        )
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+    def __getitem__(self, idx: int) -> bytes:
+        return self.suffixes[idx * SUFFIX_LENGTH : (idx + 1) * SUFFIX_LENGTH]
+
+    def count(self, suffix: str) -> int:
+        """Get how often the hash with `suffix` has been seen, 0 if it hasn't"""
+        needle = suffix.upper().encode()
+        idx = bisect_left(self, needle)
+        if idx < len(self) and self[idx] == needle:
+            return self.counts[idx]
+        return 0
+
+
+def get_range(prefix: str) -> HIBPRange:
+    """Get the range of all hashes starting with `prefix`, from the cache or the API"""
+    key = f"{CACHE_KEY_PREFIX}{prefix.upper()}"
+    hibp_range = cache.get(key)
+    if hibp_range is None:
+        response = get_http_session().get(f"{HIBP_RANGE_URL}{prefix}")
+        response.raise_for_status()
+        hibp_range = HIBPRange.parse(response.text)
+        cache.set(key, hibp_range, CONFIG.get_int("hibp.cache_timeout", 86400))
+    return hibp_range
+
+
+class HIBPDataset:
+    """Offline copy of the haveibeenpwned SHA1 dataset, as downloaded by the
+    PwnedPasswordsDownloader into a single file with one `HASH:COUNT` line per hash,
+    sorted by hash. The file is memory-mapped and searched with binary search, so it's
+    never read into memory as a whole"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as _file:
+            self._map = mmap(_file.fileno(), 0, access=ACCESS_READ)
+
+    def count(self, pw_hash: str) -> int:
+        """Get how often `pw_hash` has been seen, 0 if it hasn't"""
+        needle = pw_hash.upper().encode()
+        low, high = 0, len(self._map)
+        while low < high:
+            middle = (low + high) // 2
+            start = self._map.rfind(b"\n", 0, middle) + 1
+            end = self._map.find(b"\n", start)
+            if end == -1:
+                end = len(self._map)
+            line_hash, _, count = self._map[start:end].partition(b":")
+            line_hash = line_hash.strip().upper()
+            if line_hash == needle:
+                return int(count.strip() or 0)
+            if line_hash < needle:
+                low = end + 1
+            else:
+                high = start
+        return 0
+
+
+_datasets: dict[str, HIBPDataset] = {}
+_datasets_lock = Lock()
+
+
+def get_dataset() -> HIBPDataset | None:
+    """Get the configured offline dataset, if any"""
+    path = CONFIG.get("hibp.dataset")
+    if not path:
+        return None
+    with _datasets_lock:
+        if path not in _datasets:
+            LOGGER.debug("Loading offline HIBP dataset", path=path)
+            _datasets[path] = HIBPDataset(path)
+        return _datasets[path]
+
+
+def hibp_count(pw_hash: str) -> int:
+    """Get how often the SHA1 hash `pw_hash` (in hex) has been seen in breaches,
+    from the offline dataset if configured, otherwise from the range API"""
+    dataset = get_dataset()
+    if dataset:
+        return dataset.count(pw_hash)
+    return get_range(pw_hash[:PREFIX_LENGTH]).count(pw_hash[PREFIX_LENGTH:])
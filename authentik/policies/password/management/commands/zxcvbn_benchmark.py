@@ -0,0 +1,61 @@
+"""zxcvbn password strength benchmark"""
+
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+
+from authentik.lib.config import CONFIG
+from authentik.lib.generators import generate_id
+from authentik.policies.password.strength import MAX_LENGTH, estimate_strength
+
+TYPICAL = {
+    "common": "password123",
+    "passphrase": "correct horse battery staple",
+    "random": generate_id(20),
+}
+ADVERSARIAL = {
+    "repeated": "a" * MAX_LENGTH,
+    "keyboard": ("1qaz2wsx" * MAX_LENGTH)[:MAX_LENGTH],
+    "dictionary": ("passwordletmein" * MAX_LENGTH)[:MAX_LENGTH],
+    "sequences": "".join(chr(33 + (idx * 7) % 90) for idx in range(MAX_LENGTH)),
+}
+
+
+class Command(BaseCommand):
+    """Measure how long estimating the strength of typical and adversarial passwords
+    takes, without CPU time budget, with the configured budget and cached"""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "-n",
+            "--iterations",
+            default=10,
+            type=int,
+            help="How many times each password should be estimated per run.",
+        )
+
+    def benchmark(self, password: str, iterations: int, cached: bool) -> float:
+        """Estimate `password` `iterations` times and return the average time in ms"""
+        # Unique user inputs per run and iteration, so only the cached run hits the cache
+        run_id = generate_id()
+        estimate_strength(password, [run_id])
+        start = perf_counter()
+        for idx in range(iterations):
+            estimate_strength(password, [run_id if cached else f"{run_id}{idx}"])
+        return (perf_counter() - start) / iterations * 1000
+
+    def handle(self, **options):
+        iterations = options["iterations"]
+        budget = CONFIG.get_int("zxcvbn.cpu_budget_ms", 500)
+        self.stdout.write(f"{iterations} iterations, CPU time budget {budget}ms")
+        for kind, passwords in [("Typical", TYPICAL), ("Adversarial", ADVERSARIAL)]:
+            self.stdout.write(f"{kind} passwords:")
+            for name, password in passwords.items():
+                with CONFIG.patch("zxcvbn.cpu_budget_ms", 0):
+                    unbounded = self.benchmark(password, iterations, cached=False)
+                bounded = self.benchmark(password, iterations, cached=False)
+                cached = self.benchmark(password, iterations, cached=True)
+                self.stdout.write(
+                    f"\t{name} ({len(password)} characters): {unbounded:.2f}ms without budget, "
+                    f"{bounded:.2f}ms with budget, {cached:.2f}ms cached"
+                )
@@ -1,23 +1,27 @@
 """password policy"""
 
-import re
+from collections import Counter, defaultdict
+from functools import cached_property
 from hashlib import sha1
+from string import ascii_lowercase, ascii_uppercase, digits
 
 from django.db import models
 from django.utils.translation import gettext as _
 from rest_framework.serializers import BaseSerializer
 from structlog.stdlib import get_logger
-from zxcvbn import zxcvbn
 
-from authentik.lib.utils.http import get_http_session
 from authentik.policies.models import Policy
+from authentik.policies.password.hibp import hibp_count
+from authentik.policies.password.strength import estimate_strength
 from authentik.policies.types import PolicyRequest, PolicyResult
 from authentik.stages.prompt.stage import PLAN_CONTEXT_PROMPT
 
 LOGGER = get_logger()
-RE_LOWER = re.compile("[a-z]")
-RE_UPPER = re.compile("[A-Z]")
-RE_DIGITS = re.compile("[0-9]")
+# Character classes counted by static rules, which characters are translated to
+CLASS_DIGIT = "d"
+CLASS_LOWER = "l"
+CLASS_UPPER = "u"
+CLASS_SYMBOL = "s"
 
 
 class PasswordPolicy(Policy):
@@ -87,47 +91,44 @@ class PasswordPolicy(Policy):
                 return zxcvbn_result
         return PolicyResult(True)
 
+    @cached_property
+    def static_rules_table(self) -> dict[int, str]:
+        """Translation table from each character to the classes it's counted as by static
+        rules, for example `a` to `l`, or `ls` when `a` is also in the symbol charset.
+        Other characters are kept as they are, and never count as any class"""
+        classes: dict[str, str] = defaultdict(str)
+        for chars, char_class in [
+            (digits, CLASS_DIGIT),
+            (ascii_lowercase, CLASS_LOWER),
+            (ascii_uppercase, CLASS_UPPER),
+            (self.symbol_charset, CLASS_SYMBOL),
+        ]:
+            for char in chars:
+                if char_class not in classes[char]:
+                    classes[char] += char_class
+        return str.maketrans(dict(classes))
+
     def passes_static(self, password: str, request: PolicyRequest) -> PolicyResult:
-        """Check static rules"""
-        if len(password) < self.length_min:
-            LOGGER.debug("password failed", check="static", reason="length")
-            return PolicyResult(False, self.error_message)
-
-        if self.amount_digits > 0 and len(RE_DIGITS.findall(password)) < self.amount_digits:
-            LOGGER.debug("password failed", check="static", reason="amount_digits")
-            return PolicyResult(False, self.error_message)
-        if self.amount_lowercase > 0 and len(RE_LOWER.findall(password)) < self.amount_lowercase:
-            LOGGER.debug("password failed", check="static", reason="amount_lowercase")
-            return PolicyResult(False, self.error_message)
-        if self.amount_uppercase > 0 and len(RE_UPPER.findall(password)) < self.amount_lowercase:
-            LOGGER.debug("password failed", check="static", reason="amount_uppercase")
-            return PolicyResult(False, self.error_message)
-        if self.amount_symbols > 0:
-            count = 0
-            for symbol in self.symbol_charset:
-                count += password.count(symbol)
-            if count < self.amount_symbols:
-                LOGGER.debug("password failed", check="static", reason="amount_symbols")
+        """Check static rules, counting all character classes in a single scan"""
+        counts = Counter(password.translate(self.static_rules_table))
+        for reason, count, minimum in [
+            ("length", len(password), self.length_min),
+            ("amount_digits", counts[CLASS_DIGIT], self.amount_digits),
+            ("amount_lowercase", counts[CLASS_LOWER], self.amount_lowercase),
+            ("amount_uppercase", counts[CLASS_UPPER], self.amount_uppercase),
+            ("amount_symbols", counts[CLASS_SYMBOL], self.amount_symbols),
+        ]:
+            if count < minimum:
+                LOGGER.debug("password failed", check="static", reason=reason)
                 return PolicyResult(False, self.error_message)
-
         return PolicyResult(True)
 
-    def check_hibp(self, short_hash: str) -> str:
-        """Check the haveibeenpwned API"""
-        url = f"https://api.pwnedpasswords.com/range/{short_hash}"
-        return get_http_session().get(url).text
-
     def passes_hibp(self, password: str, request: PolicyRequest) -> PolicyResult:
-        """Check if password is in HIBP DB. Hashes given Password with SHA1, uses the first 5
-        characters of Password in request and checks if full hash is in response. Returns 0
-        if Password is not in result otherwise the count of how many times it was used."""
+        """Check if password is in HIBP DB. Hashes given Password with SHA1 and looks up how
+        many times the hash was seen, using the first 5 characters of the hash to query the
+        (cached) range of hashes from the API, or the offline dataset if configured."""
         pw_hash = sha1(password.encode("utf-8")).hexdigest()  # nosec
-        result = self.check_hibp(pw_hash[:5])
-        final_count = 0
-        for line in result.split("\r\n"):
-            full_hash, count = line.split(":")
-            if pw_hash[5:] == full_hash.lower():
-                final_count = int(count)
+        final_count = hibp_count(pw_hash)
         LOGGER.debug("got hibp result", count=final_count, hash=pw_hash[:5])
         if final_count > self.hibp_allowed_count:
             LOGGER.debug("password failed", check="hibp", count=final_count)
@@ -144,10 +145,7 @@ class PasswordPolicy(Policy):
             user_inputs.append(request.user.email)
         if request.http_request:
             user_inputs.append(request.http_request.brand.branding_title)
-        # Only calculate result for the first 100 characters, as with over 100 char
-        # long passwords we can be reasonably sure that they'll surpass the score anyways
-        # See https://github.com/dropbox/zxcvbn#runtime-latency
-        results = zxcvbn(password[:100], user_inputs)
+        results = estimate_strength(password, user_inputs)
         LOGGER.debug("password failed", check="zxcvbn", score=results["score"])
         result = PolicyResult(results["score"] > self.zxcvbn_score_threshold)
         if not result.passing:
@@ -0,0 +1,88 @@
+"""Password strength estimation with zxcvbn"""
+
+from collections.abc import Generator
+from contextlib import contextmanager
+from signal import ITIMER_PROF, SIGPROF, setitimer, signal
+from threading import Lock, current_thread, main_thread
+
+from django.core.cache import cache
+from django.utils.crypto import salted_hmac
+from structlog.stdlib import get_logger
+
+# Importing zxcvbn loads its frequency lists, which happens once per process
+# (before policy processes are forked)
+from zxcvbn import zxcvbn
+
+from authentik.lib.config import CONFIG
+
+LOGGER = get_logger()
+CACHE_KEY_PREFIX = "goauthentik.io/policies/password/zxcvbn/"
+# Only calculate result for the first 100 characters, as with over 100 char
+# long passwords we can be reasonably sure that they'll surpass the score anyways
+# See https://github.com/dropbox/zxcvbn#runtime-latency
+MAX_LENGTH = 100
+# Shortest prefix of the password which is estimated when the CPU time budget is exceeded
+MIN_LENGTH = 16
+KEY_SALT = "authentik.policies.password.strength"
+
+# zxcvbn keeps the user inputs in a module-level dictionary
+_zxcvbn_lock = Lock()
+
+
+class CPUBudgetExceeded(Exception):
+    """Estimating the strength of a password took more CPU time than allowed"""
+
+
+def _budget_exceeded(signum, frame):
+    raise CPUBudgetExceeded()
+
+
+@contextmanager
+def cpu_budget(milliseconds: int) -> Generator[None]:
+    """Raise CPUBudgetExceeded when the process spends more than `milliseconds` of CPU time
+    within this block. Only enforced in the main thread (which policies are evaluated in
+    when they run in their own process), as signals can't be handled in other threads."""
+    if milliseconds <= 0 or current_thread() is not main_thread():
+        yield
+        return
+    previous = signal(SIGPROF, _budget_exceeded)
+    setitimer(ITIMER_PROF, milliseconds / 1000)
+    try:
+        yield
+    finally:
+        setitimer(ITIMER_PROF, 0)
+        signal(SIGPROF, previous)
+
+
+def _estimate(password: str, user_inputs: list[str]) -> dict:
+    with _zxcvbn_lock:
+        results = zxcvbn(password, user_inputs)
+    return {"score": results["score"], "feedback": results["feedback"]}
+
+
+def estimate_strength(password: str, user_inputs: list[str]) -> dict:
+    """Get the zxcvbn score and feedback for `password`. Results are cached briefly, keyed by
+    a salted hash of the password and user inputs, as prompt stages validate the same password
+    on every submit.
+
+    When estimating takes longer than the CPU time budget, shorter prefixes of the password
+    are estimated instead, which can only under-estimate its strength"""
+    password = password[:MAX_LENGTH]
+    key = salted_hmac(KEY_SALT, "\0".join([password, *user_inputs]), algorithm="sha256")
+    key = f"{CACHE_KEY_PREFIX}{key.hexdigest()}"
+    result = cache.get(key)
+    if result is not None:
+        return result
+    budget = CONFIG.get_int("zxcvbn.cpu_budget_ms", 500)
+    length = len(password)
+    while result is None:
+        try:
+            with cpu_budget(budget):
+                result = _estimate(password[:length], user_inputs)
+        except CPUBudgetExceeded:
+            LOGGER.info("zxcvbn exceeded CPU time budget", length=length, budget=budget)
+            if length <= MIN_LENGTH:
+                result = {"score": 0, "feedback": {"warning": "", "suggestions": []}}
+            length = max(length // 2, MIN_LENGTH)
+    cache.set(key, result, CONFIG.get_int("zxcvbn.cache_timeout", 300))
+    return result
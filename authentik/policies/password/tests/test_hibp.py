@@ -1,9 +1,16 @@
 """Password Policy HIBP tests"""
 
+from hashlib import sha1
+from tempfile import NamedTemporaryFile
+
+from django.core.cache import cache
 from django.test import TestCase
 from guardian.shortcuts import get_anonymous_user
+from requests_mock import Mocker
 
+from authentik.lib.config import CONFIG
 from authentik.lib.generators import generate_key
+from authentik.policies.password.hibp import HIBP_RANGE_URL, HIBPRange, hibp_count
 from authentik.policies.password.models import PasswordPolicy
 from authentik.policies.types import PolicyRequest, PolicyResult
 from authentik.stages.prompt.stage import PLAN_CONTEXT_PROMPT
@@ -49,3 +56,44 @@ class TestPasswordPolicyHIBP(TestCase):
         result: PolicyResult = policy.passes(request)
         self.assertTrue(result.passing)
         self.assertEqual(result.messages, tuple())
+
+    def test_range(self):
+        """Test parsing and searching a range"""
+        hibp_range = HIBPRange.parse(
+            "0018A45C4D1DEF81644B54AB7F969B88D65:1\r\n"
+            "00D4F6E8FA6EECAD2A3AA415EEC418D38EC:2\r\n"
+            "011053FD0102E94D6AE2F8B83D76FAF94F6:0\r\n"
+            "012A7CA357541F0AC487871FEEC1891C49C:12"
+        )
+        self.assertEqual(len(hibp_range), 3)
+        self.assertEqual(hibp_range.count("012a7ca357541f0ac487871feec1891c49c"), 12)
+        self.assertEqual(hibp_range.count("0018A45C4D1DEF81644B54AB7F969B88D65"), 1)
+        # Padding entry
+        self.assertEqual(hibp_range.count("011053FD0102E94D6AE2F8B83D76FAF94F6"), 0)
+        self.assertEqual(hibp_range.count("FFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFF"), 0)
+
+    @Mocker()
+    def test_range_cached(self, mock: Mocker):
+        """Test ranges being cached"""
+        cache.clear()
+        pw_hash = sha1(generate_key().encode()).hexdigest()  # nosec
+        mock.get(f"{HIBP_RANGE_URL}{pw_hash[:5]}", text=f"{pw_hash[5:].upper()}:3")
+        self.assertEqual(hibp_count(pw_hash), 3)
+        self.assertEqual(hibp_count(pw_hash), 3)
+        self.assertEqual(mock.call_count, 1)
+
+    def test_dataset(self):
+        """Test offline dataset"""
+        hashes = sorted(
+            sha1(generate_key().encode()).hexdigest().upper()
+            for _ in range(10)  # nosec
+        )
+        with NamedTemporaryFile("w", suffix=".txt") as dataset:
+            for idx, pw_hash in enumerate(hashes):
+                dataset.write(f"{pw_hash}:{idx + 1}\r\n")
+            dataset.flush()
+            with CONFIG.patch("hibp.dataset", dataset.name):
+                for idx, pw_hash in enumerate(hashes):
+                    self.assertEqual(hibp_count(pw_hash.lower()), idx + 1)
+                self.assertEqual(hibp_count("0" * 40), 0)
+                self.assertEqual(hibp_count("f" * 40), 0)
@@ -3,7 +3,7 @@
 from django.test import TestCase
 from guardian.shortcuts import get_anonymous_user
 
-from authentik.lib.generators import generate_key
+from authentik.lib.generators import generate_id, generate_key
 from authentik.policies.password.models import PasswordPolicy
 from authentik.policies.types import PolicyRequest, PolicyResult
 
@@ -76,3 +76,23 @@ class TestPasswordPolicy(TestCase):
         result: PolicyResult = self.policy.passes(request)
         self.assertTrue(result.passing)
         self.assertEqual(result.messages, tuple())
+
+    def test_uppercase_amount(self):
+        """Test uppercase characters being checked against amount_uppercase"""
+        policy = PasswordPolicy.objects.create(
+            name=generate_id(),
+            amount_uppercase=3,
+            amount_lowercase=1,
+            symbol_charset="!a",
+            amount_symbols=2,
+            error_message="test message",
+        )
+        request = PolicyRequest(get_anonymous_user())
+        request.context["password"] = "ABcdef!"  # nosec
+        result: PolicyResult = policy.passes(request)
+        self.assertFalse(result.passing)
+        self.assertEqual(result.messages, ("test message",))
+        # Characters can count as symbol and lowercase
+        request.context["password"] = "ABCa!"  # nosec
+        result: PolicyResult = policy.passes(request)
+        self.assertTrue(result.passing)
@@ -1,10 +1,14 @@
 """Password Policy zxcvbn tests"""
 
+from unittest.mock import patch
+
 from django.test import TestCase
 from guardian.shortcuts import get_anonymous_user
+from zxcvbn import zxcvbn
 
 from authentik.lib.generators import generate_key
 from authentik.policies.password.models import PasswordPolicy
+from authentik.policies.password.strength import CPUBudgetExceeded, estimate_strength
 from authentik.policies.types import PolicyRequest, PolicyResult
 from authentik.stages.prompt.stage import PLAN_CONTEXT_PROMPT
 
@@ -57,3 +61,26 @@ class TestPasswordPolicyZxcvbn(TestCase):
         result: PolicyResult = policy.passes(request)
         self.assertTrue(result.passing)
         self.assertEqual(result.messages, tuple())
+
+    def test_cached(self):
+        """Test results being cached per password and user inputs"""
+        password = generate_key()
+        with patch("authentik.policies.password.strength.zxcvbn", wraps=zxcvbn) as mock:
+            estimate_strength(password, ["foo"])
+            estimate_strength(password, ["foo"])
+            self.assertEqual(mock.call_count, 1)
+            estimate_strength(password, ["bar"])
+            self.assertEqual(mock.call_count, 2)
+
+    def test_cpu_budget(self):
+        """Test shorter prefixes being estimated when exceeding the CPU time budget"""
+
+        def slow_zxcvbn(password: str, user_inputs: list[str]):
+            if len(password) > 20:  # noqa: PLR2004
+                raise CPUBudgetExceeded()
+            return zxcvbn(password, user_inputs)
+
+        with patch("authentik.policies.password.strength.zxcvbn", side_effect=slow_zxcvbn) as mock:
+            result = estimate_strength(generate_key(), [])
+        self.assertEqual([len(call.args[0]) for call in mock.call_args_list], [100, 50, 25, 16])
+        self.assertGreater(result["score"], 0)
@@ -3,6 +3,7 @@
 from datetime import timedelta
 from uuid import uuid4
 
+from django.core.cache import cache
 from django.db import models
 from django.db.models import Sum
 from django.db.models.query_utils import Q
@@ -19,6 +20,8 @@ from authentik.policies.types import PolicyRequest, PolicyResult
 from authentik.root.middleware import ClientIPMiddleware
 
 LOGGER = get_logger()
+# Changes of scores are counted in the cache, and periodically saved to the database
+CACHE_KEY_PREFIX = "goauthentik.io/policies/reputation/scores/"
 
 
 def reputation_expiry():
@@ -26,6 +29,37 @@ def reputation_expiry():
     return now() + timedelta(seconds=CONFIG.get_int("reputation.expiry"))
 
 
+def cache_key_pair(ip: str, identifier: str) -> str:
+    """Cache key counting the score change of an IP and identifier"""
+    return f"{CACHE_KEY_PREFIX}pair/{ip}/{identifier}"
+
+
+def cache_key_ip(ip: str) -> str:
+    """Cache key counting the score change of an IP, with any identifier"""
+    return f"{CACHE_KEY_PREFIX}ip/{ip}"
+
+
+def cache_key_identifier(identifier: str) -> str:
+    """Cache key counting the score change of an identifier, from any IP"""
+    return f"{CACHE_KEY_PREFIX}identifier/{identifier}"
+
+
+def pending_score(ip: str | None, identifier: str | None) -> int:
+    """Get the score change of `ip` and/or `identifier` which hasn't been saved
+    to the database yet"""
+    keys = []
+    if ip:
+        keys.append(cache_key_ip(ip))
+    if identifier:
+        keys.append(cache_key_identifier(identifier))
+    values = cache.get_many(keys)
+    score = sum(int(values.get(key) or 0) for key in keys)
+    if ip and identifier:
+        # Changes of this pair are counted for both the IP and the identifier
+        score -= int(cache.get(cache_key_pair(ip, identifier)) or 0)
+    return score
+
+
 class ReputationPolicy(Policy):
     """Return true if request IP/target username's score is below a certain threshold"""
 
@@ -53,6 +87,10 @@ class ReputationPolicy(Policy):
         score = (
             Reputation.objects.filter(query).aggregate(total_score=Sum("score"))["total_score"] or 0
         )
+        score += pending_score(
+            remote_ip if self.check_ip else None,
+            request.user.username if self.check_username else None,
+        )
         passing = score <= self.threshold
         LOGGER.debug(
             "Score for user",
@@ -1,16 +1,19 @@
 """authentik reputation request signals"""
 
 from django.contrib.auth.signals import user_logged_in
-from django.db import transaction
-from django.db.models import F
+from django.core.cache import cache
 from django.dispatch import receiver
 from django.http import HttpRequest
+from django_redis import get_redis_connection
 from structlog.stdlib import get_logger
 
 from authentik.core.signals import login_failed
-from authentik.events.context_processors.asn import ASN_CONTEXT_PROCESSOR
-from authentik.events.context_processors.geoip import GEOIP_CONTEXT_PROCESSOR
-from authentik.policies.reputation.models import Reputation, reputation_expiry
+from authentik.lib.config import CONFIG
+from authentik.policies.reputation.models import (
+    cache_key_identifier,
+    cache_key_ip,
+    cache_key_pair,
+)
 from authentik.root.middleware import ClientIPMiddleware
 from authentik.stages.identification.signals import identification_failed
 
@@ -18,24 +21,22 @@ LOGGER = get_logger()
 
 
 def update_score(request: HttpRequest, identifier: str, amount: int):
-    """Update score for IP and User"""
-    remote_ip = ClientIPMiddleware.get_client_ip(request)
+    """Update score for IP and User. Changes are counted atomically in the cache and saved to
+    the database by `save_reputation`, so concurrent updates don't wait on row locks.
 
-    with transaction.atomic():
-        reputation, created = Reputation.objects.select_for_update().get_or_create(
-            ip=remote_ip,
-            identifier=identifier,
-            defaults={
-                "score": amount,
-                "ip_geo_data": GEOIP_CONTEXT_PROCESSOR.city_dict(remote_ip) or {},
-                "ip_asn_data": ASN_CONTEXT_PROCESSOR.asn_dict(remote_ip) or {},
-                "expires": reputation_expiry(),
-            },
-        )
-
-        if not created:
-            reputation.score = F("score") + amount
-            reputation.save()
+    The expiry of all counters is refreshed with every change, so the IP and identifier
+    counters never expire before the pair counters they include"""
+    remote_ip = ClientIPMiddleware.get_client_ip(request)
+    expiry = CONFIG.get_int("reputation.expiry")
+    pipeline = get_redis_connection().pipeline(transaction=True)
+    for key in (
+        cache_key_pair(remote_ip, identifier),
+        cache_key_ip(remote_ip),
+        cache_key_identifier(identifier),
+    ):
+        pipeline.incrby(cache.make_key(key), amount)
+        pipeline.expire(cache.make_key(key), expiry)
+    pipeline.execute()
     LOGGER.debug("Updated score", amount=amount, for_user=identifier, for_ip=remote_ip)
 
 
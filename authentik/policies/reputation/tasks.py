@@ -0,0 +1,105 @@
+"""Reputation tasks"""
+
+from ipaddress import ip_address
+from itertools import islice
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
+from structlog.stdlib import get_logger
+
+from authentik.events.context_processors.asn import ASN_CONTEXT_PROCESSOR
+from authentik.events.context_processors.geoip import GEOIP_CONTEXT_PROCESSOR
+from authentik.events.models import TaskStatus
+from authentik.events.system_tasks import SystemTask, prefill_task
+from authentik.policies.reputation.models import (
+    CACHE_KEY_PREFIX,
+    Reputation,
+    cache_key_identifier,
+    cache_key_ip,
+    cache_key_pair,
+    reputation_expiry,
+)
+from authentik.root.celery import CELERY_APP
+
+LOGGER = get_logger()
+# Number of scores saved in one transaction
+BATCH_SIZE = 1000
+
+
+def _normalize_ip(ip: str) -> str:
+    return str(ip_address(ip))
+
+
+def _decrement(key: str, amount: int):
+    # Counters which reach 0 are left to expire, as deleting them would race with changes
+    # counted in between, and the flush skips them
+    try:
+        cache.decr(key, amount)
+    except ValueError:
+        # The key has expired
+        pass
+
+
+def save_batch(deltas: dict[tuple[str, str], int]):
+    """Add the score changes of a batch of IPs and identifiers to their reputation,
+    creating the reputation (with GeoIP and ASN data of the IP) when it doesn't exist yet"""
+    with transaction.atomic():
+        existing = {
+            (_normalize_ip(reputation.ip), reputation.identifier): reputation
+            for reputation in Reputation.objects.select_for_update().filter(
+                ip__in={ip for ip, identifier in deltas},
+                identifier__in={identifier for ip, identifier in deltas},
+            )
+        }
+        updated = []
+        created = []
+        for (ip, identifier), delta in deltas.items():
+            reputation = existing.get((_normalize_ip(ip), identifier))
+            if reputation:
+                reputation.score += delta
+                updated.append(reputation)
+                continue
+            created.append(
+                Reputation(
+                    ip=ip,
+                    identifier=identifier,
+                    score=delta,
+                    ip_geo_data=GEOIP_CONTEXT_PROCESSOR.city_dict(ip) or {},
+                    ip_asn_data=ASN_CONTEXT_PROCESSOR.asn_dict(ip) or {},
+                    expires=reputation_expiry(),
+                )
+            )
+        Reputation.objects.bulk_update(updated, ["score"])
+        Reputation.objects.bulk_create(created)
+    # Only remove the saved changes from the cache once they're in the database, changes
+    # counted since are kept
+    for (ip, identifier), delta in deltas.items():
+        _decrement(cache_key_pair(ip, identifier), delta)
+        _decrement(cache_key_ip(ip), delta)
+        _decrement(cache_key_identifier(identifier), delta)
+
+
+@CELERY_APP.task(bind=True, base=SystemTask)
+@prefill_task
+def save_reputation(self: SystemTask):
+    """Save score changes counted in the cache to the database in batches"""
+    prefix = f"{CACHE_KEY_PREFIX}pair/"
+    deltas: dict[tuple[str, str], int] = {}
+    for key, value in cache.get_many(cache.keys(f"{prefix}*") or []).items():
+        if not value:
+            continue
+        ip, identifier = key.removeprefix(prefix).split("/", 1)
+        try:
+            _normalize_ip(ip)
+        except ValueError:
+            LOGGER.warning("Invalid IP in reputation score", ip=ip)
+            continue
+        deltas[(ip, identifier)] = int(value)
+    pending = iter(deltas.items())
+    while batch := dict(islice(pending, BATCH_SIZE)):
+        save_batch(batch)
+    self.set_status(
+        TaskStatus.SUCCESSFUL,
+        _("Saved %(count)d reputation scores." % {"count": len(deltas)}),
+    )
@@ -1,11 +1,13 @@
 """test reputation signals and policy"""
 
+from django.core.cache import cache
 from django.test import RequestFactory, TestCase
 
 from authentik.core.models import User
 from authentik.lib.generators import generate_id
 from authentik.policies.reputation.api import ReputationPolicySerializer
 from authentik.policies.reputation.models import Reputation, ReputationPolicy
+from authentik.policies.reputation.tasks import save_reputation
 from authentik.policies.types import PolicyRequest
 from authentik.stages.password import BACKEND_INBUILT
 from authentik.stages.password.stage import authenticate
@@ -22,6 +24,7 @@ class TestReputationPolicy(TestCase):
         # We need a user for the one-to-one in userreputation
         self.user = User.objects.create(username=self.test_username)
         self.backends = [BACKEND_INBUILT]
+        cache.clear()
 
     def test_ip_reputation(self):
         """test IP reputation"""
@@ -29,6 +32,7 @@ class TestReputationPolicy(TestCase):
         authenticate(
             self.request, self.backends, username=self.test_username, password=self.test_username
         )
+        save_reputation.delay().get()
         self.assertEqual(Reputation.objects.get(ip=self.test_ip).score, -1)
 
     def test_user_reputation(self):
@@ -37,6 +41,7 @@ class TestReputationPolicy(TestCase):
         authenticate(
             self.request, self.backends, username=self.test_username, password=self.test_username
         )
+        save_reputation.delay().get()
         self.assertEqual(Reputation.objects.get(identifier=self.test_username).score, -1)
 
     def test_update_reputation(self):
@@ -46,8 +51,22 @@ class TestReputationPolicy(TestCase):
         authenticate(
             self.request, self.backends, username=self.test_username, password=self.test_username
         )
+        save_reputation.delay().get()
         self.assertEqual(Reputation.objects.get(identifier=self.test_username).score, 42)
 
+    def test_counter_expiry(self):
+        """Test that every change refreshes the expiry of the IP and identifier counters"""
+        ip_key = f"goauthentik.io/policies/reputation/scores/ip/{self.test_ip}"
+        authenticate(
+            self.request, self.backends, username=self.test_username, password=self.test_username
+        )
+        cache.expire(ip_key, 10)
+        authenticate(
+            self.request, self.backends, username=generate_id(), password=self.test_username
+        )
+        self.assertGreater(cache.ttl(ip_key), 10)
+        self.assertEqual(cache.get(ip_key), -2)
+
     def test_policy(self):
         """Test Policy"""
         request = PolicyRequest(user=self.user)
@@ -56,6 +75,31 @@ class TestReputationPolicy(TestCase):
         )
         self.assertTrue(policy.passes(request).passing)
 
+    def test_policy_pending(self):
+        """Test Policy with score changes which haven't been saved yet"""
+        Reputation.objects.create(identifier=self.test_username, ip=self.test_ip, score=-1)
+        Reputation.objects.create(identifier=generate_id(), ip=self.test_ip, score=-1)
+        authenticate(
+            self.request, self.backends, username=self.test_username, password=self.test_username
+        )
+        request = PolicyRequest(user=self.user)
+        request.http_request = self.request
+        policy: ReputationPolicy = ReputationPolicy.objects.create(name=generate_id(), threshold=-4)
+        # -1 (saved) + -1 (saved, other identifier) + -1 (pending), the pending change of
+        # the IP and identifier is only counted once
+        self.assertFalse(policy.passes(request).passing)
+        policy.threshold = -3
+        self.assertTrue(policy.passes(request).passing)
+        save_reputation.delay().get()
+        self.assertEqual(
+            Reputation.objects.get(identifier=self.test_username, ip=self.test_ip).score, -2
+        )
+        self.assertTrue(policy.passes(request).passing)
+        # Saved changes are removed from the counter, which is left to expire
+        self.assertEqual(
+            cache.get(f"goauthentik.io/policies/reputation/scores/ip/{self.test_ip}"), 0
+        )
+
     def test_api(self):
         """Test API Validation"""
         no_toggle = ReputationPolicySerializer(data={"name": generate_id(), "threshold": -5})
@@ -9,8 +9,9 @@ from drf_spectacular.utils import OpenApiParameter, OpenApiResponse, extend_sche
 from guardian.shortcuts import get_objects_for_user
 from rest_framework.decorators import action
 from rest_framework.exceptions import ValidationError
-from rest_framework.fields import CharField
+from rest_framework.fields import CharField, IntegerField
 from rest_framework.generics import get_object_or_404
+from rest_framework.relations import PrimaryKeyRelatedField
 from rest_framework.request import Request
 from rest_framework.response import Response
 from rest_framework.viewsets import ModelViewSet
@@ -18,9 +19,10 @@ from rest_framework.viewsets import ModelViewSet
 from authentik.core.api.providers import ProviderSerializer
 from authentik.core.api.used_by import UsedByMixin
 from authentik.core.api.utils import PassiveSerializer, PropertyMappingPreviewSerializer
-from authentik.core.models import Provider
+from authentik.core.models import Provider, User
 from authentik.providers.oauth2.id_token import IDToken
 from authentik.providers.oauth2.models import AccessToken, OAuth2Provider, ScopeMapping
+from authentik.providers.oauth2.revocation import revoke_tokens
 from authentik.rbac.decorators import permission_required
 
 
@@ -60,6 +62,18 @@ class OAuth2ProviderSetupURLs(PassiveSerializer):
     jwks = CharField(read_only=True)
 
 
+class OAuth2ProviderRevokeTokensSerializer(PassiveSerializer):
+    """Revoke all tokens issued by a provider, optionally only those of a single user"""
+
+    user = PrimaryKeyRelatedField(queryset=User.objects.all(), required=False)
+
+
+class OAuth2ProviderRevokedTokensSerializer(PassiveSerializer):
+    """Amount of revoked tokens"""
+
+    revoked = IntegerField(read_only=True)
+
+
 class OAuth2ProviderViewSet(UsedByMixin, ModelViewSet):
     """OAuth2Provider Viewset"""
 
@@ -189,3 +203,23 @@ class OAuth2ProviderViewSet(UsedByMixin, ModelViewSet):
         )
         serializer = PropertyMappingPreviewSerializer(instance={"preview": temp_token.to_dict()})
         return Response(serializer.data)
+
+    @permission_required(
+        "authentik_providers_oauth2.change_oauth2provider",
+    )
+    @extend_schema(
+        request=OAuth2ProviderRevokeTokensSerializer(),
+        responses={
+            200: OAuth2ProviderRevokedTokensSerializer(),
+            400: OpenApiResponse(description="Bad request"),
+        },
+    )
+    @action(detail=True, methods=["POST"])
+    def revoke_tokens(self, request: Request, pk: int) -> Response:
+        """Revoke all access and refresh tokens issued by this provider, optionally only
+        those of a single user"""
+        provider: OAuth2Provider = self.get_object()
+        data = OAuth2ProviderRevokeTokensSerializer(data=request.data)
+        data.is_valid(raise_exception=True)
+        revoked = revoke_tokens(user=data.validated_data.get("user"), provider=provider)
+        return Response(OAuth2ProviderRevokedTokensSerializer({"revoked": revoked}).data)
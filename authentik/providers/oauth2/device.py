@@ -0,0 +1,90 @@
+"""OAuth2 device code polling"""
+
+from hashlib import sha256
+from time import time
+
+from django.core.cache import cache
+from django.utils.timezone import now
+
+from authentik.lib.utils.time import timedelta_from_string
+from authentik.providers.oauth2.errors import DeviceCodeError, TokenError
+from authentik.providers.oauth2.models import DeviceToken, OAuth2Provider
+
+# Polling interval (in seconds) clients are told to use, and the interval
+# a client's polling is increased by when it polls too fast
+DEVICE_CODE_INTERVAL = 5
+CACHE_KEY_PREFIX = "goauthentik.io/providers/oauth2/device_code/"
+
+
+def device_code_cache_key(provider_pk: int, device_code: str) -> str:
+    """Cache key for the polling state of a pending device code"""
+    # Device codes are sent by the client, so we don't use them as-is
+    return f"{CACHE_KEY_PREFIX}{provider_pk}/{sha256(device_code.encode()).hexdigest()}"
+
+
+def device_code_changed_key(key: str) -> str:
+    """Cache key marking that the device code of the polling state `key` has been approved
+    or removed. Unlike the polling state, it's never written by polling clients"""
+    return f"{key}/changed"
+
+
+def poll_device_code(provider: OAuth2Provider, device_code: str) -> DeviceToken:
+    """Handle a client polling for a device code. Pending device codes are kept in the cache,
+    so that polling clients don't cause any database queries until the device code is
+    approved (which marks the code as changed). The polling interval is enforced
+    per device code as described in https://datatracker.ietf.org/doc/html/rfc8628#section-3.5.
+    Returns the device token once it has been approved, otherwise raises DeviceCodeError."""
+    key = device_code_cache_key(provider.pk, device_code)
+    current = time()
+    cached = cache.get_many([key, device_code_changed_key(key)])
+    state: dict | None = cached.get(key)
+    if state and device_code_changed_key(key) not in cached:
+        error = "authorization_pending"
+        if current - state["last_poll"] < state["interval"]:
+            state["interval"] += DEVICE_CODE_INTERVAL
+            error = "slow_down"
+        state["last_poll"] = current
+        cache.set(key, state, timeout=max(state["expires"] - current, 1))
+        raise DeviceCodeError(error)
+    token = DeviceToken.objects.filter(device_code=device_code, provider=provider).first()
+    if not token:
+        raise TokenError("invalid_grant")
+    if token.user:
+        return token
+    timeout = device_code_timeout(token, provider)
+    if timeout <= 0:
+        raise DeviceCodeError("expired_token")
+    # The code might be approved at any point after the token was read, which is picked up by
+    # the next poll as approving it only sets the changed marker
+    cache.set(
+        key,
+        {
+            "expires": current + timeout,
+            "interval": DEVICE_CODE_INTERVAL,
+            "last_poll": current,
+        },
+        timeout=timeout,
+    )
+    raise DeviceCodeError("authorization_pending")
+
+
+def device_code_timeout(token: DeviceToken, provider: OAuth2Provider) -> float:
+    """Seconds until `token` expires"""
+    expires = token.expires
+    if not expires:
+        expires = now() + timedelta_from_string(provider.access_code_validity)
+    return (expires - now()).total_seconds()
+
+
+def mark_device_code_changed(token: DeviceToken):
+    """Mark a device code as approved or removed, forcing the next polls to check the
+    database. The polling state itself isn't removed, as a client polling at the same time
+    could write it again"""
+    key = device_code_cache_key(token.provider_id, token.device_code)
+    try:
+        timeout = device_code_timeout(token, token.provider)
+    except OAuth2Provider.DoesNotExist:
+        # The provider has been deleted, so clients can't poll anymore
+        return
+    if timeout > 0:
+        cache.set(device_code_changed_key(key), True, timeout=timeout)
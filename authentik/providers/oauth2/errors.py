@@ -254,6 +254,11 @@ class DeviceCodeError(OAuth2Error):
             "The authorization request is still pending as the end user hasn't "
             "yet completed the user-interaction steps"
         ),
+        "slow_down": (
+            "The authorization request is still pending and polling should continue, "
+            "but the interval MUST be increased by 5 seconds for this and all subsequent "
+            "requests."
+        ),
         "access_denied": "The authorization request was denied.",
         "expired_token": (
             'The "device_code" has expired, and the device authorization '
@@ -0,0 +1,118 @@
+"""OAuth2 Scope mapping manager"""
+
+from collections.abc import Generator
+from threading import local
+from typing import TYPE_CHECKING, Any
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.db import connection
+from django.http import HttpRequest
+from structlog.stdlib import get_logger
+
+from authentik.core.expression.exceptions import PropertyMappingExpressionException
+from authentik.core.models import User
+from authentik.events.models import Event, EventAction
+from authentik.lib.expression.exceptions import ControlFlowException
+from authentik.lib.sync.mapper import PropertyMappingManager
+from authentik.providers.oauth2.models import ScopeMapping
+
+if TYPE_CHECKING:
+    from authentik.providers.oauth2.models import OAuth2Provider
+
+LOGGER = get_logger()
+CACHE_KEY_PREFIX = "goauthentik.io/providers/oauth2/scope_mappings/"
+
+# Compiled code objects can't be stored in the shared cache, and evaluators
+# keep per-evaluation state, so compiled managers are kept per thread
+_managers = local()
+
+
+def scope_mapping_cache_key(provider_pk: int | str) -> str:
+    """Cache key holding the current version of a provider's compiled scope mappings"""
+    return f"{CACHE_KEY_PREFIX}{provider_pk}"
+
+
+class ScopeMappingManager(PropertyMappingManager):
+    """Pre-compiled scope mappings of a single OAuth2 provider"""
+
+    def __init__(self, provider: "OAuth2Provider") -> None:
+        super().__init__(
+            ScopeMapping.objects.filter(provider=provider).order_by("scope_name"),
+            ScopeMapping,
+            ["user", "provider", "token"],
+        )
+
+    def compile(self):
+        # Compile each mapping on its own, so a single mapping with invalid syntax
+        # doesn't prevent all other mappings from being evaluated. The broken mapping
+        # will be compiled again when it's evaluated, and the error will be reported then.
+        self._evaluators = []
+        for mapping in self.query_set:
+            evaluator = self._evaluator(mapping)
+            try:
+                evaluator.compile()
+            except (SyntaxError, ValueError) as exc:
+                LOGGER.warning("Failed to compile scope mapping", mapping=mapping, exc=exc)
+            self._evaluators.append(evaluator)
+
+    def iter_scopes(
+        self,
+        scopes: list[str],
+        user: User,
+        request: HttpRequest | None,
+        **kwargs,
+    ) -> Generator[tuple[Any, ScopeMapping], None]:
+        """Evaluate all mappings for the given scopes, skipping (and reporting)
+        any mapping that fails to evaluate"""
+        for evaluator in self._evaluators:
+            mapping: ScopeMapping = evaluator.model
+            if mapping.scope_name not in scopes:
+                continue
+            evaluator.set_context(user, request, **kwargs)
+            try:
+                try:
+                    value = evaluator.evaluate(mapping.expression)
+                except ControlFlowException as exc:
+                    raise exc
+                except Exception as exc:
+                    raise PropertyMappingExpressionException(exc, mapping) from exc
+            except PropertyMappingExpressionException as exc:
+                event = Event.new(
+                    EventAction.CONFIGURATION_ERROR,
+                    message=f"Failed to evaluate property-mapping: '{mapping.name}'",
+                    provider=kwargs.get("provider"),
+                    mapping=mapping,
+                )
+                if request:
+                    event.from_http(request)
+                else:
+                    event.save()
+                LOGGER.warning("Failed to evaluate property mapping", exc=exc)
+                continue
+            yield value, mapping
+
+    @staticmethod
+    def for_provider(provider: "OAuth2Provider") -> "ScopeMappingManager":
+        """Get the compiled scope mappings for `provider`, re-using a previously
+        compiled set unless the mappings have been changed since"""
+        key = scope_mapping_cache_key(provider.pk)
+        version = cache.get(key)
+        if not version:
+            version = uuid4().hex
+            cache.set(key, version, timeout=None)
+        managers: dict = getattr(_managers, "managers", None)
+        if managers is None:
+            managers = _managers.managers = {}
+        local_key = (connection.schema_name, provider.pk)
+        cached_version, manager = managers.get(local_key, (None, None))
+        if cached_version != version:
+            manager = ScopeMappingManager(provider)
+            managers[local_key] = (version, manager)
+        return manager
+
+
+def invalidate_scope_mappings():
+    """Invalidate compiled scope mappings of all providers"""
+    keys = cache.keys(scope_mapping_cache_key("*")) or []
+    cache.delete_many(keys)
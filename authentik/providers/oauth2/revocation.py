@@ -0,0 +1,91 @@
+"""OAuth2 token revocation"""
+
+from collections.abc import Iterable
+from hashlib import sha256
+
+from django.core.cache import cache
+from django.db.models import Max, QuerySet
+from django.utils.timezone import now
+from structlog.stdlib import get_logger
+
+from authentik.core.models import User
+from authentik.providers.oauth2.models import (
+    AccessToken,
+    AuthorizationCode,
+    OAuth2Provider,
+    RefreshToken,
+)
+
+LOGGER = get_logger()
+CACHE_KEY_PREFIX = "goauthentik.io/providers/oauth2/revoked/"
+
+
+def revoked_token_cache_key(token: str) -> str:
+    """Cache key marking a token as revoked"""
+    return f"{CACHE_KEY_PREFIX}{sha256(token.encode()).hexdigest()}"
+
+
+def is_token_revoked(token: str) -> bool:
+    """Check if a token was revoked, without querying the database"""
+    return cache.get(revoked_token_cache_key(token), False)
+
+
+def session_id_for_key(session_key: str) -> str:
+    """Hashed session key, as saved in `session_id` of grants"""
+    return sha256(session_key.encode("ascii")).hexdigest()
+
+
+def _revoke_access_tokens(access_tokens: QuerySet) -> int:
+    """Revoke all access tokens in `access_tokens` with a single UPDATE, and add them to the
+    deny-list in the cache for as long as they would otherwise be valid"""
+    tokens = list(access_tokens.values_list("token", flat=True))
+    if tokens:
+        latest_expiry = access_tokens.aggregate(latest=Max("expires"))["latest"]
+        timeout = max((latest_expiry - now()).total_seconds(), 1) if latest_expiry else None
+        cache.set_many(
+            {revoked_token_cache_key(token): True for token in tokens},
+            timeout=timeout,
+        )
+    return access_tokens.update(revoked=True)
+
+
+def revoke_tokens(
+    user: User | None = None,
+    session_id: str | None = None,
+    provider: OAuth2Provider | None = None,
+) -> int:
+    """Revoke all access and refresh tokens matching all the given filters, and delete
+    all pending authorization codes. Tokens are revoked with a single UPDATE per token type,
+    and revoked access tokens are added to a deny-list in the cache for as long as they would
+    otherwise be valid. Returns the amount of revoked tokens."""
+    filters = {}
+    if user:
+        filters["user"] = user
+    if session_id:
+        filters["session_id"] = session_id
+    if provider:
+        filters["provider"] = provider
+    if not filters:
+        raise ValueError("At least one of user, session_id or provider is required")
+
+    revoked = _revoke_access_tokens(AccessToken.objects.filter(revoked=False, **filters))
+    revoked += RefreshToken.objects.filter(revoked=False, **filters).update(revoked=True)
+    AuthorizationCode.objects.filter(**filters).delete()
+    LOGGER.info("Revoked tokens", amount=revoked, **filters)
+    return revoked
+
+
+def revoke_session_tokens(session_keys: Iterable[str]) -> int:
+    """Revoke the access tokens and delete the authorization codes issued in the sessions
+    with `session_keys`, when the sessions end. Refresh tokens are kept, as they are only
+    issued for offline access, which is meant to outlive the session.
+    Returns the amount of revoked tokens."""
+    session_ids = [session_id_for_key(session_key) for session_key in session_keys]
+    if not session_ids:
+        return 0
+    revoked = _revoke_access_tokens(
+        AccessToken.objects.filter(revoked=False, session_id__in=session_ids)
+    )
+    AuthorizationCode.objects.filter(session_id__in=session_ids).delete()
+    LOGGER.debug("Revoked session tokens", amount=revoked, sessions=len(session_ids))
+    return revoked
@@ -0,0 +1,44 @@
+"""OAuth2 provider signals"""
+
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from authentik.core.models import Provider
+from authentik.core.signals import authenticated_sessions_deleted
+from authentik.providers.oauth2.device import mark_device_code_changed
+from authentik.providers.oauth2.mapper import invalidate_scope_mappings
+from authentik.providers.oauth2.models import DeviceToken, ScopeMapping
+from authentik.providers.oauth2.revocation import revoke_session_tokens
+
+
+@receiver(post_save, sender=ScopeMapping)
+@receiver(post_delete, sender=ScopeMapping)
+def scope_mapping_changed(sender, instance: ScopeMapping, **_):
+    """Invalidate compiled scope mappings when a scope mapping is changed"""
+    invalidate_scope_mappings()
+
+
+@receiver(m2m_changed, sender=Provider.property_mappings.through)
+def provider_mappings_changed(sender, action: str, **_):
+    """Invalidate compiled scope mappings when a provider's mappings are changed"""
+    if action.startswith("post_"):
+        invalidate_scope_mappings()
+
+
+@receiver(post_save, sender=DeviceToken)
+def device_token_approved(sender, instance: DeviceToken, **_):
+    """Make polling clients check the database when a device token is approved"""
+    if instance.user_id:
+        mark_device_code_changed(instance)
+
+
+@receiver(post_delete, sender=DeviceToken)
+def device_token_removed(sender, instance: DeviceToken, **_):
+    """Make polling clients check the database when a device token is removed"""
+    mark_device_code_changed(instance)
+
+
+@receiver(authenticated_sessions_deleted)
+def authenticated_sessions_revoke_tokens(sender, session_keys: list[str], **_):
+    """Revoke the access tokens issued during sessions when the sessions end"""
+    revoke_session_tokens(session_keys)
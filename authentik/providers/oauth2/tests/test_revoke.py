@@ -7,10 +7,21 @@ from dataclasses import asdict
 from django.urls import reverse
 from django.utils import timezone
 
-from authentik.core.models import Application
+from authentik.core.models import Application, AuthenticatedSession
 from authentik.core.tests.utils import create_test_admin_user, create_test_cert, create_test_flow
 from authentik.lib.generators import generate_id
-from authentik.providers.oauth2.models import AccessToken, IDToken, OAuth2Provider, RefreshToken
+from authentik.providers.oauth2.models import (
+    AccessToken,
+    AuthorizationCode,
+    IDToken,
+    OAuth2Provider,
+    RefreshToken,
+)
+from authentik.providers.oauth2.revocation import (
+    is_token_revoked,
+    revoke_tokens,
+    session_id_for_key,
+)
 from authentik.providers.oauth2.tests.utils import OAuthTestCase
 
 
@@ -101,3 +112,125 @@ class TesOAuth2Revoke(OAuthTestCase):
             },
         )
         self.assertEqual(res.status_code, 401)
+
+    def test_revoke_tokens_session(self):
+        """Test revoking all tokens of a session"""
+        session_id = generate_id()
+        access = AccessToken.objects.create(
+            provider=self.provider,
+            user=self.user,
+            token=generate_id(),
+            auth_time=timezone.now(),
+            session_id=session_id,
+            _scope="openid user profile",
+            _id_token=json.dumps(asdict(IDToken("foo", "bar"))),
+        )
+        refresh = RefreshToken.objects.create(
+            provider=self.provider,
+            user=self.user,
+            token=generate_id(),
+            auth_time=timezone.now(),
+            session_id=session_id,
+            _scope="openid user profile",
+            _id_token=json.dumps(asdict(IDToken("foo", "bar"))),
+        )
+        other = AccessToken.objects.create(
+            provider=self.provider,
+            user=self.user,
+            token=generate_id(),
+            auth_time=timezone.now(),
+            session_id=generate_id(),
+            _scope="openid user profile",
+            _id_token=json.dumps(asdict(IDToken("foo", "bar"))),
+        )
+        self.assertEqual(revoke_tokens(session_id=session_id), 2)
+        access.refresh_from_db()
+        refresh.refresh_from_db()
+        other.refresh_from_db()
+        self.assertTrue(access.revoked)
+        self.assertTrue(refresh.revoked)
+        self.assertFalse(other.revoked)
+        self.assertTrue(is_token_revoked(access.token))
+        self.assertFalse(is_token_revoked(other.token))
+
+        res = self.client.get(
+            reverse("authentik_providers_oauth2:userinfo"),
+            HTTP_AUTHORIZATION=f"Bearer {access.token}",
+        )
+        self.assertEqual(res.status_code, 401)
+
+    def test_revoke_session_end(self):
+        """Test that ending sessions revokes access tokens, but keeps offline refresh tokens"""
+        sessions = [
+            AuthenticatedSession.objects.create(user=self.user, session_key=generate_id())
+            for _ in range(2)
+        ]
+        access_tokens, refresh_tokens = [], []
+        for session in sessions:
+            session_id = session_id_for_key(session.session_key)
+            access_tokens.append(
+                AccessToken.objects.create(
+                    provider=self.provider,
+                    user=self.user,
+                    token=generate_id(),
+                    auth_time=timezone.now(),
+                    session_id=session_id,
+                    _scope="openid user profile",
+                    _id_token=json.dumps(asdict(IDToken("foo", "bar"))),
+                )
+            )
+            refresh_tokens.append(
+                RefreshToken.objects.create(
+                    provider=self.provider,
+                    user=self.user,
+                    token=generate_id(),
+                    auth_time=timezone.now(),
+                    session_id=session_id,
+                    _scope="openid user profile offline_access",
+                    _id_token=json.dumps(asdict(IDToken("foo", "bar"))),
+                )
+            )
+            AuthorizationCode.objects.create(
+                provider=self.provider,
+                user=self.user,
+                code=generate_id(),
+                auth_time=timezone.now(),
+                session_id=session_id,
+            )
+        AuthenticatedSession.objects.filter(
+            session_key__in=[session.session_key for session in sessions]
+        ).delete()
+        for access, refresh in zip(access_tokens, refresh_tokens, strict=True):
+            access.refresh_from_db()
+            refresh.refresh_from_db()
+            self.assertTrue(access.revoked)
+            self.assertTrue(is_token_revoked(access.token))
+            self.assertFalse(refresh.revoked)
+        self.assertFalse(AuthorizationCode.objects.filter(provider=self.provider).exists())
+
+    def test_revoke_tokens_api(self):
+        """Test revoking all tokens of a user via the API"""
+        other_user = create_test_admin_user()
+        tokens = [
+            AccessToken.objects.create(
+                provider=self.provider,
+                user=user,
+                token=generate_id(),
+                auth_time=timezone.now(),
+                _scope="openid user profile",
+                _id_token=json.dumps(asdict(IDToken("foo", "bar"))),
+            )
+            for user in [self.user, other_user]
+        ]
+        self.client.force_login(self.user)
+        res = self.client.post(
+            reverse("authentik_api:oauth2provider-revoke-tokens", kwargs={"pk": self.provider.pk}),
+            data={"user": self.user.pk},
+            content_type="application/json",
+        )
+        self.assertEqual(res.status_code, 200)
+        self.assertJSONEqual(res.content, {"revoked": 1})
+        for token in tokens:
+            token.refresh_from_db()
+        self.assertTrue(tokens[0].revoked)
+        self.assertFalse(tokens[1].revoked)
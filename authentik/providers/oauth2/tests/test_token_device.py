@@ -1,6 +1,7 @@
 """Test token view"""
 
 from json import loads
+from unittest.mock import MagicMock, patch
 
 from django.test import RequestFactory
 from django.urls import reverse
@@ -10,6 +11,7 @@ from authentik.core.models import Application
 from authentik.core.tests.utils import create_test_admin_user, create_test_cert, create_test_flow
 from authentik.lib.generators import generate_code_fixed_length, generate_id
 from authentik.providers.oauth2.constants import GRANT_TYPE_DEVICE_CODE
+from authentik.providers.oauth2.device import device_code_timeout
 from authentik.providers.oauth2.models import DeviceToken, OAuth2Provider, ScopeMapping
 from authentik.providers.oauth2.tests.utils import OAuthTestCase
 
@@ -80,3 +82,55 @@ class TestTokenDeviceCode(OAuthTestCase):
             },
         )
         self.assertEqual(res.status_code, 200)
+
+    def test_code_poll_cached(self):
+        """Test polling a pending code is served from the cache, and approval is picked up"""
+        device_token = DeviceToken.objects.create(
+            provider=self.provider,
+            user_code=generate_code_fixed_length(),
+            device_code=generate_id(),
+        )
+        data = {
+            "client_id": self.provider.client_id,
+            "grant_type": GRANT_TYPE_DEVICE_CODE,
+            "device_code": device_token.device_code,
+        }
+        res = self.client.post(reverse("authentik_providers_oauth2:token"), data=data)
+        self.assertEqual(loads(res.content.decode())["error"], "authorization_pending")
+        # Polling again right away is too fast
+        res = self.client.post(reverse("authentik_providers_oauth2:token"), data=data)
+        self.assertEqual(res.status_code, 400)
+        self.assertEqual(loads(res.content.decode())["error"], "slow_down")
+
+        device_token.user = self.user
+        device_token.save()
+        res = self.client.post(reverse("authentik_providers_oauth2:token"), data=data)
+        self.assertEqual(res.status_code, 200)
+
+    def test_code_poll_approve_race(self):
+        """Test approving a code while a poll writes its pending state"""
+        device_token = DeviceToken.objects.create(
+            provider=self.provider,
+            user_code=generate_code_fixed_length(),
+            device_code=generate_id(),
+        )
+        data = {
+            "client_id": self.provider.client_id,
+            "grant_type": GRANT_TYPE_DEVICE_CODE,
+            "device_code": device_token.device_code,
+        }
+
+        def approve(token, provider):
+            # Approved after the poll read the pending token, before it writes the pending state
+            if not device_token.user:
+                device_token.user = self.user
+                device_token.save()
+            return device_code_timeout(token, provider)
+
+        with patch(
+            "authentik.providers.oauth2.device.device_code_timeout", MagicMock(side_effect=approve)
+        ):
+            res = self.client.post(reverse("authentik_providers_oauth2:token"), data=data)
+        self.assertEqual(loads(res.content.decode())["error"], "authorization_pending")
+        res = self.client.post(reverse("authentik_providers_oauth2:token"), data=data)
+        self.assertEqual(res.status_code, 200)
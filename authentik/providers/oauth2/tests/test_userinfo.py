@@ -11,6 +11,7 @@ from authentik.core.models import Application
 from authentik.core.tests.utils import create_test_admin_user, create_test_cert, create_test_flow
 from authentik.events.models import Event, EventAction
 from authentik.lib.generators import generate_id
+from authentik.providers.oauth2.mapper import ScopeMappingManager
 from authentik.providers.oauth2.models import AccessToken, IDToken, OAuth2Provider, ScopeMapping
 from authentik.providers.oauth2.tests.utils import OAuthTestCase
 
@@ -95,3 +96,28 @@ class TestUserinfo(OAuthTestCase):
             events.first().context["message"],
             "Failed to evaluate property-mapping: 'test'",
         )
+
+    def test_userinfo_mapping_cache(self):
+        """test compiled scope mappings are re-used and invalidated on change"""
+        manager = ScopeMappingManager.for_provider(self.provider)
+        self.assertIs(ScopeMappingManager.for_provider(self.provider), manager)
+
+        scope = ScopeMapping.objects.create(
+            name=generate_id(), scope_name="profile", expression="return {'foo': 'bar'}"
+        )
+        self.provider.property_mappings.add(scope)
+        self.assertIsNot(ScopeMappingManager.for_provider(self.provider), manager)
+        res = self.client.get(
+            reverse("authentik_providers_oauth2:userinfo"),
+            HTTP_AUTHORIZATION=f"Bearer {self.token.token}",
+        )
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(json.loads(res.content.decode())["foo"], "bar")
+
+        scope.expression = "return {'foo': 'baz'}"
+        scope.save()
+        res = self.client.get(
+            reverse("authentik_providers_oauth2:userinfo"),
+            HTTP_AUTHORIZATION=f"Bearer {self.token.token}",
+        )
+        self.assertEqual(json.loads(res.content.decode())["foo"], "baz")
@@ -14,6 +14,7 @@ from structlog.stdlib import get_logger
 from authentik.core.models import Application
 from authentik.lib.config import CONFIG
 from authentik.lib.utils.time import timedelta_from_string
+from authentik.providers.oauth2.device import DEVICE_CODE_INTERVAL
 from authentik.providers.oauth2.models import DeviceToken, OAuth2Provider
 from authentik.providers.oauth2.views.device_init import QS_KEY_CODE
 
@@ -82,6 +83,6 @@ class DeviceView(View):
                 ),
                 "user_code": token.user_code,
                 "expires_in": int(until.total_seconds()),
-                "interval": 5,
+                "interval": DEVICE_CODE_INTERVAL,
             }
         )
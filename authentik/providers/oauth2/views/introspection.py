@@ -10,6 +10,7 @@ from structlog.stdlib import get_logger
 
 from authentik.providers.oauth2.errors import TokenIntrospectionError
 from authentik.providers.oauth2.models import AccessToken, IDToken, OAuth2Provider, RefreshToken
+from authentik.providers.oauth2.revocation import is_token_revoked
 from authentik.providers.oauth2.utils import TokenResponse, authenticate_provider
 
 LOGGER = get_logger()
@@ -45,6 +46,9 @@ class TokenIntrospectionParams:
         provider = authenticate_provider(request)
         if not provider:
             raise TokenIntrospectionError
+        if raw_token and is_token_revoked(raw_token):
+            LOGGER.debug("Token is revoked")
+            raise TokenIntrospectionError()
 
         access_token = AccessToken.objects.filter(token=raw_token).first()
         if access_token:
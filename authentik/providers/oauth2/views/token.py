@@ -50,6 +50,7 @@ from authentik.providers.oauth2.constants import (
     SCOPE_OFFLINE_ACCESS,
     TOKEN_TYPE,
 )
+from authentik.providers.oauth2.device import poll_device_code
 from authentik.providers.oauth2.errors import DeviceCodeError, TokenError, UserAuthError
 from authentik.providers.oauth2.id_token import IDToken
 from authentik.providers.oauth2.models import (
@@ -459,10 +460,7 @@ class TokenParams:
 
     def __post_init_device_code(self, request: HttpRequest):
         device_code = request.POST.get("device_code", "")
-        code = DeviceToken.objects.filter(device_code=device_code, provider=self.provider).first()
-        if not code:
-            raise TokenError("invalid_grant")
-        self.device_code = code
+        self.device_code = poll_device_code(self.provider, device_code)
 
     def __create_user_from_jwt(self, token: dict[str, Any], app: Application, source: OAuthSource):
         """Create user from JWT"""
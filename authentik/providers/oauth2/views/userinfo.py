@@ -11,8 +11,6 @@ from django.views import View
 from django.views.decorators.csrf import csrf_exempt
 from structlog.stdlib import get_logger
 
-from authentik.core.expression.exceptions import PropertyMappingExpressionException
-from authentik.events.models import Event, EventAction
 from authentik.flows.challenge import PermissionDict
 from authentik.providers.oauth2.constants import (
     SCOPE_GITHUB_ORG_READ,
@@ -21,6 +19,7 @@ from authentik.providers.oauth2.constants import (
     SCOPE_GITHUB_USER_READ,
     SCOPE_OPENID,
 )
+from authentik.providers.oauth2.mapper import ScopeMappingManager
 from authentik.providers.oauth2.models import (
     BaseGrantModel,
     OAuth2Provider,
@@ -68,28 +67,15 @@ class UserInfoView(View):
         """Get a dictionary of claims from scopes that the token
         requires and are assigned to the provider."""
 
-        scopes_from_client = token.scope
         final_claims = {}
-        for scope in ScopeMapping.objects.filter(
-            provider=provider, scope_name__in=scopes_from_client
-        ).order_by("scope_name"):
-            scope: ScopeMapping
-            value = None
-            try:
-                value = scope.evaluate(
-                    user=token.user,
-                    request=self.request,
-                    provider=provider,
-                    token=token,
-                )
-            except PropertyMappingExpressionException as exc:
-                Event.new(
-                    EventAction.CONFIGURATION_ERROR,
-                    message=f"Failed to evaluate property-mapping: '{scope.name}'",
-                    provider=provider,
-                    mapping=scope,
-                ).from_http(self.request)
-                LOGGER.warning("Failed to evaluate property mapping", exc=exc)
+        manager = ScopeMappingManager.for_provider(provider)
+        for value, scope in manager.iter_scopes(
+            token.scope,
+            user=token.user,
+            request=self.request,
+            provider=provider,
+            token=token,
+        ):
             if value is None:
                 continue
             if not isinstance(value, dict):
@@ -0,0 +1,54 @@
+"""SAML Assertion benchmark"""
+
+from time import perf_counter
+
+from authentik.core.models import User
+from authentik.lib.tests.utils import get_request
+from authentik.providers.saml.models import SAMLProvider
+from authentik.providers.saml.processors.assertion import AssertionProcessor
+from authentik.providers.saml.processors.authn_request_parser import AuthNRequestParser
+from authentik.tenants.management import TenantCommand
+
+
+class Command(TenantCommand):
+    """Measure how many SAML Responses per second can be generated for a provider,
+    with and without the cached response template"""
+
+    def add_arguments(self, parser):
+        parser.add_argument("provider", type=str)
+        parser.add_argument("username", type=str)
+        parser.add_argument(
+            "-n",
+            "--iterations",
+            default=1000,
+            type=int,
+            help="How many responses should be generated per run.",
+        )
+
+    def benchmark(self, provider: SAMLProvider, user: User, iterations: int, use_cache: bool):
+        """Generate `iterations` responses and return the responses per second"""
+        http_request = get_request("/", user=user)
+        auth_n_request = AuthNRequestParser(provider).idp_initiated()
+        start = perf_counter()
+        for _ in range(iterations):
+            processor = AssertionProcessor(provider, http_request, auth_n_request)
+            processor.use_cache = use_cache
+            processor.build_response()
+        return iterations / (perf_counter() - start)
+
+    def handle_per_tenant(self, **options):
+        provider_name, username = options["provider"], options["username"]
+        provider = SAMLProvider.objects.filter(name=provider_name).first()
+        if not provider:
+            self.stderr.write(f"Provider '{provider_name}' does not exist")
+            return
+        user = User.objects.filter(username=username).first()
+        if not user:
+            self.stderr.write(f"User '{username}' does not exist")
+            return
+        iterations = options["iterations"]
+        uncached = self.benchmark(provider, user, iterations, use_cache=False)
+        cached = self.benchmark(provider, user, iterations, use_cache=True)
+        self.stdout.write(f"Provider: {provider.name}, {iterations} iterations")
+        self.stdout.write(f"\tWithout template: {uncached:.2f} responses/s")
+        self.stdout.write(f"\tWith template: {cached:.2f} responses/s")
@@ -1,9 +1,13 @@
 """SAML Assertion generator"""
 
+from copy import deepcopy
+from dataclasses import dataclass
 from hashlib import sha256
+from threading import local
 from types import GeneratorType
 
 import xmlsec
+from django.db import connection
 from django.http import HttpRequest
 from lxml import etree  # nosec
 from lxml.etree import Element, SubElement  # nosec
@@ -24,6 +28,7 @@ from authentik.sources.saml.processors.constants import (
     NS_MAP,
     NS_SAML_ASSERTION,
     NS_SAML_PROTOCOL,
+    NS_SIGNATURE,
     SAML_NAME_ID_FORMAT_EMAIL,
     SAML_NAME_ID_FORMAT_PERSISTENT,
     SAML_NAME_ID_FORMAT_TRANSIENT,
@@ -35,6 +40,19 @@ from authentik.sources.saml.processors.constants import (
 from authentik.stages.password.stage import PLAN_CONTEXT_METHOD, PLAN_CONTEXT_METHOD_ARGS
 
 LOGGER = get_logger()
+# Response templates are only ever deep-copied, however lxml trees and xmlsec keys
+# are not safe to share between threads, hence they're cached per thread
+_templates = local()
+
+
+@dataclass(slots=True)
+class ResponseTemplate:
+    """Pre-built invariant parts of a provider's SAML Response, and the
+    pre-loaded signing key"""
+
+    fingerprint: tuple
+    response: Element
+    key: xmlsec.Key | None = None
 
 
 class AssertionProcessor:
@@ -44,6 +62,10 @@ class AssertionProcessor:
     http_request: HttpRequest
     auth_n_request: AuthNRequest
 
+    use_cache: bool = True
+
+    _template: ResponseTemplate | None = None
+
     _issue_instant: str
     _assertion_id: str
 
@@ -224,9 +246,9 @@ class AssertionProcessor:
         )
 
     def get_assertion_subject(self) -> Element:
-        """Generate Subject Element with NameID and SubjectConfirmation Objects"""
+        """Generate Subject Element with SubjectConfirmation Objects. The NameID
+        is added per-request"""
         subject = Element(f"{{{NS_SAML_ASSERTION}}}Subject")
-        subject.append(self.get_name_id())
 
         subject_confirmation = SubElement(subject, f"{{{NS_SAML_ASSERTION}}}SubjectConfirmation")
         subject_confirmation.attrib["Method"] = "urn:oasis:names:tc:SAML:2.0:cm:bearer"
@@ -234,48 +256,61 @@ class AssertionProcessor:
         subject_confirmation_data = SubElement(
             subject_confirmation, f"{{{NS_SAML_ASSERTION}}}SubjectConfirmationData"
         )
-        if self.auth_n_request.id:
-            subject_confirmation_data.attrib["InResponseTo"] = self.auth_n_request.id
-        subject_confirmation_data.attrib["NotOnOrAfter"] = self._valid_not_on_or_after
         subject_confirmation_data.attrib["Recipient"] = self.provider.acs_url
         return subject
 
+    def get_signature_template(self, assertion: Element) -> Element:
+        """Generate the Signature template, with the reference URI being set per-request"""
+        sign_algorithm_transform = SIGN_ALGORITHM_TRANSFORM_MAP.get(
+            self.provider.signature_algorithm, xmlsec.constants.TransformRsaSha1
+        )
+        digest_algorithm_transform = DIGEST_ALGORITHM_TRANSLATION_MAP.get(
+            self.provider.digest_algorithm, xmlsec.constants.TransformSha1
+        )
+        signature = xmlsec.template.create(
+            assertion,
+            xmlsec.constants.TransformExclC14N,
+            sign_algorithm_transform,
+            ns="ds",  # type: ignore
+        )
+        ref = xmlsec.template.add_reference(signature, digest_algorithm_transform, uri="#")
+        xmlsec.template.add_transform(ref, xmlsec.constants.TransformEnveloped)
+        xmlsec.template.add_transform(ref, xmlsec.constants.TransformExclC14N)
+        key_info = xmlsec.template.ensure_key_info(signature)
+        xmlsec.template.add_x509_data(key_info)
+        return signature
+
+    def get_signing_key(self) -> xmlsec.Key:
+        """Load the provider's signing key and certificate"""
+        key = xmlsec.Key.from_memory(
+            self.provider.signing_kp.key_data,
+            xmlsec.constants.KeyDataFormatPem,
+            None,
+        )
+        key.load_cert_from_memory(
+            self.provider.signing_kp.certificate_data,
+            xmlsec.constants.KeyDataFormatCertPem,
+        )
+        return key
+
     def get_assertion(self) -> Element:
-        """Generate Main Assertion Element"""
+        """Generate Main Assertion Element, without any per-request values"""
         assertion = Element(f"{{{NS_SAML_ASSERTION}}}Assertion", nsmap=NS_MAP)
         assertion.attrib["Version"] = "2.0"
-        assertion.attrib["ID"] = self._assertion_id
-        assertion.attrib["IssueInstant"] = self._issue_instant
         assertion.append(self.get_issuer())
 
         if self.provider.signing_kp:
-            sign_algorithm_transform = SIGN_ALGORITHM_TRANSFORM_MAP.get(
-                self.provider.signature_algorithm, xmlsec.constants.TransformRsaSha1
-            )
-            signature = xmlsec.template.create(
-                assertion,
-                xmlsec.constants.TransformExclC14N,
-                sign_algorithm_transform,
-                ns="ds",  # type: ignore
-            )
-            assertion.append(signature)
+            assertion.append(self.get_signature_template(assertion))
 
         assertion.append(self.get_assertion_subject())
         assertion.append(self.get_assertion_conditions())
-        assertion.append(self.get_assertion_auth_n_statement())
-
-        assertion.append(self.get_attributes())
         return assertion
 
-    def get_response(self) -> Element:
-        """Generate Root response element"""
+    def get_response_template(self) -> Element:
+        """Generate Root response element, without any per-request values"""
         response = Element(f"{{{NS_SAML_PROTOCOL}}}Response", nsmap=NS_MAP)
         response.attrib["Version"] = "2.0"
-        response.attrib["IssueInstant"] = self._issue_instant
         response.attrib["Destination"] = self.provider.acs_url
-        response.attrib["ID"] = get_random_id()
-        if self.auth_n_request.id:
-            response.attrib["InResponseTo"] = self.auth_n_request.id
 
         response.append(self.get_issuer())
 
@@ -286,38 +321,95 @@ class AssertionProcessor:
         response.append(self.get_assertion())
         return response
 
+    def get_template_fingerprint(self) -> tuple:
+        """All values the response template and signing key are built from"""
+        fingerprint = (
+            connection.schema_name,
+            self.provider.pk,
+            self.provider.issuer,
+            self.provider.acs_url,
+            self.provider.audience,
+            self.provider.signature_algorithm,
+            self.provider.digest_algorithm,
+        )
+        if self.provider.signing_kp:
+            fingerprint += (
+                self.provider.signing_kp.certificate_data,
+                self.provider.signing_kp.key_data,
+            )
+        return fingerprint
+
+    def get_template(self) -> ResponseTemplate:
+        """Get the response template for this provider, which is only re-built
+        when any of the values it's built from change"""
+        if self._template:
+            return self._template
+        fingerprint = self.get_template_fingerprint()
+        templates: dict = getattr(_templates, "templates", None)
+        if templates is None:
+            templates = _templates.templates = {}
+        template: ResponseTemplate | None = templates.get(self.provider.pk)
+        if self.use_cache and template and template.fingerprint == fingerprint:
+            self._template = template
+            return template
+        template = ResponseTemplate(
+            fingerprint=fingerprint,
+            response=self.get_response_template(),
+        )
+        if self.provider.signing_kp:
+            template.key = self.get_signing_key()
+        templates[self.provider.pk] = template
+        self._template = template
+        return template
+
+    def get_response(self) -> Element:
+        """Generate Root response element from the provider's template,
+        adding all per-request values"""
+        response = deepcopy(self.get_template().response)
+        response.attrib["IssueInstant"] = self._issue_instant
+        response.attrib["ID"] = get_random_id()
+        if self.auth_n_request.id:
+            response.attrib["InResponseTo"] = self.auth_n_request.id
+
+        assertion = response.find(f"{{{NS_SAML_ASSERTION}}}Assertion")
+        assertion.attrib["ID"] = self._assertion_id
+        assertion.attrib["IssueInstant"] = self._issue_instant
+
+        signature = assertion.find(f"{{{NS_SIGNATURE}}}Signature")
+        if signature is not None:
+            ref = signature.find(f"{{{NS_SIGNATURE}}}SignedInfo/{{{NS_SIGNATURE}}}Reference")
+            ref.attrib["URI"] = "#" + self._assertion_id
+
+        subject = assertion.find(f"{{{NS_SAML_ASSERTION}}}Subject")
+        subject.insert(0, self.get_name_id())
+        subject_confirmation_data = subject.find(
+            f"{{{NS_SAML_ASSERTION}}}SubjectConfirmation/"
+            f"{{{NS_SAML_ASSERTION}}}SubjectConfirmationData"
+        )
+        if self.auth_n_request.id:
+            subject_confirmation_data.attrib["InResponseTo"] = self.auth_n_request.id
+        subject_confirmation_data.attrib["NotOnOrAfter"] = self._valid_not_on_or_after
+
+        conditions = assertion.find(f"{{{NS_SAML_ASSERTION}}}Conditions")
+        conditions.attrib["NotBefore"] = self._valid_not_before
+        conditions.attrib["NotOnOrAfter"] = self._valid_not_on_or_after
+
+        assertion.append(self.get_assertion_auth_n_statement())
+        assertion.append(self.get_attributes())
+        return response
+
     def build_response(self) -> str:
         """Build string XML Response and sign if signing is enabled."""
         root_response = self.get_response()
         if self.provider.signing_kp:
-            digest_algorithm_transform = DIGEST_ALGORITHM_TRANSLATION_MAP.get(
-                self.provider.digest_algorithm, xmlsec.constants.TransformSha1
-            )
-            assertion = root_response.xpath("//saml:Assertion", namespaces=NS_MAP)[0]
+            assertion = root_response.find(f"{{{NS_SAML_ASSERTION}}}Assertion")
             xmlsec.tree.add_ids(assertion, ["ID"])
-            signature_node = xmlsec.tree.find_node(assertion, xmlsec.constants.NodeSignature)
-            ref = xmlsec.template.add_reference(
-                signature_node,
-                digest_algorithm_transform,
-                uri="#" + self._assertion_id,
-            )
-            xmlsec.template.add_transform(ref, xmlsec.constants.TransformEnveloped)
-            xmlsec.template.add_transform(ref, xmlsec.constants.TransformExclC14N)
-            key_info = xmlsec.template.ensure_key_info(signature_node)
-            xmlsec.template.add_x509_data(key_info)
+            signature_node = assertion.find(f"{{{NS_SIGNATURE}}}Signature")
 
+            # Setting the key on a context creates a copy of it, so the
+            # template's pre-loaded key can be re-used
             ctx = xmlsec.SignatureContext()
-
-            key = xmlsec.Key.from_memory(
-                self.provider.signing_kp.key_data,
-                xmlsec.constants.KeyDataFormatPem,
-                None,
-            )
-            key.load_cert_from_memory(
-                self.provider.signing_kp.certificate_data,
-                xmlsec.constants.KeyDataFormatCertPem,
-            )
-            ctx.key = key
+            ctx.key = self.get_template().key
             ctx.sign(signature_node)
 
         return etree.tostring(root_response).decode("utf-8")  # nosec
@@ -2,13 +2,18 @@
 
 from base64 import b64decode
 from dataclasses import dataclass
+from functools import lru_cache
+from threading import local
 from urllib.parse import quote_plus
 from xml.etree.ElementTree import ParseError  # nosec
 
 import xmlsec
 from defusedxml import ElementTree
+from django.db import connection
+from lxml.etree import Element  # nosec
 from structlog.stdlib import get_logger
 
+from authentik.crypto.models import CertificateKeyPair
 from authentik.lib.xml import lxml_from_string
 from authentik.providers.saml.exceptions import CannotHandleAssertion
 from authentik.providers.saml.models import SAMLProvider
@@ -30,6 +35,42 @@ ERROR_SIGNATURE_REQUIRED_BUT_ABSENT = (
 )
 ERROR_FAILED_TO_VERIFY = "Failed to verify signature"
 
+SIGN_ALGORITHM_TRANSFORM_MAP = {
+    DSA_SHA1: xmlsec.constants.TransformDsaSha1,
+    RSA_SHA1: xmlsec.constants.TransformRsaSha1,
+    RSA_SHA256: xmlsec.constants.TransformRsaSha256,
+    RSA_SHA384: xmlsec.constants.TransformRsaSha384,
+    RSA_SHA512: xmlsec.constants.TransformRsaSha512,
+}
+
+# xmlsec keys are not safe to share between threads, hence they're cached per thread
+_verification_keys = local()
+
+
+def get_verification_key(keypair: CertificateKeyPair) -> xmlsec.Key:
+    """Get the xmlsec key for a verification certificate, which is only loaded
+    again when the certificate changes. Setting the key on a signature context
+    creates a copy of it, so the returned key can be re-used"""
+    keys: dict = getattr(_verification_keys, "keys", None)
+    if keys is None:
+        keys = _verification_keys.keys = {}
+    cache_key = (connection.schema_name, keypair.pk)
+    certificate_data, key = keys.get(cache_key, (None, None))
+    if certificate_data != keypair.certificate_data:
+        key = xmlsec.Key.from_memory(
+            keypair.certificate_data,
+            xmlsec.constants.KeyDataFormatCertPem,
+            None,
+        )
+        keys[cache_key] = (keypair.certificate_data, key)
+    return key
+
+
+@lru_cache
+def get_sig_alg_suffix(sig_alg: str) -> str:
+    """Get the (constant) last part of the query string covered by a detached signature"""
+    return f"SigAlg={quote_plus(sig_alg)}"
+
 
 @dataclass(slots=True)
 class AuthNRequest:
@@ -52,8 +93,9 @@ class AuthNRequestParser:
         self.logger = get_logger().bind(provider=self.provider)
 
     def _parse_xml(self, decoded_xml: str | bytes, relay_state: str | None) -> AuthNRequest:
-        root = ElementTree.fromstring(decoded_xml)
+        return self._parse_root(ElementTree.fromstring(decoded_xml), relay_state)
 
+    def _parse_root(self, root: Element, relay_state: str | None) -> AuthNRequest:
         # http://docs.oasis-open.org/security/saml/v2.0/saml-core-2.0-os.pdf
         # `AssertionConsumerServiceURL` can be omitted, and we should fallback to the
         # default ACS URL
@@ -105,17 +147,13 @@ class AuthNRequestParser:
         if signature_node is not None:
             try:
                 ctx = xmlsec.SignatureContext()
-                key = xmlsec.Key.from_memory(
-                    verifier.certificate_data,
-                    xmlsec.constants.KeyDataFormatCertPem,
-                    None,
-                )
-                ctx.key = key
+                ctx.key = get_verification_key(verifier)
                 ctx.verify(signature_node)
             except xmlsec.Error as exc:
                 raise CannotHandleAssertion(ERROR_FAILED_TO_VERIFY) from exc
 
-        return self._parse_xml(decoded_xml, relay_state)
+        # Re-use the already parsed (and verified) document
+        return self._parse_root(root, relay_state)
 
     def parse_detached(
         self,
@@ -141,22 +179,12 @@ class AuthNRequestParser:
             querystring = f"SAMLRequest={quote_plus(saml_request)}&"
             if relay_state is not None:
                 querystring += f"RelayState={quote_plus(relay_state)}&"
-            querystring += f"SigAlg={quote_plus(sig_alg)}"
+            querystring += get_sig_alg_suffix(sig_alg)
 
             dsig_ctx = xmlsec.SignatureContext()
-            key = xmlsec.Key.from_memory(
-                verifier.certificate_data, xmlsec.constants.KeyDataFormatCertPem, None
-            )
-            dsig_ctx.key = key
-
-            sign_algorithm_transform_map = {
-                DSA_SHA1: xmlsec.constants.TransformDsaSha1,
-                RSA_SHA1: xmlsec.constants.TransformRsaSha1,
-                RSA_SHA256: xmlsec.constants.TransformRsaSha256,
-                RSA_SHA384: xmlsec.constants.TransformRsaSha384,
-                RSA_SHA512: xmlsec.constants.TransformRsaSha512,
-            }
-            sign_algorithm_transform = sign_algorithm_transform_map.get(
+            dsig_ctx.key = get_verification_key(verifier)
+
+            sign_algorithm_transform = SIGN_ALGORITHM_TRANSFORM_MAP.get(
                 sig_alg, xmlsec.constants.TransformRsaSha1
             )
 
@@ -13,7 +13,10 @@ from authentik.lib.generators import generate_id
 from authentik.lib.tests.utils import get_request
 from authentik.providers.saml.models import SAMLPropertyMapping, SAMLProvider
 from authentik.providers.saml.processors.assertion import AssertionProcessor
-from authentik.providers.saml.processors.authn_request_parser import AuthNRequestParser
+from authentik.providers.saml.processors.authn_request_parser import (
+    AuthNRequestParser,
+    get_verification_key,
+)
 from authentik.sources.saml.exceptions import MismatchedRequestID
 from authentik.sources.saml.models import SAMLSource
 from authentik.sources.saml.processors.constants import (
@@ -273,3 +276,30 @@ class TestAuthNRequest(TestCase):
         request = AuthNRequestParser(self.provider).idp_initiated()
         self.assertEqual(request.id, None)
         self.assertEqual(request.relay_state, self.provider.default_relay_state)
+
+    def test_response_template(self):
+        """Test response template is re-used across responses, and rebuilt on changes"""
+        http_request = get_request("/", user=create_test_admin_user())
+        auth_n_request = AuthNRequestParser(self.provider).idp_initiated()
+
+        first = AssertionProcessor(self.provider, http_request, auth_n_request)
+        first_response = first.build_response()
+        second = AssertionProcessor(self.provider, http_request, auth_n_request)
+        second_response = second.build_response()
+        self.assertIs(first.get_template(), second.get_template())
+        self.assertNotEqual(first_response, second_response)
+        self.assertIn(first._assertion_id, first_response)
+        self.assertNotIn(first._assertion_id, second_response)
+
+        self.provider.audience = generate_id()
+        third = AssertionProcessor(self.provider, http_request, auth_n_request)
+        self.assertIn(self.provider.audience, third.build_response())
+        self.assertIsNot(first.get_template(), third.get_template())
+
+    def test_verification_key_cache(self):
+        """Test verification keys are re-used until the certificate changes"""
+        keypair = create_test_cert()
+        key = get_verification_key(keypair)
+        self.assertIs(get_verification_key(keypair), key)
+        keypair.certificate_data = REDIRECT_CERT
+        self.assertIsNot(get_verification_key(keypair), key)
@@ -1,11 +1,15 @@
 """SCIM Client"""
 
-from typing import TYPE_CHECKING
+from collections.abc import Generator
+from itertools import chain
+from typing import TYPE_CHECKING, Any
 
+from django.db import DatabaseError, transaction
 from django.http import HttpResponseBadRequest, HttpResponseNotFound
 from pydantic import ValidationError
 from requests import RequestException, Session
 
+from authentik.core.expression.exceptions import SkipObjectException
 from authentik.lib.sync.outgoing import (
     HTTP_CONFLICT,
     HTTP_NO_CONTENT,
@@ -13,14 +17,27 @@ from authentik.lib.sync.outgoing import (
     HTTP_TOO_MANY_REQUESTS,
 )
 from authentik.lib.sync.outgoing.base import BaseOutgoingSyncClient
+from authentik.lib.sync.outgoing.discovery import get_discovered
 from authentik.lib.sync.outgoing.exceptions import (
+    BaseSyncException,
     NotFoundSyncException,
     ObjectExistsSyncException,
+    StopSync,
     TransientSyncException,
 )
+from authentik.lib.utils.errors import exception_to_string
 from authentik.lib.utils.http import get_http_session
-from authentik.providers.scim.clients.exceptions import SCIMRequestException
-from authentik.providers.scim.clients.schema import ServiceProviderConfiguration
+from authentik.providers.scim.clients.exceptions import (
+    SCIMBulkRequestException,
+    SCIMRequestException,
+)
+from authentik.providers.scim.clients.schema import (
+    BulkOperation,
+    BulkRequest,
+    BulkResponse,
+    BulkResponseOperation,
+    ServiceProviderConfiguration,
+)
 from authentik.providers.scim.models import SCIMProvider
 
 if TYPE_CHECKING:
@@ -35,6 +52,8 @@ class SCIMClient[TModel: "Model", TConnection: "Model", TSchema: "BaseModel"](
 
     base_url: str
     token: str
+    # Path of the resource type this client syncs, used for bulk requests
+    resource_path: str
 
     _session: Session
     _config: ServiceProviderConfiguration
@@ -83,12 +102,283 @@ class SCIMClient[TModel: "Model", TConnection: "Model", TSchema: "BaseModel"](
         return response.json()
 
     def get_service_provider_config(self):
-        """Get Service provider config"""
+        """Get Service provider config, which is cached and shared by all clients
+        of the provider. The fallback config is not cached"""
         default_config = ServiceProviderConfiguration.default()
         try:
-            return ServiceProviderConfiguration.model_validate(
-                self._request("GET", "/ServiceProviderConfig")
+            return get_discovered(
+                self.provider,
+                "service_provider_config",
+                lambda: ServiceProviderConfiguration.model_validate(
+                    self._request("GET", "/ServiceProviderConfig")
+                ),
             )
         except (ValidationError, SCIMRequestException, NotFoundSyncException) as exc:
             self.logger.warning("failed to get ServiceProviderConfig", exc=exc)
             return default_config
+
+    def schema_hash(self, schema: TSchema) -> str:
+        return super().schema_hash(schema.model_dump(mode="json", exclude_unset=True))
+
+    @property
+    def bulk_supported(self) -> bool:
+        """Check if the service provider supports bulk requests with more than one operation"""
+        bulk = self._config.bulk
+        return bulk.supported and (bulk.maxOperations is None or bulk.maxOperations > 1)
+
+    def write_many(
+        self, objects: list[TModel]
+    ) -> Generator[tuple[TModel, BaseSyncException | SkipObjectException | None]]:
+        """Write multiple objects using bulk requests if the service provider supports them,
+        objects whose bulk request fails as a whole are written with single requests"""
+        if not self.bulk_supported:
+            yield from super().write_many(objects)
+            return
+        operations, pending, results = self._bulk_prepare(objects)
+        created = []
+        updated = []
+        recreate = []
+        single = []
+        fallback_operations = []
+        for operation, result, exc in self._bulk(operations):
+            obj, connection, sync_hash = pending[operation.bulkId]
+            if isinstance(exc, SCIMBulkRequestException):
+                single.append(obj)
+                continue
+            if not exc:
+                if connection:
+                    connection.sync_hash = sync_hash
+                    updated.append(connection)
+                else:
+                    scim_id = self._bulk_resource_id(result)
+                    if not scim_id:
+                        results.append(
+                            (obj, StopSync("SCIM Response with missing or invalid `id`"))
+                        )
+                        continue
+                    created.append(
+                        self.connection_type(
+                            provider=self.provider,
+                            scim_id=scim_id,
+                            sync_hash=sync_hash,
+                            **{self.connection_type_query: obj},
+                        )
+                    )
+                results.append((obj, None))
+                continue
+            if isinstance(exc, NotFoundSyncException) and connection:
+                # Same as self.write, the object has been deleted in the service provider
+                # so delete our connection and re-create it
+                connection.delete()
+                recreate.append(obj)
+                continue
+            fallback = self.bulk_fallback(obj, connection, operation, exc)
+            if fallback:
+                fallback_operations.append(fallback)
+                continue
+            results.append((obj, exc))
+        for operation, _, exc in self._bulk(fallback_operations):
+            obj, connection, sync_hash = pending[operation.bulkId]
+            if isinstance(exc, SCIMBulkRequestException):
+                single.append(obj)
+                continue
+            if not exc:
+                connection.sync_hash = sync_hash
+                updated.append(connection)
+            results.append((obj, exc))
+        failed = self._bulk_save_connections(created, updated)
+        # Only hand out results once all connections have been saved, as the caller
+        # might stop iterating on errors
+        for obj, exc in results:
+            yield obj, failed.get(obj.pk, exc)
+        yield from super().write_many(recreate + single)
+
+    def _bulk_save_connections(
+        self, created: list[TConnection], updated: list[TConnection]
+    ) -> dict[Any, BaseSyncException]:
+        """Save the connections of objects written with bulk requests. When saving them at once
+        fails, they're saved one by one instead. Returns the exceptions for objects whose
+        connection couldn't be saved, by object primary key"""
+        try:
+            with transaction.atomic():
+                self.connection_type.objects.bulk_create(created)
+                self.connection_type.objects.bulk_update(updated, ["sync_hash"])
+            return {}
+        except DatabaseError as exc:
+            self.logger.warning("Failed to write objects, retrying one by one", exc=exc)
+        failed = {}
+        for connection, is_new in [(conn, True) for conn in created] + [
+            (conn, False) for conn in updated
+        ]:
+            try:
+                with transaction.atomic():
+                    if is_new:
+                        connection.save(force_insert=True)
+                    else:
+                        connection.save(update_fields=["sync_hash"])
+            except DatabaseError as exc:
+                obj = getattr(connection, self.connection_type_query)
+                self.logger.warning("Failed to write object", obj=obj, exc=exc)
+                failed[obj.pk] = TransientSyncException(exception_to_string(exc))
+        return failed
+
+    def _bulk_prepare(self, objects: list[TModel]) -> tuple[
+        list[BulkOperation],
+        dict[str, tuple[TModel, TConnection | None, str]],
+        list[tuple[TModel, BaseSyncException | SkipObjectException | None]],
+    ]:
+        """Get the bulk operations for all objects which have changed since they were last
+        written, and the results for all objects which don't need to be written"""
+        connections = self.prefetch_connections(objects)
+        pending: dict[str, tuple[TModel, TConnection | None, str]] = {}
+        operations = []
+        results = []
+        for obj in objects:
+            connection = connections.get(obj.pk)
+            try:
+                scim_object = self.to_schema(obj, connection)
+            except (SkipObjectException, BaseSyncException) as exc:
+                results.append((obj, exc))
+                continue
+            sync_hash = self.schema_hash(scim_object)
+            if connection and connection.sync_hash == sync_hash:
+                results.append((obj, None))
+                continue
+            operation = self._bulk_operation(obj, connection, scim_object)
+            pending[operation.bulkId] = (obj, connection, sync_hash)
+            operations.append(operation)
+        return operations, pending, results
+
+    def bulk_fallback(
+        self,
+        obj: TModel,
+        connection: TConnection | None,
+        operation: BulkOperation,
+        exc: BaseSyncException,
+    ) -> BulkOperation | None:
+        """Optionally return an operation to retry a failed bulk operation with, which will
+        be sent in a second bulk request. By default, failed operations are not retried"""
+        return None
+
+    def _bulk_operation(
+        self, obj: TModel, connection: TConnection | None, scim_object: TSchema
+    ) -> BulkOperation:
+        """Create a bulk operation creating or replacing an object"""
+        if not connection:
+            return BulkOperation(
+                method="POST",
+                path=self.resource_path,
+                bulkId=str(obj.pk),
+                data=scim_object.model_dump(mode="json", exclude_unset=True),
+            )
+        scim_object.id = connection.scim_id
+        return BulkOperation(
+            method="PUT",
+            path=f"{self.resource_path}/{connection.scim_id}",
+            bulkId=str(obj.pk),
+            data=scim_object.model_dump(mode="json", exclude_unset=True),
+        )
+
+    def _bulk_chunks(self, operations: list[BulkOperation]) -> Generator[list[BulkOperation]]:
+        """Split operations into chunks within the limits of the service provider"""
+        max_operations = self._config.bulk.maxOperations or len(operations)
+        max_payload_size = self._config.bulk.maxPayloadSize
+        envelope_size = len(BulkRequest().model_dump_json(exclude_none=True).encode())
+        chunk = []
+        size = envelope_size
+        for operation in operations:
+            # Account for the separator between operations
+            operation_size = len(operation.model_dump_json(exclude_none=True).encode()) + 1
+            if chunk and (
+                len(chunk) >= max_operations
+                or (max_payload_size and size + operation_size > max_payload_size)
+            ):
+                yield chunk
+                chunk = []
+                size = envelope_size
+            chunk.append(operation)
+            size += operation_size
+        if chunk:
+            yield chunk
+
+    def _bulk(
+        self, operations: list[BulkOperation]
+    ) -> Generator[tuple[BulkOperation, BulkResponseOperation | None, BaseSyncException | None]]:
+        """Send operations in bulk requests, yielding each operation with its result,
+        or the exception the operation failed with"""
+        chunks = self._bulk_chunks(operations)
+        for chunk in chunks:
+            request = BulkRequest(Operations=chunk)
+            try:
+                response = BulkResponse.model_validate(
+                    self._request(
+                        "POST",
+                        "/Bulk",
+                        data=request.model_dump_json(exclude_none=True).encode(),
+                    )
+                )
+            except (SCIMRequestException, NotFoundSyncException) as exc:
+                # The bulk endpoint isn't available or rejected the request, send the
+                # operations of this chunk as single requests instead
+                self.logger.warning("Failed to send bulk request, falling back", exc=exc)
+                for operation in chunk:
+                    yield (
+                        operation,
+                        None,
+                        SCIMBulkRequestException(message="Failed to send bulk request"),
+                    )
+                continue
+            except TransientSyncException as exc:
+                # Don't send any further requests when the service provider is rate limiting
+                # or unavailable, the remaining operations are retried with the task
+                for operation in chain(chunk, *chunks):
+                    yield operation, None, exc
+                return
+            except (BaseSyncException, ValidationError) as exc:
+                # Don't pass exceptions about the bulk request itself on as they are,
+                # as they would be confused with the result of the single operation
+                self.logger.warning("Failed to send bulk request", exc=exc)
+                for operation in chunk:
+                    yield (
+                        operation,
+                        None,
+                        SCIMRequestException(message="Failed to send bulk request"),
+                    )
+                continue
+            results = {result.bulkId: result for result in response.Operations}
+            for idx, operation in enumerate(chunk):
+                result = results.get(operation.bulkId)
+                # Fall back to the order of operations if the service provider
+                # doesn't include the bulkId in its response
+                if not result and len(response.Operations) == len(chunk):
+                    result = response.Operations[idx]
+                if not result:
+                    yield (
+                        operation,
+                        None,
+                        SCIMRequestException(message="Missing result of bulk operation"),
+                    )
+                elif result.status >= HttpResponseBadRequest.status_code:
+                    yield operation, result, self._bulk_exception(result)
+                else:
+                    yield operation, result, None
+
+    def _bulk_resource_id(self, result: BulkResponseOperation) -> str | None:
+        """Get the ID of a resource created in a bulk request"""
+        if result.response and result.response.get("id"):
+            return result.response.get("id")
+        if result.location:
+            return result.location.rstrip("/").split("/")[-1]
+        return None
+
+    def _bulk_exception(self, result: BulkResponseOperation) -> BaseSyncException:
+        """Convert a failed bulk operation to the exception _request would raise"""
+        detail = (result.response or {}).get("detail") or f"status {result.status}"
+        if result.status == HttpResponseNotFound.status_code:
+            return NotFoundSyncException(detail)
+        if result.status in [HTTP_TOO_MANY_REQUESTS, HTTP_SERVICE_UNAVAILABLE]:
+            return TransientSyncException()
+        if result.status == HTTP_CONFLICT:
+            return ObjectExistsSyncException(detail)
+        self.logger.warning("Failed bulk operation", status=result.status, detail=detail)
+        return SCIMRequestException(message=detail)
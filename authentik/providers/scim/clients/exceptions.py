@@ -27,3 +27,8 @@ class SCIMRequestException(TransientSyncException):
         except ValidationError:
             pass
         return self._message
+
+
+class SCIMBulkRequestException(SCIMRequestException):
+    """Exception raised for the operations of a bulk request which failed as a whole,
+    which are sent as single requests instead"""
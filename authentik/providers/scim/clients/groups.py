@@ -6,8 +6,9 @@ from pydanticscim.responses import PatchOp, PatchOperation
 
 from authentik.core.models import Group
 from authentik.lib.sync.mapper import PropertyMappingManager
-from authentik.lib.sync.outgoing.base import Direction
+from authentik.lib.sync.outgoing.base import Direction, group_member_pks
 from authentik.lib.sync.outgoing.exceptions import (
+    BaseSyncException,
     NotFoundSyncException,
     ObjectExistsSyncException,
     StopSync,
@@ -17,7 +18,11 @@ from authentik.providers.scim.clients.base import SCIMClient
 from authentik.providers.scim.clients.exceptions import (
     SCIMRequestException,
 )
-from authentik.providers.scim.clients.schema import SCIM_GROUP_SCHEMA, PatchRequest
+from authentik.providers.scim.clients.schema import (
+    SCIM_GROUP_SCHEMA,
+    BulkOperation,
+    PatchRequest,
+)
 from authentik.providers.scim.clients.schema import Group as SCIMGroupSchema
 from authentik.providers.scim.models import (
     SCIMMapping,
@@ -32,6 +37,7 @@ class SCIMGroupClient(SCIMClient[Group, SCIMProviderGroup, SCIMGroupSchema]):
 
     connection_type = SCIMProviderGroup
     connection_type_query = "group"
+    resource_path = "/Groups"
     mapper: PropertyMappingManager
 
     def __init__(self, provider: SCIMProvider):
@@ -56,7 +62,7 @@ class SCIMGroupClient(SCIMClient[Group, SCIMProviderGroup, SCIMGroupSchema]):
         if not scim_group.externalId:
             scim_group.externalId = str(obj.pk)
 
-        users = list(obj.users.order_by("id").values_list("id", flat=True))
+        users = group_member_pks(obj)
         connections = SCIMProviderUser.objects.filter(provider=self.provider, user__pk__in=users)
         members = []
         for user in connections:
@@ -79,9 +85,8 @@ class SCIMGroupClient(SCIMClient[Group, SCIMProviderGroup, SCIMGroupSchema]):
         scim_group.delete()
         return response
 
-    def create(self, group: Group):
+    def create(self, group: Group, scim_group: SCIMGroupSchema):
         """Create group from scratch and create a connection object"""
-        scim_group = self.to_schema(group, None)
         response = self._request(
             "POST",
             "/Groups",
@@ -97,9 +102,8 @@ class SCIMGroupClient(SCIMClient[Group, SCIMProviderGroup, SCIMGroupSchema]):
             provider=self.provider, group=group, scim_id=scim_id
         )
 
-    def update(self, group: Group, connection: SCIMProviderGroup):
+    def update(self, group: Group, connection: SCIMProviderGroup, scim_group: SCIMGroupSchema):
         """Update existing group"""
-        scim_group = self.to_schema(group, connection)
         scim_group.id = connection.scim_id
         try:
             return self._request(
@@ -116,7 +120,7 @@ class SCIMGroupClient(SCIMClient[Group, SCIMProviderGroup, SCIMGroupSchema]):
         except (SCIMRequestException, ObjectExistsSyncException):
             # Some providers don't support PUT on groups, so this is mainly a fix for the initial
             # sync, send patch add requests for all the users the group currently has
-            users = list(group.users.order_by("id").values_list("id", flat=True))
+            users = group_member_pks(group)
             self._patch_add_users(group, users)
             # Also update the group name
             return self._patch(
@@ -128,6 +132,45 @@ class SCIMGroupClient(SCIMClient[Group, SCIMProviderGroup, SCIMGroupSchema]):
                 ),
             )
 
+    def bulk_fallback(
+        self,
+        group: Group,
+        connection: SCIMProviderGroup | None,
+        operation: BulkOperation,
+        exc: BaseSyncException,
+    ) -> BulkOperation | None:
+        """Same as self.update, if replacing the group failed, patch its members and name"""
+        if not connection or not isinstance(exc, SCIMRequestException | ObjectExistsSyncException):
+            return None
+        patch_operations = []
+        users = group_member_pks(group)
+        user_ids = list(
+            SCIMProviderUser.objects.filter(user__pk__in=users, provider=self.provider).values_list(
+                "scim_id", flat=True
+            )
+        )
+        if user_ids:
+            patch_operations.append(
+                PatchOperation(
+                    op=PatchOp.add,
+                    path="members",
+                    value=[{"value": x} for x in user_ids],
+                )
+            )
+        patch_operations.append(
+            PatchOperation(
+                op=PatchOp.replace,
+                path="displayName",
+                value=operation.data.get("displayName"),
+            )
+        )
+        return BulkOperation(
+            method="PATCH",
+            path=operation.path,
+            bulkId=operation.bulkId,
+            data=PatchRequest(Operations=patch_operations).model_dump(mode="json"),
+        )
+
     def update_group(self, group: Group, action: Direction, users_set: set[int]):
         """Update a group, either using PUT to replace it or PATCH if supported"""
         if self._config.patch.supported:
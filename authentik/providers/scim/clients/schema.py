@@ -1,9 +1,11 @@
 """Custom SCIM schemas"""
 
+from pydantic import BaseModel, Field
 from pydanticscim.group import Group as BaseGroup
 from pydanticscim.responses import PatchRequest as BasePatchRequest
 from pydanticscim.responses import SCIMError as BaseSCIMError
-from pydanticscim.service_provider import Bulk, ChangePassword, Filter, Patch, Sort
+from pydanticscim.service_provider import Bulk as BaseBulk
+from pydanticscim.service_provider import ChangePassword, Filter, Patch, Sort
 from pydanticscim.service_provider import (
     ServiceProviderConfiguration as BaseServiceProviderConfiguration,
 )
@@ -11,6 +13,7 @@ from pydanticscim.user import User as BaseUser
 
 SCIM_USER_SCHEMA = "urn:ietf:params:scim:schemas:core:2.0:User"
 SCIM_GROUP_SCHEMA = "urn:ietf:params:scim:schemas:core:2.0:Group"
+SCIM_BULK_REQUEST_SCHEMA = "urn:ietf:params:scim:api:messages:2.0:BulkRequest"
 
 
 class User(BaseUser):
@@ -29,9 +32,17 @@ class Group(BaseGroup):
     meta: dict | None = None
 
 
+class Bulk(BaseBulk):
+    """Bulk configuration with the limits advertised by the service provider"""
+
+    maxOperations: int | None = None
+    maxPayloadSize: int | None = None
+
+
 class ServiceProviderConfiguration(BaseServiceProviderConfiguration):
     """ServiceProviderConfig with fallback"""
 
+    bulk: Bulk
     _is_fallback: bool | None = False
 
     @property
@@ -64,3 +75,36 @@ class SCIMError(BaseSCIMError):
     """SCIM error with optional status code"""
 
     status: int | None
+
+
+class BulkOperation(BaseModel):
+    """Single operation of a bulk request"""
+
+    method: str
+    path: str
+    bulkId: str | None = None
+    data: dict | None = None
+
+
+class BulkRequest(BaseModel):
+    """Bulk request, https://datatracker.ietf.org/doc/html/rfc7644#section-3.7"""
+
+    schemas: tuple[str] = (SCIM_BULK_REQUEST_SCHEMA,)
+    Operations: list[BulkOperation] = Field(default_factory=list)
+
+
+class BulkResponseOperation(BaseModel):
+    """Result of a single operation of a bulk request"""
+
+    method: str | None = None
+    bulkId: str | None = None
+    location: str | None = None
+    # Status is a string in the RFC examples, however some providers return an integer
+    status: int
+    response: dict | None = None
+
+
+class BulkResponse(BaseModel):
+    """Response to a bulk request"""
+
+    Operations: list[BulkResponseOperation] = Field(default_factory=list)
@@ -17,6 +17,7 @@ class SCIMUserClient(SCIMClient[User, SCIMProviderUser, SCIMUserSchema]):
 
     connection_type = SCIMProviderUser
     connection_type_query = "user"
+    resource_path = "/Users"
     mapper: PropertyMappingManager
 
     def __init__(self, provider: SCIMProvider):
@@ -52,9 +53,8 @@ class SCIMUserClient(SCIMClient[User, SCIMProviderUser, SCIMUserSchema]):
         scim_user.delete()
         return response
 
-    def create(self, user: User):
+    def create(self, user: User, scim_user: SCIMUserSchema):
         """Create user from scratch and create a connection object"""
-        scim_user = self.to_schema(user, None)
         response = self._request(
             "POST",
             "/Users",
@@ -68,9 +68,8 @@ class SCIMUserClient(SCIMClient[User, SCIMProviderUser, SCIMUserSchema]):
             raise StopSync("SCIM Response with missing or invalid `id`")
         return SCIMProviderUser.objects.create(provider=self.provider, user=user, scim_id=scim_id)
 
-    def update(self, user: User, connection: SCIMProviderUser):
+    def update(self, user: User, connection: SCIMProviderUser, scim_user: SCIMUserSchema):
         """Update existing user"""
-        scim_user = self.to_schema(user, connection)
         scim_user.id = connection.scim_id
         self._request(
             "PUT",
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.7 on 2024-07-25 09:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("authentik_providers_scim", "0009_scimprovidergroup_sync_hash_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="scimprovider",
+            name="sync_checkpoint",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -35,3 +35,8 @@ def scim_sync_direct(*args, **kwargs):
 @CELERY_APP.task(autoretry_for=(TransientSyncException,), retry_backoff=True)
 def scim_sync_m2m(*args, **kwargs):
     return sync_tasks.sync_signal_m2m(*args, **kwargs)
+
+
+@CELERY_APP.task()
+def scim_sync_journal(window: int):
+    return sync_tasks.sync_signal_journal(window, scim_sync_direct, scim_sync_m2m)
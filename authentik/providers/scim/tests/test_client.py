@@ -1,14 +1,17 @@
 """SCIM Client tests"""
 
+from unittest.mock import patch
+
 from django.test import TestCase
 from requests_mock import Mocker
 
 from authentik.blueprints.tests import apply_blueprint
-from authentik.core.models import Application
+from authentik.core.models import Application, User
 from authentik.lib.generators import generate_id
+from authentik.lib.sync.outgoing.discovery import invalidate_discovered
 from authentik.providers.scim.clients.base import SCIMClient
 from authentik.providers.scim.models import SCIMMapping, SCIMProvider
-from authentik.providers.scim.tasks import scim_sync_all
+from authentik.providers.scim.tasks import scim_sync_all, sync_tasks
 
 
 class SCIMClientTests(TestCase):
@@ -85,6 +88,51 @@ class SCIMClientTests(TestCase):
             self.assertEqual(mock.call_count, 1)
             self.assertEqual(mock.request_history[0].method, "GET")
 
+    def test_config_cached(self):
+        """Test config is cached between clients, but invalid configs are not"""
+        with Mocker() as mock:
+            mock: Mocker
+            mock.get(
+                "https://localhost/ServiceProviderConfig",
+                json={
+                    "patch": {"supported": True},
+                    "bulk": {"supported": True, "maxOperations": 10},
+                    "filter": {"supported": True, "maxResults": 50},
+                    "changePassword": {"supported": False},
+                    "sort": {"supported": False},
+                    "authenticationSchemes": [],
+                },
+            )
+            self.assertTrue(SCIMClient(self.provider).bulk_supported)
+            self.assertTrue(SCIMClient(self.provider).bulk_supported)
+            self.assertEqual(mock.call_count, 1)
+            invalidate_discovered(self.provider)
+            mock.get("https://localhost/ServiceProviderConfig", json={})
+            self.assertFalse(SCIMClient(self.provider).bulk_supported)
+            self.assertFalse(SCIMClient(self.provider).bulk_supported)
+            self.assertEqual(mock.call_count, 3)
+
+    @patch("authentik.lib.sync.outgoing.tasks.PAGE_SIZE", 2)
+    def test_page_bounds(self):
+        """Test splitting objects into pages by primary key"""
+        users = User.objects.bulk_create([User(username=generate_id()) for _ in range(5)])
+        pks = [str(pk) for pk in sorted(user.pk for user in users)]
+        self.assertEqual(
+            sync_tasks.page_bounds(User.objects.filter(pk__in=pks)),
+            [(None, pks[1]), (pks[1], pks[3]), (pks[3], None)],
+        )
+        # No empty last page
+        self.assertEqual(
+            sync_tasks.page_bounds(User.objects.filter(pk__in=pks[:4])),
+            [(None, pks[1]), (pks[1], None)],
+        )
+        self.assertEqual(sync_tasks.page_bounds(User.objects.none()), [(None, None)])
+        # Resuming after a page
+        self.assertEqual(
+            sync_tasks.page_bounds(User.objects.filter(pk__in=pks), pks[1]),
+            [(pks[1], pks[3]), (pks[3], None)],
+        )
+
     def test_scim_sync_all(self):
         """test scim_sync_all task"""
         scim_sync_all()
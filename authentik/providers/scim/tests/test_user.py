@@ -1,16 +1,25 @@
 """SCIM User tests"""
 
 from json import loads
+from unittest.mock import MagicMock, patch
 
+from django.db import DatabaseError
 from django.test import TestCase
+from django.utils.text import slugify
+from django.utils.timezone import now
 from jsonschema import validate
 from requests_mock import Mocker
 
 from authentik.blueprints.tests import apply_blueprint
 from authentik.core.models import Application, Group, User
+from authentik.events.models import SystemTask, TaskStatus
+from authentik.lib.config import CONFIG
 from authentik.lib.generators import generate_id
-from authentik.providers.scim.models import SCIMMapping, SCIMProvider
-from authentik.providers.scim.tasks import scim_sync, sync_tasks
+from authentik.lib.sync.outgoing.exceptions import TransientSyncException
+from authentik.lib.sync.outgoing.journal import SyncJournal
+from authentik.providers.scim.clients.users import SCIMUserClient
+from authentik.providers.scim.models import SCIMMapping, SCIMProvider, SCIMProviderUser
+from authentik.providers.scim.tasks import scim_sync, scim_sync_journal, sync_tasks
 from authentik.tenants.models import Tenant
 
 
@@ -209,6 +218,7 @@ class SCIMUserTests(TestCase):
                 "userName": uid,
             },
         )
+        user.name = "new name"
         user.save()
         self.assertEqual(mock.call_count, 4)
         self.assertEqual(mock.request_history[0].method, "GET")
@@ -216,6 +226,75 @@ class SCIMUserTests(TestCase):
         self.assertEqual(mock.request_history[2].method, "GET")
         self.assertEqual(mock.request_history[3].method, "PUT")
 
+    @Mocker()
+    def test_user_create_unchanged(self, mock: Mocker):
+        """Test user update is skipped when nothing changed"""
+        scim_id = generate_id()
+        mock.get(
+            "https://localhost/ServiceProviderConfig",
+            json={},
+        )
+        mock.post(
+            "https://localhost/Users",
+            json={
+                "id": scim_id,
+            },
+        )
+        uid = generate_id()
+        user = User.objects.create(
+            username=uid,
+            name=f"{uid} {uid}",
+            email=f"{uid}@goauthentik.io",
+        )
+        self.assertEqual(mock.call_count, 2)
+        sync_hash = SCIMProviderUser.objects.get(provider=self.provider, user=user).sync_hash
+        self.assertIsNotNone(sync_hash)
+        user.last_login = now()
+        user.save()
+        self.assertEqual(mock.call_count, 3)
+        self.assertEqual(mock.request_history[2].method, "GET")
+        # Once the data sent has changed, the user is updated again
+        mock.put(
+            f"https://localhost/Users/{scim_id}",
+            json={
+                "id": scim_id,
+            },
+        )
+        user.name = "new name"
+        user.save()
+        self.assertEqual(mock.call_count, 5)
+        self.assertEqual(mock.request_history[4].method, "PUT")
+        self.assertNotEqual(
+            SCIMProviderUser.objects.get(provider=self.provider, user=user).sync_hash, sync_hash
+        )
+
+    @Mocker()
+    def test_user_write_single_render(self, mock: Mocker):
+        """Test that writing a user only converts it to the SCIM schema once"""
+        scim_id = generate_id()
+        mock.get("https://localhost/ServiceProviderConfig", json={})
+        mock.post("https://localhost/Users", json={"id": scim_id})
+        mock.put(f"https://localhost/Users/{scim_id}", json={"id": scim_id})
+        uid = generate_id()
+        user = User.objects.create(
+            username=uid,
+            name=f"{uid} {uid}",
+            email=f"{uid}@goauthentik.io",
+        )
+        SCIMProviderUser.objects.filter(provider=self.provider).delete()
+        client = SCIMUserClient(self.provider)
+        with patch.object(
+            SCIMUserClient, "to_schema", autospec=True, side_effect=SCIMUserClient.to_schema
+        ) as to_schema:
+            _, created = client.write(user)
+            self.assertTrue(created)
+            self.assertEqual(to_schema.call_count, 1)
+            user.name = "new name"
+            _, created = client.write(user)
+            self.assertFalse(created)
+            self.assertEqual(to_schema.call_count, 2)
+        self.assertEqual(mock.request_history[-1].method, "PUT")
+
     @Mocker()
     def test_user_create_delete(self, mock: Mocker):
         """Test user creation"""
@@ -301,6 +380,8 @@ class SCIMUserTests(TestCase):
             name=f"{uid} {uid}",
             email=f"{uid}@goauthentik.io",
         )
+        # Change the user without triggering signals, so the full sync has to update them
+        User.objects.filter(pk=user.pk).update(name="new name")
 
         sync_tasks.trigger_single_task(self.provider, scim_sync).get()
 
@@ -330,3 +411,453 @@ class SCIMUserTests(TestCase):
                 "userName": uid,
             },
         )
+
+    @Mocker()
+    def test_sync_task_parallel_pages(self, mock: Mocker):
+        """Test sync task with multiple pages synced in parallel"""
+        mock.get(
+            "https://localhost/ServiceProviderConfig",
+            json={},
+        )
+        mock.post(
+            "https://localhost/Users",
+            json=lambda request, context: {
+                "id": generate_id(),
+            },
+        )
+        for _ in range(3):
+            uid = generate_id()
+            User.objects.create(
+                username=uid,
+                name=f"{uid} {uid}",
+                email=f"{uid}@goauthentik.io",
+            )
+
+        with (
+            patch("authentik.lib.sync.outgoing.tasks.PAGE_SIZE", 1),
+            CONFIG.patch("outgoing_sync.page_concurrency", 2),
+        ):
+            sync_tasks.trigger_single_task(self.provider, scim_sync).get()
+
+        task = SystemTask.objects.filter(name="scim_sync", uid=slugify(self.provider.name)).first()
+        self.assertEqual(task.status, TaskStatus.SUCCESSFUL)
+        # Messages are still in order of pages
+        self.assertEqual(
+            [
+                message["event"]
+                for message in task.messages
+                if message["event"].startswith("Syncing page")
+            ],
+            [
+                "Syncing page 1 of users",
+                "Syncing page 2 of users",
+                "Syncing page 3 of users",
+            ],
+        )
+
+    @Mocker()
+    def test_sync_task_resume(self, mock: Mocker):
+        """Test sync task resuming after the last completed page of an interrupted sync"""
+        mock.get(
+            "https://localhost/ServiceProviderConfig",
+            json={},
+        )
+        mock.post(
+            "https://localhost/Users",
+            json=lambda request, context: {
+                "id": generate_id(),
+            },
+        )
+        users = []
+        for _ in range(3):
+            uid = generate_id()
+            users.append(
+                User.objects.create(
+                    username=uid,
+                    name=f"{uid} {uid}",
+                    email=f"{uid}@goauthentik.io",
+                )
+            )
+        pks = sorted(user.pk for user in users)
+        run = generate_id()
+        SCIMProvider.objects.filter(pk=self.provider.pk).update(
+            sync_checkpoint={
+                "run": run,
+                "object_type": "authentik.core.models.User",
+                "pk": str(pks[0]),
+                "page": 1,
+            }
+        )
+
+        with patch("authentik.lib.sync.outgoing.tasks.PAGE_SIZE", 1):
+            sync_tasks.trigger_single_task(self.provider, scim_sync).get()
+
+        # Only users after the checkpoint are synced
+        self.assertEqual(mock.call_count, 3)
+        self.assertFalse(SCIMProviderUser.objects.filter(user__pk=pks[0]).exists())
+        task = SystemTask.objects.filter(name="scim_sync", uid=slugify(self.provider.name)).first()
+        self.assertEqual(task.status, TaskStatus.SUCCESSFUL)
+        self.assertEqual(
+            [
+                message["event"]
+                for message in task.messages
+                if message["event"].startswith(("Syncing page", "Resuming"))
+            ],
+            [
+                f"Resuming interrupted full provider sync {run}",
+                "Syncing page 2 of users",
+                "Syncing page 3 of users",
+            ],
+        )
+        self.provider.refresh_from_db()
+        self.assertEqual(self.provider.sync_checkpoint, {})
+
+    @Mocker()
+    def test_sync_task_page_status(self, mock: Mocker):
+        """Test that the task keeps the messages of completed pages when the sync fails"""
+        mock.get(
+            "https://localhost/ServiceProviderConfig",
+            json={},
+        )
+        mock.post(
+            "https://localhost/Users",
+            json=lambda request, context: {
+                "id": generate_id(),
+            },
+        )
+        self.app.backchannel_providers.remove(self.provider)
+        for _ in range(2):
+            uid = generate_id()
+            User.objects.create(
+                username=uid,
+                name=f"{uid} {uid}",
+                email=f"{uid}@goauthentik.io",
+            )
+        self.app.backchannel_providers.add(self.provider)
+
+        with (
+            patch("authentik.lib.sync.outgoing.tasks.PAGE_SIZE", 1),
+            patch.object(
+                sync_tasks, "save_checkpoint", MagicMock(side_effect=[None, DatabaseError()])
+            ),
+            self.assertRaises(DatabaseError),
+        ):
+            sync_tasks.trigger_single_task(self.provider, scim_sync).get()
+
+        task = SystemTask.objects.filter(name="scim_sync", uid=slugify(self.provider.name)).first()
+        self.assertEqual(task.status, TaskStatus.UNKNOWN)
+        events = [message["event"] for message in task.messages]
+        self.assertIn("Syncing page 1 of users", events)
+        self.assertNotIn("Syncing page 2 of users", events)
+        self.assertNotIn("Sync interrupted, resuming after the last completed page", events)
+
+    @Mocker()
+    def test_sync_task_transient_status(self, mock: Mocker):
+        """Test that the task is marked as interrupted after a transient error"""
+        mock.get(
+            "https://localhost/ServiceProviderConfig",
+            json={},
+        )
+        mock.post(
+            "https://localhost/Users",
+            json=lambda request, context: {
+                "id": generate_id(),
+            },
+        )
+        self.app.backchannel_providers.remove(self.provider)
+        for _ in range(2):
+            uid = generate_id()
+            User.objects.create(
+                username=uid,
+                name=f"{uid} {uid}",
+                email=f"{uid}@goauthentik.io",
+            )
+        self.app.backchannel_providers.add(self.provider)
+
+        # Stop the task instead of retrying it, to check the status it's retried with
+        with (
+            patch("authentik.lib.sync.outgoing.tasks.PAGE_SIZE", 1),
+            patch.object(
+                sync_tasks,
+                "save_checkpoint",
+                MagicMock(side_effect=[None, TransientSyncException()]),
+            ),
+            patch.object(scim_sync, "retry", MagicMock(return_value=DatabaseError())),
+            self.assertRaises(DatabaseError),
+        ):
+            sync_tasks.trigger_single_task(self.provider, scim_sync).get()
+
+        task = SystemTask.objects.filter(name="scim_sync", uid=slugify(self.provider.name)).first()
+        self.assertEqual(task.status, TaskStatus.WARNING)
+        events = [message["event"] for message in task.messages]
+        self.assertIn("Syncing page 1 of users", events)
+        self.assertIn("Sync interrupted, resuming after the last completed page", events)
+
+    @Mocker()
+    def test_sync_task_bulk(self, mock: Mocker):
+        """Test sync task with bulk requests"""
+
+        def bulk_response(request, context):
+            operations = []
+            for operation in request.json()["Operations"]:
+                if operation["data"]["userName"] == failed_uid:
+                    operations.append(
+                        {
+                            "method": operation["method"],
+                            "bulkId": operation["bulkId"],
+                            "status": "400",
+                            "response": {
+                                "schemas": ["urn:ietf:params:scim:api:messages:2.0:Error"],
+                                "scimType": "invalidValue",
+                                "detail": "Invalid userName",
+                                "status": "400",
+                            },
+                        }
+                    )
+                    continue
+                operations.append(
+                    {
+                        "method": operation["method"],
+                        "bulkId": operation["bulkId"],
+                        "status": "201",
+                        "location": f"https://localhost/Users/{generate_id()}",
+                    }
+                )
+            return {
+                "schemas": ["urn:ietf:params:scim:api:messages:2.0:BulkResponse"],
+                "Operations": operations,
+            }
+
+        mock.get(
+            "https://localhost/ServiceProviderConfig",
+            json={
+                "patch": {"supported": True},
+                "bulk": {"supported": True, "maxOperations": 2, "maxPayloadSize": 1048576},
+                "filter": {"supported": False},
+                "changePassword": {"supported": False},
+                "sort": {"supported": False},
+                "authenticationSchemes": [],
+            },
+        )
+        mock.post(
+            "https://localhost/Users",
+            json={
+                "id": generate_id(),
+            },
+        )
+        mock.post("https://localhost/Bulk", json=bulk_response)
+        uids = [generate_id() for _ in range(3)]
+        failed_uid = uids[-1]
+        for uid in uids:
+            User.objects.create(
+                username=uid,
+                name=f"{uid} {uid}",
+                email=f"{uid}@goauthentik.io",
+            )
+        # Users were created in the service provider by signals, remove the connections
+        # so they're all created in bulk
+        SCIMProviderUser.objects.filter(provider=self.provider).delete()
+
+        sync_tasks.trigger_single_task(self.provider, scim_sync).get()
+
+        bulk_requests = [
+            request for request in mock.request_history if request.url == "https://localhost/Bulk"
+        ]
+        self.assertEqual(len(bulk_requests), 2)
+        self.assertEqual(len(bulk_requests[0].json()["Operations"]), 2)
+        self.assertEqual(len(bulk_requests[1].json()["Operations"]), 1)
+        self.assertEqual(
+            set(
+                SCIMProviderUser.objects.filter(provider=self.provider).values_list(
+                    "user__username", flat=True
+                )
+            ),
+            set(uids[:2]),
+        )
+        task = SystemTask.objects.filter(name="scim_sync", uid=slugify(self.provider.name)).first()
+        self.assertTrue(
+            any(
+                message["event"].startswith(f"Failed to sync user {failed_uid} {failed_uid}")
+                for message in task.messages
+            )
+        )
+
+    @Mocker()
+    def test_sync_task_bulk_save_fallback(self, mock: Mocker):
+        """Test connections being saved one by one when saving them in bulk fails"""
+
+        def bulk_response(request, context):
+            return {
+                "schemas": ["urn:ietf:params:scim:api:messages:2.0:BulkResponse"],
+                "Operations": [
+                    {
+                        "method": operation["method"],
+                        "bulkId": operation["bulkId"],
+                        "status": "201",
+                        "location": f"https://localhost/Users/{generate_id()}",
+                    }
+                    for operation in request.json()["Operations"]
+                ],
+            }
+
+        mock.get(
+            "https://localhost/ServiceProviderConfig",
+            json={
+                "patch": {"supported": True},
+                "bulk": {"supported": True, "maxOperations": 10, "maxPayloadSize": 1048576},
+                "filter": {"supported": False},
+                "changePassword": {"supported": False},
+                "sort": {"supported": False},
+                "authenticationSchemes": [],
+            },
+        )
+        mock.post("https://localhost/Users", json={"id": generate_id()})
+        mock.post("https://localhost/Bulk", json=bulk_response)
+        uids = [generate_id() for _ in range(2)]
+        for uid in uids:
+            User.objects.create(
+                username=uid,
+                name=f"{uid} {uid}",
+                email=f"{uid}@goauthentik.io",
+            )
+        SCIMProviderUser.objects.filter(provider=self.provider).delete()
+
+        with patch.object(
+            SCIMProviderUser.objects, "bulk_create", MagicMock(side_effect=DatabaseError())
+        ):
+            sync_tasks.trigger_single_task(self.provider, scim_sync).get()
+        self.assertEqual(
+            set(
+                SCIMProviderUser.objects.filter(provider=self.provider).values_list(
+                    "user__username", flat=True
+                )
+            ),
+            set(uids),
+        )
+
+    @Mocker()
+    def test_write_many_bulk_unsupported(self, mock: Mocker):
+        """Test objects being written with single requests when the bulk request fails"""
+        mock.get(
+            "https://localhost/ServiceProviderConfig",
+            json={
+                "patch": {"supported": True},
+                "bulk": {"supported": True, "maxOperations": 10, "maxPayloadSize": 1048576},
+                "filter": {"supported": False},
+                "changePassword": {"supported": False},
+                "sort": {"supported": False},
+                "authenticationSchemes": [],
+            },
+        )
+        mock.post("https://localhost/Users", json=lambda request, context: {"id": generate_id()})
+        mock.post("https://localhost/Bulk", status_code=501)
+        uids = [generate_id() for _ in range(2)]
+        users = [
+            User.objects.create(username=uid, name=f"{uid} {uid}", email=f"{uid}@goauthentik.io")
+            for uid in uids
+        ]
+        SCIMProviderUser.objects.filter(provider=self.provider).delete()
+
+        results = list(SCIMUserClient(self.provider).write_many(users))
+        self.assertEqual(results, [(user, None) for user in users])
+        self.assertEqual(
+            set(
+                SCIMProviderUser.objects.filter(provider=self.provider).values_list(
+                    "user__username", flat=True
+                )
+            ),
+            set(uids),
+        )
+
+    @Mocker()
+    def test_write_many_bulk_transient(self, mock: Mocker):
+        """Test bulk requests stopping after a transient error"""
+        mock.get(
+            "https://localhost/ServiceProviderConfig",
+            json={
+                "patch": {"supported": True},
+                "bulk": {"supported": True, "maxOperations": 2, "maxPayloadSize": 1048576},
+                "filter": {"supported": False},
+                "changePassword": {"supported": False},
+                "sort": {"supported": False},
+                "authenticationSchemes": [],
+            },
+        )
+        mock.post("https://localhost/Users", json=lambda request, context: {"id": generate_id()})
+        mock.post("https://localhost/Bulk", status_code=429)
+        users = []
+        for _ in range(3):
+            uid = generate_id()
+            users.append(
+                User.objects.create(
+                    username=uid, name=f"{uid} {uid}", email=f"{uid}@goauthentik.io"
+                )
+            )
+        SCIMProviderUser.objects.filter(provider=self.provider).delete()
+        mock.reset_mock()
+
+        results = list(SCIMUserClient(self.provider).write_many(users))
+        self.assertEqual([obj for obj, _ in results], users)
+        for _, exc in results:
+            self.assertIsInstance(exc, TransientSyncException)
+        bulk_requests = [
+            request for request in mock.request_history if request.url == "https://localhost/Bulk"
+        ]
+        self.assertEqual(len(bulk_requests), 1)
+
+    @Mocker()
+    def test_sync_journal(self, mock: Mocker):
+        """Test multiple changes of a user being synced once"""
+        scim_id = generate_id()
+        mock.get(
+            "https://localhost/ServiceProviderConfig",
+            json={},
+        )
+        mock.post(
+            "https://localhost/Users",
+            json={
+                "id": scim_id,
+            },
+        )
+        uid = generate_id()
+        with (
+            CONFIG.patch("outgoing_sync.debounce_seconds", 60),
+            patch("authentik.lib.sync.outgoing.journal.time", MagicMock(return_value=6000)),
+            patch.object(scim_sync_journal, "apply_async") as apply_async,
+        ):
+            user = User.objects.create(
+                username=uid,
+                name=f"{uid} {uid}",
+                email=f"{uid}@goauthentik.io",
+            )
+            user.name = "new name"
+            user.save()
+            user.save()
+        self.assertEqual(mock.call_count, 0)
+        apply_async.assert_called_once()
+        self.assertEqual(apply_async.call_args.args[0], (100,))
+        self.assertEqual(apply_async.call_args.kwargs["countdown"], 61)
+
+        scim_sync_journal(100)
+        self.assertEqual(mock.call_count, 2)
+        self.assertEqual(mock.request_history[0].method, "GET")
+        self.assertEqual(mock.request_history[1].method, "POST")
+        self.assertEqual(mock.request_history[1].json()["displayName"], "new name")
+        self.assertTrue(SCIMProviderUser.objects.filter(provider=self.provider, user=user).exists())
+        # The journal has been flushed
+        scim_sync_journal(100)
+        self.assertEqual(mock.call_count, 2)
+
+    def test_sync_journal_pop(self):
+        """Test that popping a window returns the last membership action and removes it"""
+        journal = SyncJournal(SCIMProvider)
+        with (
+            CONFIG.patch("outgoing_sync.debounce_seconds", 60),
+            patch("authentik.lib.sync.outgoing.journal.time", MagicMock(return_value=6000)),
+        ):
+            window = journal.record_membership("group", "post_add", [1, 2])
+            journal.record_membership("group", "post_remove", [2])
+        entries = journal.pop(window)
+        self.assertEqual(entries.memberships["group"]["post_add"], {1})
+        self.assertEqual(entries.memberships["group"]["post_remove"], {2})
+        self.assertFalse(journal.pop(window))
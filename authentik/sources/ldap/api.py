@@ -81,6 +81,8 @@ class LDAPSourceSerializer(SourceSerializer):
             "sync_users_password",
             "sync_groups",
             "sync_parent_group",
+            "additional_attributes",
+            "incremental_sync",
             "property_mappings",
             "property_mappings_group",
             "connectivity",
@@ -116,6 +118,7 @@ class LDAPSourceViewSet(UsedByMixin, ModelViewSet):
         "sync_users_password",
         "sync_groups",
         "sync_parent_group",
+        "incremental_sync",
         "property_mappings",
         "property_mappings_group",
     ]
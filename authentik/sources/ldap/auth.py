@@ -1,15 +1,24 @@
 """authentik LDAP Authentication Backend"""
 
+from django.core.cache import cache
 from django.http import HttpRequest
 from ldap3.core.exceptions import LDAPException, LDAPInvalidCredentialsResult
 from structlog.stdlib import get_logger
 
 from authentik.core.auth import InbuiltBackend
-from authentik.core.models import User
+from authentik.core.models import User, UserSourceConnection
 from authentik.sources.ldap.models import LDAPSource
+from authentik.sources.ldap.pool import get_pool
 
 LOGGER = get_logger()
 LDAP_DISTINGUISHED_NAME = "distinguishedName"
+CACHE_KEY_USER_SOURCE = "goauthentik.io/sources/ldap/user_source/"
+CACHE_TIMEOUT_USER_SOURCE = 60 * 60 * 24 * 7
+
+
+def user_source_cache_key(user_pk: int) -> str:
+    """Cache key holding the pk of the LDAP source a user was synced from"""
+    return f"{CACHE_KEY_USER_SOURCE}{user_pk}"
 
 
 class LDAPBackend(InbuiltBackend):
@@ -19,14 +28,41 @@ class LDAPBackend(InbuiltBackend):
         """Try to authenticate a user via ldap"""
         if "password" not in kwargs:
             return None
-        for source in LDAPSource.objects.filter(enabled=True):
+        sources = LDAPSource.objects.filter(enabled=True)
+        filters = {key: value for key, value in kwargs.items() if key != "password"}
+        known_user = User.objects.filter(**filters).only("pk").first()
+        if not known_user:
+            return None
+        # Only bind against the source the user was synced from when it's known, otherwise
+        # against all sources
+        source_pk = self.user_source(known_user)
+        sources = list(sources.order_by("pk"))
+        known_sources = [source for source in sources if str(source.pk) == str(source_pk)]
+        for source in known_sources or sources:
             LOGGER.debug("LDAP Auth attempt", source=source)
             user = self.auth_user(source, **kwargs)
             if user:
                 self.set_method("ldap", request, source=source)
+                cache.set(
+                    user_source_cache_key(user.pk), source.pk, timeout=CACHE_TIMEOUT_USER_SOURCE
+                )
                 return user
         return None
 
+    def user_source(self, user: User) -> str | None:
+        """Get the pk of the LDAP source `user` was synced from or last authenticated
+        against, if known"""
+        source_pk = cache.get(user_source_cache_key(user.pk))
+        if source_pk:
+            return source_pk
+        return (
+            UserSourceConnection.objects.filter(
+                user=user, source__in=LDAPSource.objects.filter(enabled=True)
+            )
+            .values_list("source_id", flat=True)
+            .first()
+        )
+
     def auth_user(self, source: LDAPSource, password: str, **filters: str) -> User | None:
         """Try to bind as either user_dn or mail with password.
         Returns True on success, otherwise False"""
@@ -57,14 +93,11 @@ class LDAPBackend(InbuiltBackend):
         # Try to bind as new user
         LOGGER.debug("Attempting to bind as user", user=user)
         try:
-            # source.connection also attempts to bind
-            source.connection(
-                connection_kwargs={
-                    "user": user.attributes.get(LDAP_DISTINGUISHED_NAME),
-                    "password": password,
-                }
-            )
-            return user
+            # Binds with a pooled connection, or opens a new connection when none is idle
+            with get_pool(source).connection(
+                source, user.attributes.get(LDAP_DISTINGUISHED_NAME), password
+            ):
+                return user
         except LDAPInvalidCredentialsResult as exc:
             LOGGER.debug("invalid LDAP credentials", user=user, exc=exc)
         except LDAPException as exc:
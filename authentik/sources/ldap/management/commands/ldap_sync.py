@@ -6,7 +6,7 @@ from authentik.sources.ldap.models import LDAPSource
 from authentik.sources.ldap.sync.groups import GroupLDAPSynchronizer
 from authentik.sources.ldap.sync.membership import MembershipLDAPSynchronizer
 from authentik.sources.ldap.sync.users import UserLDAPSynchronizer
-from authentik.sources.ldap.tasks import ldap_sync_paginator
+from authentik.sources.ldap.tasks import ldap_sync_stream
 from authentik.tenants.management import TenantCommand
 
 LOGGER = get_logger()
@@ -24,10 +24,9 @@ class Command(TenantCommand):
             if not source:
                 LOGGER.warning("Source does not exist", slug=source_slug)
                 continue
-            tasks = (
-                ldap_sync_paginator(source, UserLDAPSynchronizer)
-                + ldap_sync_paginator(source, GroupLDAPSynchronizer)
-                + ldap_sync_paginator(source, MembershipLDAPSynchronizer)
+            ldap_sync_stream(
+                source,
+                [UserLDAPSynchronizer, GroupLDAPSynchronizer],
+                [MembershipLDAPSynchronizer],
+                inline=True,
             )
-            for task in tasks:
-                task()
@@ -0,0 +1,26 @@
+# Generated by Django 5.0.7 on 2024-07-22 12:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("authentik_sources_ldap", "0004_ldapsource_password_login_update_internal_password"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="ldapsource",
+            name="incremental_sync",
+            field=models.BooleanField(
+                default=False,
+                help_text="Only sync objects which have been changed since the last sync. A full sync is still done periodically.",
+            ),
+        ),
+        migrations.AddField(
+            model_name="ldapsource",
+            name="incremental_sync_state",
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.0.7 on 2024-07-23 09:14
+
+import django.contrib.postgres.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("authentik_sources_ldap", "0005_ldapsource_incremental_sync_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="ldapsource",
+            name="additional_attributes",
+            field=django.contrib.postgres.fields.ArrayField(
+                base_field=models.TextField(),
+                blank=True,
+                default=list,
+                help_text="Additional attributes to fetch when syncing. Attributes used by property mappings are detected automatically. Add '*' to fetch all attributes.",
+                size=None,
+            ),
+        ),
+    ]
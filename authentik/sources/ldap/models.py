@@ -7,6 +7,7 @@ from ssl import CERT_REQUIRED
 from tempfile import NamedTemporaryFile, mkdtemp
 
 import pglock
+from django.contrib.postgres.fields import ArrayField
 from django.db import connection, models
 from django.templatetags.static import static
 from django.utils.translation import gettext_lazy as _
@@ -116,6 +117,25 @@ class LDAPSource(Source):
         Group, blank=True, null=True, default=None, on_delete=models.SET_DEFAULT
     )
 
+    additional_attributes = ArrayField(
+        models.TextField(),
+        default=list,
+        blank=True,
+        help_text=_(
+            "Additional attributes to fetch when syncing. Attributes used by property mappings "
+            "are detected automatically. Add '*' to fetch all attributes."
+        ),
+    )
+
+    incremental_sync = models.BooleanField(
+        default=False,
+        help_text=_(
+            "Only sync objects which have been changed since the last sync. "
+            "A full sync is still done periodically."
+        ),
+    )
+    incremental_sync_state = models.JSONField(default=dict, blank=True, editable=False)
+
     @property
     def component(self) -> str:
         return "ak-source-ldap-form"
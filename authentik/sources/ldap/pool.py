@@ -0,0 +1,141 @@
+"""LDAP Connection pooling"""
+
+from collections import deque
+from collections.abc import Generator
+from contextlib import contextmanager
+from threading import Lock
+from time import monotonic
+
+from django.db import connection as db_connection
+from ldap3 import Connection
+from ldap3.core.exceptions import LDAPException, LDAPInvalidCredentialsResult
+from structlog.stdlib import get_logger
+
+from authentik.lib.config import CONFIG
+from authentik.sources.ldap.models import LDAPSource
+
+LOGGER = get_logger()
+
+
+class LDAPConnectionPool:
+    """Pool of connections to a single LDAP source, bound as the source's bind user while
+    idle. Connections are re-bound as the requested user, which saves opening a new socket
+    (and doing a TLS handshake) for every bind"""
+
+    def __init__(self, fingerprint: tuple):
+        self.fingerprint = fingerprint
+        self._idle: deque[tuple[Connection, float]] = deque()
+        self._lock = Lock()
+
+    def _checkout(self) -> Connection | None:
+        """Get an idle connection that hasn't been idle for too long"""
+        idle_timeout = CONFIG.get_int("ldap.pool_idle_timeout", 300)
+        conn = None
+        stale = []
+        with self._lock:
+            while self._idle:
+                idle_conn, last_used = self._idle.pop()
+                if monotonic() - last_used < idle_timeout:
+                    conn = idle_conn
+                    break
+                stale.append(idle_conn)
+        for stale_conn in stale:
+            self._discard(stale_conn)
+        return conn
+
+    def _checkin(self, conn: Connection):
+        """Return a connection to the pool, or close it if the pool is full"""
+        with self._lock:
+            if len(self._idle) < CONFIG.get_int("ldap.pool_size", 10):
+                self._idle.append((conn, monotonic()))
+                return
+        self._discard(conn)
+
+    def close(self):
+        """Close all idle connections"""
+        with self._lock:
+            idle = list(self._idle)
+            self._idle.clear()
+        for conn, _ in idle:
+            self._discard(conn)
+
+    def _discard(self, conn: Connection):
+        try:
+            conn.unbind()
+        except LDAPException as exc:
+            LOGGER.debug("failed to unbind pooled connection", exc=exc)
+
+    def _release(self, source: LDAPSource, conn: Connection, user: str):
+        """Return a connection to the pool once it's no longer used. Connections bound as an
+        end user are re-bound as the source's bind user first, so neither the user's
+        bind nor their password are kept around in the pool"""
+        if user != source.bind_cn:
+            if not source.bind_cn:
+                # Connections can't be reliably re-bound anonymously
+                self._discard(conn)
+                return
+            try:
+                conn.rebind(
+                    user=source.bind_cn, password=source.bind_password, read_server_info=False
+                )
+            except LDAPException as exc:
+                LOGGER.debug("failed to re-bind connection as bind user", exc=exc)
+                self._discard(conn)
+                return
+        self._checkin(conn)
+
+    @contextmanager
+    def connection(
+        self, source: LDAPSource, user: str | None = None, password: str | None = None
+    ) -> Generator[Connection]:
+        """Get a connection bound as `user`, or as the source's bind user when no `user`
+        is given. Raises LDAPInvalidCredentialsResult when the credentials are invalid."""
+        if user is None:
+            user, password = source.bind_cn, source.bind_password
+        conn = self._checkout()
+        while conn:
+            try:
+                conn.rebind(user=user, password=password, read_server_info=False)
+                break
+            except LDAPInvalidCredentialsResult:
+                # The connection can still be used after a failed bind
+                self._release(source, conn, user)
+                raise
+            except LDAPException as exc:
+                # Most likely the connection was closed by the server, try the next one
+                LOGGER.debug("failed to re-bind pooled connection", exc=exc)
+                self._discard(conn)
+                conn = self._checkout()
+        if not conn:
+            conn = source.connection(connection_kwargs={"user": user, "password": password})
+        try:
+            yield conn
+        except LDAPException:
+            self._discard(conn)
+            raise
+        self._release(source, conn, user)
+
+
+_pools: dict[tuple, LDAPConnectionPool] = {}
+_pools_lock = Lock()
+
+
+def get_pool(source: LDAPSource) -> LDAPConnectionPool:
+    """Get the connection pool for `source`, replacing it if the
+    connection settings of the source have changed"""
+    key = (db_connection.schema_name, source.pk)
+    fingerprint = (
+        source.server_uri,
+        source.start_tls,
+        source.sni,
+        source.peer_certificate_id,
+        source.client_certificate_id,
+    )
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool and pool.fingerprint == fingerprint:
+            return pool
+        _pools[key] = LDAPConnectionPool(fingerprint)
+    if pool:
+        pool.close()
+    return _pools[key]
@@ -0,0 +1,114 @@
+"""Derive the LDAP attributes required for syncing from property mappings"""
+
+from ast import (
+    AST,
+    Attribute,
+    Call,
+    Compare,
+    Constant,
+    In,
+    Name,
+    NodeVisitor,
+    NotIn,
+    Subscript,
+    parse,
+)
+from collections.abc import Iterable
+
+from ldap3 import ALL_ATTRIBUTES, ALL_OPERATIONAL_ATTRIBUTES
+
+from authentik.core.models import PropertyMapping
+
+ALL_LDAP_ATTRIBUTES = [ALL_ATTRIBUTES, ALL_OPERATIONAL_ATTRIBUTES]
+# Name of the variable LDAP attributes are passed as to property mappings
+LDAP_VARIABLE = "ldap"
+
+
+class DynamicAttributeAccess(Exception):
+    """The `ldap` variable is used in a way that doesn't allow knowing
+    which attributes are read, for example `ldap[key]` or `ldap.items()`"""
+
+
+class LDAPAttributeVisitor(NodeVisitor):
+    """Collect all attributes read from the `ldap` variable with constant keys,
+    `ldap.get("attr")`, `ldap["attr"]` and `"attr" in ldap`"""
+
+    def __init__(self):
+        super().__init__()
+        self.attributes: set[str] = set()
+
+    @staticmethod
+    def _is_ldap(node: AST) -> bool:
+        return isinstance(node, Name) and node.id == LDAP_VARIABLE
+
+    @staticmethod
+    def _constant(node: AST | None) -> str:
+        if isinstance(node, Constant) and isinstance(node.value, str):
+            return node.value
+        raise DynamicAttributeAccess()
+
+    def visit_Name(self, node: Name):
+        # Any use of `ldap` not handled below
+        if self._is_ldap(node):
+            raise DynamicAttributeAccess()
+
+    def visit_Call(self, node: Call):
+        func = node.func
+        if isinstance(func, Attribute) and self._is_ldap(func.value) and func.attr == "get":
+            if not node.args:
+                raise DynamicAttributeAccess()
+            self.attributes.add(self._constant(node.args[0]))
+            for arg in node.args[1:]:
+                self.visit(arg)
+            for keyword in node.keywords:
+                self.visit(keyword)
+            return
+        self.generic_visit(node)
+
+    def visit_Subscript(self, node: Subscript):
+        if self._is_ldap(node.value):
+            self.attributes.add(self._constant(node.slice))
+            return
+        self.generic_visit(node)
+
+    def visit_Compare(self, node: Compare):
+        if (
+            len(node.ops) == 1
+            and isinstance(node.ops[0], In | NotIn)
+            and self._is_ldap(node.comparators[0])
+        ):
+            self.attributes.add(self._constant(node.left))
+            return
+        self.generic_visit(node)
+
+
+def get_mapping_attributes(mappings: Iterable[PropertyMapping]) -> set[str] | None:
+    """Get all LDAP attributes read by `mappings`, or None if they
+    can't be determined for all mappings"""
+    attributes = set()
+    for mapping in mappings:
+        visitor = LDAPAttributeVisitor()
+        try:
+            visitor.visit(parse(mapping.expression))
+        except (DynamicAttributeAccess, SyntaxError, ValueError):
+            return None
+        attributes.update(visitor.attributes)
+    return attributes
+
+
+def get_search_attributes(
+    mappings: Iterable[PropertyMapping],
+    required: Iterable[str],
+    additional: Iterable[str],
+) -> list[str]:
+    """Get the attributes to request from LDAP, based on which attributes the property
+    mappings read, which attributes are `required` for syncing and `additional` attributes
+    configured by the administrator. Falls back to all attributes if the attributes
+    read by mappings can't be determined, or when `*` is configured."""
+    additional = set(additional)
+    if ALL_ATTRIBUTES in additional:
+        return ALL_LDAP_ATTRIBUTES
+    attributes = get_mapping_attributes(mappings)
+    if attributes is None:
+        return ALL_LDAP_ATTRIBUTES
+    return sorted(attributes | set(required) | additional)
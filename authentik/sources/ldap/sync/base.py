@@ -1,11 +1,16 @@
 """Sync LDAP Users and groups into authentik"""
 
 from collections.abc import Generator
+from datetime import UTC, datetime
+from functools import cached_property
 from typing import Any
 
 from django.conf import settings
+from django.core.exceptions import FieldError
+from django.db import DatabaseError, transaction
 from django.db.models.base import Model
-from ldap3 import DEREF_ALWAYS, SUBTREE, Connection
+from django.db.models.signals import post_save
+from ldap3 import ALL_OPERATIONAL_ATTRIBUTES, DEREF_ALWAYS, SUBTREE, Connection
 from structlog.stdlib import BoundLogger, get_logger
 
 from authentik.core.expression.exceptions import (
@@ -20,8 +25,13 @@ from authentik.lib.sync.outgoing.exceptions import StopSync
 from authentik.lib.utils.errors import exception_to_string
 from authentik.sources.ldap.auth import LDAP_DISTINGUISHED_NAME
 from authentik.sources.ldap.models import LDAPSource
+from authentik.sources.ldap.sync.attributes import ALL_LDAP_ATTRIBUTES, get_search_attributes
 
 LDAP_UNIQUENESS = "ldap_uniq"
+# Attributes used to only fetch objects changed since the last sync
+LDAP_USN_HIGHEST = "highestCommittedUSN"
+LDAP_USN_CHANGED = "uSNChanged"
+LDAP_MODIFY_TIMESTAMP = "modifyTimestamp"
 
 
 def flatten(value: Any) -> Any:
@@ -38,16 +48,30 @@ class BaseLDAPSynchronizer:
 
     _source: LDAPSource
     _logger: BoundLogger
-    _connection: Connection
     _messages: list[str]
     mapper: PropertyMappingManager
 
+    # High-water mark of a previous sync; when set, only objects changed since are fetched
+    changed_since: dict[str, Any] | None
+    # High-water mark of the current sync, set while paginating
+    high_water_mark: dict[str, Any] | None
+    # Paged results cookie to fetch the page after the last one returned, None once all
+    # pages have been returned
+    cookie: bytes | None
+
     def __init__(self, source: LDAPSource):
         self._source = source
-        self._connection = source.connection()
         self._messages = []
+        self.changed_since = None
+        self.high_water_mark = None
+        self.cookie = None
         self._logger = get_logger().bind(source=source, syncer=self.__class__.__name__)
 
+    @cached_property
+    def _connection(self) -> Connection:
+        """LDAP Connection, only opened once it's used"""
+        return self._source.connection()
+
     @staticmethod
     def name() -> str:
         """UI name for the type of object this class synchronizes"""
@@ -97,6 +121,22 @@ class BaseLDAPSynchronizer:
         """Get objects from LDAP, implemented in subclass"""
         raise NotImplementedError()
 
+    def get_search_attributes(self, *required: str) -> list[str]:
+        """Get the attributes to fetch for objects, based on the property mappings
+        used by this synchronizer, the attributes `required` for syncing and
+        the additional attributes configured in the source"""
+        attributes = get_search_attributes(
+            self.mapper.query_set,
+            [self._source.object_uniqueness_field, *required],
+            self._source.additional_attributes,
+        )
+        schema = self._connection.server.schema
+        if not schema or attributes == ALL_LDAP_ATTRIBUTES:
+            return attributes
+        # Requesting attributes which are not in the server's schema fails, so only
+        # request attributes the server knows (for example vendor-specific attributes)
+        return [attr for attr in attributes if attr in schema.attribute_types]
+
     def search_paginator(  # noqa: PLR0913
         self,
         search_base,
@@ -111,11 +151,26 @@ class BaseLDAPSynchronizer:
         controls=None,
         paged_size=None,
         paged_criticality=False,
+        cookie=None,
     ):
-        """Search in pages, returns each page"""
-        cookie = True
+        """Search in pages, returns each page. With `cookie`, a search which has been
+        interrupted is continued after the page the cookie was returned with. A high-water
+        mark which is already set (from the interrupted search) is kept"""
+        cookie = cookie or True
         if not paged_size:
             paged_size = CONFIG.get_int("ldap.page_size", 50)
+        usn, server = self._get_highest_usn()
+        if usn is not None:
+            if self.high_water_mark is None:
+                self.high_water_mark = {"usn": usn, "server": server}
+        else:
+            if self.high_water_mark is None:
+                self.high_water_mark = (
+                    self.changed_since if "timestamp" in (self.changed_since or {}) else None
+                )
+            if isinstance(attributes, list) and ALL_OPERATIONAL_ATTRIBUTES not in attributes:
+                attributes = attributes + [LDAP_MODIFY_TIMESTAMP]
+        search_filter = self._changed_since_filter(search_filter, server)
         while cookie:
             self._connection.search(
                 search_base,
@@ -138,8 +193,50 @@ class BaseLDAPSynchronizer:
                 ]
             except KeyError:
                 cookie = None
+            self.cookie = cookie or None
+            if usn is None:
+                self._update_timestamp_mark(self._connection.response)
             yield self._connection.response
 
+    def _get_highest_usn(self) -> tuple[int | None, str | None]:
+        """Get the highest committed USN and the name of the server it applies to,
+        from the root DSE of Active Directory servers"""
+        info = self._connection.server.info
+        if not info:
+            return None, None
+        usn = flatten(info.other.get(LDAP_USN_HIGHEST))
+        if usn is None:
+            return None, None
+        return int(usn), str(flatten(info.other.get("dsServiceName")))
+
+    def _changed_since_filter(self, search_filter: str, server: str | None) -> str:
+        """Restrict `search_filter` to objects changed since the previous sync"""
+        if not self.changed_since:
+            return search_filter
+        # USNs are local to each domain controller, so they can only be compared
+        # when we're connected to the same server as last time
+        if "usn" in self.changed_since and self.changed_since.get("server") == server:
+            usn = int(self.changed_since["usn"]) + 1
+            return f"(&{search_filter}({LDAP_USN_CHANGED}>={usn}))"
+        if "timestamp" in self.changed_since and not server:
+            timestamp = self.changed_since["timestamp"]
+            return f"(&{search_filter}({LDAP_MODIFY_TIMESTAMP}>={timestamp}))"
+        return search_filter
+
+    def _update_timestamp_mark(self, response: list):
+        """Keep track of the latest modification timestamp seen"""
+        timestamps = []
+        for entry in response:
+            timestamp = flatten(entry.get("attributes", {}).get(LDAP_MODIFY_TIMESTAMP))
+            if isinstance(timestamp, datetime):
+                timestamp = timestamp.astimezone(UTC).strftime("%Y%m%d%H%M%SZ")
+            if timestamp:
+                timestamps.append(str(timestamp))
+        if self.high_water_mark:
+            timestamps.append(self.high_water_mark["timestamp"])
+        if timestamps:
+            self.high_water_mark = {"timestamp": max(timestamps)}
+
     def build_user_properties(self, user_dn: str, **kwargs) -> dict[str, Any]:
         """Build attributes for User object based on property mappings."""
         props = self._build_object_properties(user_dn, **kwargs)
@@ -209,3 +306,86 @@ class BaseLDAPSynchronizer:
         instance.attributes = final_attributes
         instance.save()
         return (instance, False)
+
+    def prepare_objects(
+        self,
+        obj: type[Model],
+        objects: dict[Any, dict[str, Any]],
+    ) -> tuple[dict[Any, tuple[Model, bool]], dict[Any, Exception]]:
+        """Bulk version of `update_or_create_attributes`, without saving anything yet. Looks up
+        all existing objects for the uniqueness values in the keys of `objects` with a single
+        query, and applies the data to them (merging attributes), or creates new instances.
+        Returns a dict of uniqueness value to instance and if it's new, and a dict of
+        uniqueness value to error for objects that could not be prepared"""
+        prepared = {}
+        errors = {}
+        try:
+            existing_objects = obj.objects.filter(
+                **{f"attributes__{LDAP_UNIQUENESS}__in": list(objects.keys())}
+            ).order_by("pk")
+            existing = {}
+            for instance in existing_objects:
+                existing.setdefault(instance.attributes.get(LDAP_UNIQUENESS), instance)
+        except FieldError as exc:
+            return prepared, {uniq: exc for uniq in objects.keys()}
+        for uniq, data in objects.items():
+            instance = existing.get(uniq)
+            if not instance:
+                try:
+                    prepared[uniq] = (obj(**data), True)
+                except (TypeError, AttributeError, ValueError) as exc:
+                    errors[uniq] = exc
+                continue
+            for key, value in data.items():
+                if key == "attributes":
+                    continue
+                setattr(instance, key, value)
+            final_attributes = {}
+            MERGE_LIST_UNIQUE.merge(final_attributes, instance.attributes)
+            MERGE_LIST_UNIQUE.merge(final_attributes, data.get("attributes", {}))
+            instance.attributes = final_attributes
+            prepared[uniq] = (instance, False)
+        return prepared, errors
+
+    def write_objects(
+        self,
+        obj: type[Model],
+        prepared: dict[Any, tuple[Model, bool]],
+        fields: set[str],
+    ) -> dict[Any, Exception]:
+        """Write objects prepared by `prepare_objects` with `bulk_create` and `bulk_update`.
+        As those don't send `post_save`, it's sent for every object written, as it would be when
+        saving them individually. When the bulk write fails, objects are saved one by one (which
+        sends `post_save` itself) to find out which objects failed. Returns a dict of uniqueness
+        value to error for objects that failed"""
+        concrete_fields = {field.name for field in obj._meta.concrete_fields}
+        update_fields = list((fields | {"attributes"}) & concrete_fields - {obj._meta.pk.name})
+        to_create = [instance for instance, created in prepared.values() if created]
+        to_update = [instance for instance, created in prepared.values() if not created]
+        errors = {}
+        try:
+            with transaction.atomic():
+                obj.objects.bulk_create(to_create)
+                obj.objects.bulk_update(to_update, update_fields)
+        except DatabaseError:
+            for uniq, (instance, created) in list(prepared.items()):
+                try:
+                    with transaction.atomic():
+                        if created:
+                            instance.save(force_insert=True)
+                        else:
+                            instance.save(update_fields=update_fields)
+                except DatabaseError as exc:
+                    errors[uniq] = exc
+                    del prepared[uniq]
+            return errors
+        for instance, created in prepared.values():
+            post_save.send(
+                sender=obj,
+                instance=instance,
+                created=created,
+                raw=False,
+                using=instance._state.db,
+                update_fields=None,
+            )
+        return errors
@@ -4,7 +4,7 @@ from collections.abc import Generator
 
 from django.core.exceptions import FieldError
 from django.db.utils import IntegrityError
-from ldap3 import ALL_ATTRIBUTES, ALL_OPERATIONAL_ATTRIBUTES, SUBTREE
+from ldap3 import SUBTREE
 
 from authentik.core.expression.exceptions import SkipObjectException
 from authentik.core.models import Group
@@ -37,7 +37,7 @@ class GroupLDAPSynchronizer(BaseLDAPSynchronizer):
             search_base=self.base_dn_groups,
             search_filter=self._source.group_object_filter,
             search_scope=SUBTREE,
-            attributes=[ALL_ATTRIBUTES, ALL_OPERATIONAL_ATTRIBUTES],
+            attributes=self.get_search_attributes(),
             **kwargs,
         )
 
@@ -46,7 +46,10 @@ class GroupLDAPSynchronizer(BaseLDAPSynchronizer):
         if not self._source.sync_groups:
             self.message("Group syncing is disabled for this Source")
             return -1
-        group_count = 0
+        # Evaluate all property mappings for the page first, then look up existing groups
+        # with a single query and write all groups in bulk
+        objects = {}
+        group_dns = {}
         for group in page_data:
             if "attributes" not in group:
                 continue
@@ -68,28 +71,33 @@ class GroupLDAPSynchronizer(BaseLDAPSynchronizer):
                 # Special check for `users` field, as this is an M2M relation, and cannot be sync'd
                 if "users" in defaults:
                     del defaults["users"]
-                ak_group, created = self.update_or_create_attributes(
-                    Group,
-                    {
-                        f"attributes__{LDAP_UNIQUENESS}": uniq,
-                    },
-                    defaults,
-                )
                 self._logger.debug("Created group with attributes", **defaults)
             except SkipObjectException:
                 continue
             except (IntegrityError, FieldError, TypeError, AttributeError) as exc:
-                Event.new(
-                    EventAction.CONFIGURATION_ERROR,
-                    message=(
-                        f"Failed to create group: {str(exc)} "
-                        "To merge new group with existing group, set the groups's "
-                        f"Attribute '{LDAP_UNIQUENESS}' to '{uniq}'"
-                    ),
-                    source=self._source,
-                    dn=group_dn,
-                ).save()
-            else:
-                self._logger.debug("Synced group", group=ak_group.name, created=created)
-                group_count += 1
-        return group_count
+                self._sync_error(exc, uniq, group_dn)
+                continue
+            objects[uniq] = defaults
+            group_dns[uniq] = group_dn
+        prepared, errors = self.prepare_objects(Group, objects)
+        fields = set()
+        for defaults in objects.values():
+            fields.update(defaults.keys())
+        errors.update(self.write_objects(Group, prepared, fields))
+        for uniq, exc in errors.items():
+            self._sync_error(exc, uniq, group_dns[uniq])
+        for ak_group, created in prepared.values():
+            self._logger.debug("Synced group", group=ak_group.name, created=created)
+        return len(prepared)
+
+    def _sync_error(self, exc: Exception, uniq: str, group_dn: str):
+        Event.new(
+            EventAction.CONFIGURATION_ERROR,
+            message=(
+                f"Failed to create group: {str(exc)} "
+                "To merge new group with existing group, set the groups's "
+                f"Attribute '{LDAP_UNIQUENESS}' to '{uniq}'"
+            ),
+            source=self._source,
+            dn=group_dn,
+        ).save()
@@ -1,9 +1,11 @@
 """Sync LDAP Users and groups into authentik"""
 
-from collections.abc import Generator
+from collections.abc import Generator, Iterable
 from typing import Any
 
-from django.db.models import Q
+from django.db import transaction
+from django.db.models import BooleanField, ExpressionWrapper, Q
+from django.db.models.signals import m2m_changed
 from ldap3 import SUBTREE
 
 from authentik.core.models import Group, User
@@ -46,7 +48,12 @@ class MembershipLDAPSynchronizer(BaseLDAPSynchronizer):
         if not self._source.sync_groups:
             self.message("Group syncing is disabled for this Source")
             return -1
-        membership_count = 0
+        membership_mapping_attribute = LDAP_DISTINGUISHED_NAME
+        if self._source.group_membership_field == "memberUid":
+            # If memberships are based on the posixGroup's 'memberUid'
+            # attribute we use the RDN instead of the FDN to lookup members.
+            membership_mapping_attribute = LDAP_UNIQUENESS
+        group_members: dict[Group, set[str]] = {}
         for group in page_data:
             if "attributes" not in group:
                 continue
@@ -54,28 +61,91 @@ class MembershipLDAPSynchronizer(BaseLDAPSynchronizer):
             ak_group = self.get_group(group)
             if not ak_group:
                 continue
+            if isinstance(members, str):
+                members = [members]
+            group_members.setdefault(ak_group, set()).update(members)
+        if not group_members:
+            return 0
+        user_pks = self.get_user_pks(
+            membership_mapping_attribute,
+            set().union(*group_members.values()),
+        )
+        current, managed = self.get_current_members(
+            membership_mapping_attribute, group_members.keys()
+        )
+        membership_count = 0
+        through = User.ak_groups.through
+        for ak_group, members in group_members.items():
+            desired = set()
+            for member in members:
+                desired.update(user_pks.get(member, ()))
+            # Users without the mapping attribute were not added by this source,
+            # hence they're kept in the group
+            group_current = current.get(ak_group.pk, set())
+            to_add = desired - group_current
+            to_remove = managed.get(ak_group.pk, set()) - desired
+            membership_count += 1
+            membership_count += len((group_current - to_remove) | to_add)
+            with transaction.atomic():
+                if to_remove:
+                    through.objects.filter(group=ak_group, user_id__in=to_remove).delete()
+                if to_add:
+                    through.objects.bulk_create(
+                        [through(group=ak_group, user_id=user_pk) for user_pk in to_add],
+                        ignore_conflicts=True,
+                    )
+            self.notify_members_changed(ak_group, "post_remove", to_remove)
+            self.notify_members_changed(ak_group, "post_add", to_add)
+        self._logger.debug("Successfully updated group membership")
+        return membership_count
 
-            membership_mapping_attribute = LDAP_DISTINGUISHED_NAME
-            if self._source.group_membership_field == "memberUid":
-                # If memberships are based on the posixGroup's 'memberUid'
-                # attribute we use the RDN instead of the FDN to lookup members.
-                membership_mapping_attribute = LDAP_UNIQUENESS
+    def get_user_pks(self, attribute: str, members: set[str]) -> dict[str, set[int]]:
+        """Resolve all member values of a page to user primary keys with a single query"""
+        user_pks: dict[str, set[int]] = {}
+        if not members:
+            return user_pks
+        for user_pk, value in User.objects.filter(
+            **{f"attributes__{attribute}__in": list(members)}
+        ).values_list("pk", f"attributes__{attribute}"):
+            user_pks.setdefault(value, set()).add(user_pk)
+        return user_pks
 
-            users = User.objects.filter(
-                Q(**{f"attributes__{membership_mapping_attribute}__in": members})
-                | Q(
-                    **{
-                        f"attributes__{membership_mapping_attribute}__isnull": True,
-                        "ak_groups__in": [ak_group],
-                    }
+    def get_current_members(
+        self, attribute: str, groups: Iterable[Group]
+    ) -> tuple[dict[Any, set[int]], dict[Any, set[int]]]:
+        """Get the current members of all groups, and which of those have the mapping attribute
+        (and as such are managed by this source)"""
+        current: dict[Any, set[int]] = {}
+        managed: dict[Any, set[int]] = {}
+        for group_pk, user_pk, has_attribute in (
+            User.ak_groups.through.objects.filter(group__in=list(groups))
+            .annotate(
+                has_attribute=ExpressionWrapper(
+                    Q(**{f"user__attributes__{attribute}__isnull": False}),
+                    output_field=BooleanField(),
                 )
             )
-            membership_count += 1
-            membership_count += users.count()
-            ak_group.users.set(users)
-            ak_group.save()
-        self._logger.debug("Successfully updated group membership")
-        return membership_count
+            .values_list("group_id", "user_id", "has_attribute")
+        ):
+            current.setdefault(group_pk, set()).add(user_pk)
+            if has_attribute:
+                managed.setdefault(group_pk, set()).add(user_pk)
+        return current, managed
+
+    def notify_members_changed(self, group: Group, action: str, user_pks: set[int]):
+        """Send a single m2m_changed signal for all users added to or removed from `group`,
+        as if they were changed with `group.users.add()` or `group.users.remove()`"""
+        if not user_pks:
+            return
+        m2m_changed.send(
+            sender=User.ak_groups.through,
+            instance=group,
+            action=action,
+            reverse=True,
+            model=User,
+            pk_set=user_pks,
+            using=group._state.db,
+        )
 
     def get_group(self, group_dict: dict[str, Any]) -> Group | None:
         """Check if we fetched the group already, and if not cache it for later"""
@@ -2,14 +2,16 @@
 
 from collections.abc import Generator
 
+from django.core.cache import cache
 from django.core.exceptions import FieldError
 from django.db.utils import IntegrityError
-from ldap3 import ALL_ATTRIBUTES, ALL_OPERATIONAL_ATTRIBUTES, SUBTREE
+from ldap3 import SUBTREE
 
 from authentik.core.expression.exceptions import SkipObjectException
 from authentik.core.models import User
 from authentik.events.models import Event, EventAction
 from authentik.lib.sync.mapper import PropertyMappingManager
+from authentik.sources.ldap.auth import CACHE_TIMEOUT_USER_SOURCE, user_source_cache_key
 from authentik.sources.ldap.models import LDAPPropertyMapping, LDAPSource
 from authentik.sources.ldap.sync.base import LDAP_UNIQUENESS, BaseLDAPSynchronizer, flatten
 from authentik.sources.ldap.sync.vendor.freeipa import FreeIPA
@@ -26,6 +28,8 @@ class UserLDAPSynchronizer(BaseLDAPSynchronizer):
             LDAPPropertyMapping,
             ["ldap", "dn", "source"],
         )
+        self._ms_ad = MicrosoftActiveDirectory(self._source)
+        self._freeipa = FreeIPA(self._source)
 
     @staticmethod
     def name() -> str:
@@ -39,7 +43,9 @@ class UserLDAPSynchronizer(BaseLDAPSynchronizer):
             search_base=self.base_dn_users,
             search_filter=self._source.user_object_filter,
             search_scope=SUBTREE,
-            attributes=[ALL_ATTRIBUTES, ALL_OPERATIONAL_ATTRIBUTES],
+            attributes=self.get_search_attributes(
+                *MicrosoftActiveDirectory.attributes, *FreeIPA.attributes
+            ),
             **kwargs,
         )
 
@@ -48,7 +54,10 @@ class UserLDAPSynchronizer(BaseLDAPSynchronizer):
         if not self._source.sync_users:
             self.message("User syncing is disabled for this Source")
             return -1
-        user_count = 0
+        # Evaluate all property mappings for the page first, then look up existing users
+        # with a single query and write all users in bulk
+        objects = {}
+        entries = {}
         for user in page_data:
             if "attributes" not in user:
                 continue
@@ -67,25 +76,44 @@ class UserLDAPSynchronizer(BaseLDAPSynchronizer):
                 self._logger.debug("Writing user with attributes", **defaults)
                 if "username" not in defaults:
                     raise IntegrityError("Username was not set by propertymappings")
-                ak_user, created = self.update_or_create_attributes(
-                    User, {f"attributes__{LDAP_UNIQUENESS}": uniq}, defaults
-                )
             except SkipObjectException:
                 continue
             except (IntegrityError, FieldError, TypeError, AttributeError) as exc:
-                Event.new(
-                    EventAction.CONFIGURATION_ERROR,
-                    message=(
-                        f"Failed to create user: {str(exc)} "
-                        "To merge new user with existing user, set the user's "
-                        f"Attribute '{LDAP_UNIQUENESS}' to '{uniq}'"
-                    ),
-                    source=self._source,
-                    dn=user_dn,
-                ).save()
-            else:
-                self._logger.debug("Synced User", user=ak_user.username, created=created)
-                user_count += 1
-                MicrosoftActiveDirectory(self._source).sync(attributes, ak_user, created)
-                FreeIPA(self._source).sync(attributes, ak_user, created)
-        return user_count
+                self._sync_error(exc, uniq, user_dn)
+                continue
+            objects[uniq] = defaults
+            entries[uniq] = (user_dn, attributes)
+        prepared, errors = self.prepare_objects(User, objects)
+        for uniq, (ak_user, created) in prepared.items():
+            _, attributes = entries[uniq]
+            self._ms_ad.sync(attributes, ak_user, created)
+            self._freeipa.sync(attributes, ak_user, created)
+        fields = {"password", "is_active"}
+        for defaults in objects.values():
+            fields.update(defaults.keys())
+        errors.update(self.write_objects(User, prepared, fields))
+        for uniq, exc in errors.items():
+            self._sync_error(exc, uniq, entries[uniq][0])
+        for ak_user, created in prepared.values():
+            self._logger.debug("Synced User", user=ak_user.username, created=created)
+        # Remember which source users belong to, so logins only bind against this source
+        cache.set_many(
+            {
+                user_source_cache_key(ak_user.pk): self._source.pk
+                for ak_user, _ in prepared.values()
+            },
+            timeout=CACHE_TIMEOUT_USER_SOURCE,
+        )
+        return len(prepared)
+
+    def _sync_error(self, exc: Exception, uniq: str, user_dn: str):
+        Event.new(
+            EventAction.CONFIGURATION_ERROR,
+            message=(
+                f"Failed to create user: {str(exc)} "
+                "To merge new user with existing user, set the user's "
+                f"Attribute '{LDAP_UNIQUENESS}' to '{uniq}'"
+            ),
+            source=self._source,
+            dn=user_dn,
+        ).save()
@@ -1,14 +1,20 @@
 """LDAP Sync tasks"""
 
+from base64 import b64decode, b64encode
+from collections.abc import Iterator
+from datetime import datetime, timedelta
+from itertools import chain, islice
+from time import time
+from typing import Any
 from uuid import uuid4
 
-from celery import chain, group
 from django.core.cache import cache
+from django.utils.timezone import now
 from ldap3.core.exceptions import LDAPException
 from structlog.stdlib import get_logger
 
+from authentik.events.models import Event, EventAction, TaskStatus
 from authentik.events.models import SystemTask as DBSystemTask
-from authentik.events.models import TaskStatus
 from authentik.events.system_tasks import SystemTask
 from authentik.lib.config import CONFIG
 from authentik.lib.sync.outgoing.exceptions import StopSync
@@ -29,13 +35,16 @@ SYNC_CLASSES = [
 ]
 CACHE_KEY_PREFIX = "goauthentik.io/sources/ldap/page/"
 CACHE_KEY_STATUS = "goauthentik.io/sources/ldap/status/"
+LAST_FULL_SYNC = "last_full_sync"
+# Interval in seconds in which `ldap_sync_wait` checks if all pages of a phase have been synced
+WAIT_INTERVAL = 10
 
 
 @CELERY_APP.task()
 def ldap_sync_all():
     """Sync all sources"""
     for source in LDAPSource.objects.filter(enabled=True):
-        ldap_sync_single.apply_async(args=[str(source.pk)])
+        ldap_sync_single.apply_async(args=[str(source.pk)], kwargs={"full": False})
 
 
 @CELERY_APP.task()
@@ -58,8 +67,10 @@ def ldap_connectivity_check(pk: str | None = None):
     soft_time_limit=(60 * 60 * CONFIG.get_int("ldap.task_timeout_hours")) * 2.5,
     task_time_limit=(60 * 60 * CONFIG.get_int("ldap.task_timeout_hours")) * 2.5,
 )
-def ldap_sync_single(source_pk: str):
-    """Sync a single source"""
+def ldap_sync_single(source_pk: str, full: bool = True):
+    """Sync a single source. When incremental sync is enabled for the source and `full`
+    is not set, only objects changed since the last sync are synced, unless the last
+    full sync is older than `ldap.full_sync_interval_hours`"""
     source: LDAPSource = LDAPSource.objects.filter(pk=source_pk).first()
     if not source:
         return
@@ -69,30 +80,202 @@ def ldap_sync_single(source_pk: str):
             return
         # Delete all sync tasks from the cache
         DBSystemTask.objects.filter(name="ldap_sync", uid__startswith=source.slug).delete()
-        task = chain(
+        incremental = source.incremental_sync and not full and not ldap_full_sync_due(source)
+        ldap_sync_stream(
+            source,
             # User and group sync can happen at once, they have no dependencies on each other
-            group(
-                ldap_sync_paginator(source, UserLDAPSynchronizer)
-                + ldap_sync_paginator(source, GroupLDAPSynchronizer),
-            ),
+            [UserLDAPSynchronizer, GroupLDAPSynchronizer],
             # Membership sync needs to run afterwards
-            group(
-                ldap_sync_paginator(source, MembershipLDAPSynchronizer),
-            ),
+            [MembershipLDAPSynchronizer],
+            incremental=incremental,
         )
-        task()
 
 
-def ldap_sync_paginator(source: LDAPSource, sync: type[BaseLDAPSynchronizer]) -> list:
-    """Return a list of task signatures with LDAP pagination data"""
-    sync_inst: BaseLDAPSynchronizer = sync(source)
-    signatures = []
-    for page in sync_inst.get_objects():
-        page_cache_key = CACHE_KEY_PREFIX + str(uuid4())
-        cache.set(page_cache_key, page, 60 * 60 * CONFIG.get_int("ldap.task_timeout_hours"))
-        page_sync = ldap_sync.si(str(source.pk), class_to_path(sync), page_cache_key)
-        signatures.append(page_sync)
-    return signatures
+def ldap_full_sync_due(source: LDAPSource) -> bool:
+    """Check if the last full sync of `source` is older than the full sync interval"""
+    last_full_sync = source.incremental_sync_state.get(LAST_FULL_SYNC)
+    if not last_full_sync:
+        return True
+    interval = timedelta(hours=CONFIG.get_int("ldap.full_sync_interval_hours", 24))
+    return datetime.fromisoformat(last_full_sync) + interval < now()
+
+
+def ldap_sync_stream(
+    source: LDAPSource,
+    *phases: list[type[BaseLDAPSynchronizer]],
+    inline: bool = False,
+    incremental: bool = False,
+) -> bool:
+    """Sync all pages of the synchronizers of all `phases`, which are synced one after
+    the other. Pages are dispatched to sync tasks as soon as they've been fetched, so syncing
+    starts while the search continues. Once `ldap.max_pending_pages` pages are being synced,
+    fetching is stopped, and `ldap_sync_wait` continues the search from its paged results
+    cookie once pages have been synced. Nothing waits for the sync tasks in the current
+    process. With `inline`, pages are synced in the current process instead.
+
+    With `incremental`, only objects changed since the last sync are fetched. When incremental
+    sync is enabled for the source, the new high-water marks are saved once all pages
+    have been synced successfully. Returns if the first pages could be fetched."""
+    state = {
+        "phases": [[class_to_path(sync) for sync in phase] for phase in phases],
+        "searches": {},
+        "pending": [],
+        "marks": {},
+        "incremental": incremental,
+        "successful": True,
+    }
+    try:
+        ldap_sync_fetch(source, state, inline=inline)
+    except LDAPException as exc:
+        # Pages which have already been dispatched are still synced, later phases are skipped
+        # and the high-water marks are not updated
+        ldap_sync_search_failed(source, exc)
+        return False
+    if inline:
+        while not ldap_sync_step(source, state, inline=True):
+            pass
+        return True
+    ldap_sync_wait.apply_async((str(source.pk), state))
+    return True
+
+
+def ldap_sync_search_failed(source: LDAPSource, exc: LDAPException):
+    """Report an error while searching `source`"""
+    LOGGER.warning("Failed to search LDAP source", source=source.slug, exc=exc)
+    Event.new(
+        EventAction.SYSTEM_TASK_EXCEPTION,
+        message=f"Failed to search LDAP source {source.slug}: {exception_to_string(exc)}",
+    ).save()
+
+
+def ldap_sync_fetch(source: LDAPSource, state: dict[str, Any], inline: bool = False):
+    """Continue the searches of the current phase in `state`, and dispatch the fetched pages
+    until `ldap.max_pending_pages` pages are pending"""
+    if not state["phases"]:
+        return
+    limit = max(CONFIG.get_int("ldap.max_pending_pages", 10), 1)
+    for sync_class in state["phases"][0]:
+        search = state["searches"].setdefault(
+            sync_class, {"cookie": None, "pages": 0, "mark": None, "done": False}
+        )
+        if search["done"]:
+            continue
+        if len(state["pending"]) >= limit:
+            return
+        sync: type[BaseLDAPSynchronizer] = path_to_class(sync_class)
+        sync_inst = sync(source)
+        if state["incremental"]:
+            sync_inst.changed_since = source.incremental_sync_state.get(sync.name())
+        sync_inst.high_water_mark = search["mark"]
+        for page in ldap_search_pages(sync_inst, search):
+            page_cache_key = CACHE_KEY_PREFIX + str(uuid4())
+            cache.set(page_cache_key, page, 60 * 60 * CONFIG.get_int("ldap.task_timeout_hours"))
+            state["pending"].append(
+                (ldap_sync_dispatch(source, sync_class, page_cache_key, inline=inline), time())
+            )
+            search["pages"] += 1
+            if len(state["pending"]) >= limit:
+                break
+        search["cookie"] = b64encode(sync_inst.cookie).decode() if sync_inst.cookie else None
+        search["mark"] = sync_inst.high_water_mark
+        search["done"] = not sync_inst.cookie
+        if search["done"] and sync_inst.high_water_mark:
+            state["marks"][sync.name()] = sync_inst.high_water_mark
+
+
+def ldap_search_pages(sync_inst: BaseLDAPSynchronizer, search: dict[str, Any]) -> Iterator[list]:
+    """Get the pages of `sync_inst`, continuing after the pages fetched so far"""
+    if not search["cookie"]:
+        return sync_inst.get_objects()
+    pages = sync_inst.get_objects(cookie=b64decode(search["cookie"]))
+    try:
+        first = next(pages)
+    except LDAPException as exc:
+        # Some servers only accept paged results cookies on the connection they were returned
+        # on, in which case the search is started again, skipping the pages already fetched
+        LOGGER.debug("Failed to continue search, starting again", exc=exc)
+        return islice(sync_inst.get_objects(), search["pages"], None)
+    except StopIteration:
+        return iter(())
+    return chain([first], pages)
+
+
+def ldap_sync_step(source: LDAPSource, state: dict[str, Any], inline: bool = False) -> bool:
+    """Check which pending pages of `state` have been synced, continue fetching pages, and
+    move on to the next phase once all pages of the current phase have been synced. Returns
+    if all phases are done"""
+    pending = dict(state["pending"])
+    tasks = DBSystemTask.objects.filter(name="ldap_sync", uid__in=pending.keys())
+    for uid, status in tasks.values_list("uid", "status"):
+        state["successful"] &= status == TaskStatus.SUCCESSFUL
+        del pending[uid]
+    # Page tasks which haven't recorded their status after their time limit have died
+    # (e.g. with their worker), so they're treated as failed. Pages synced inline have
+    # already finished
+    timeout = time() - (0 if inline else 60 * 60 * CONFIG.get_int("ldap.task_timeout_hours"))
+    for uid, dispatched in list(pending.items()):
+        if dispatched <= timeout:
+            LOGGER.warning("LDAP sync page timed out", source=source.slug, uid=uid)
+            state["successful"] = False
+            del pending[uid]
+    state["pending"] = list(pending.items())
+    while state["phases"]:
+        try:
+            ldap_sync_fetch(source, state, inline=inline)
+        except LDAPException as exc:
+            ldap_sync_search_failed(source, exc)
+            state["phases"] = []
+            state["successful"] = False
+            break
+        if state["pending"]:
+            return False
+        if not all(search["done"] for search in state["searches"].values()):
+            continue
+        state["phases"] = state["phases"][1:]
+        state["searches"] = {}
+    if state["pending"]:
+        return False
+    if source.incremental_sync and state["successful"]:
+        if not state["incremental"]:
+            state["marks"][LAST_FULL_SYNC] = now().isoformat()
+        ldap_update_sync_state(source, state["marks"])
+    return True
+
+
+def ldap_sync_dispatch(
+    source: LDAPSource, sync_class: str, page_cache_key: str, inline: bool = False
+) -> str:
+    """Dispatch a task to sync the page `page_cache_key`, and return its task UID"""
+    dispatch = ldap_sync.apply if inline else ldap_sync.apply_async
+    dispatch((str(source.pk), sync_class, page_cache_key))
+    return ldap_sync_uid(source, path_to_class(sync_class), page_cache_key)
+
+
+def ldap_sync_uid(source: LDAPSource, sync: type[BaseLDAPSynchronizer], page_cache_key: str) -> str:
+    """UID of the task syncing the page `page_cache_key`"""
+    return f"{source.slug}:{sync.name()}:{page_cache_key.replace(CACHE_KEY_PREFIX, '')}"
+
+
+@CELERY_APP.task(bind=True, max_retries=None)
+def ldap_sync_wait(self, source_pk: str, state: dict[str, Any]):
+    """Continue the sync described by `state` (see `ldap_sync_stream`) without blocking
+    a worker. While pages are being synced, this task is retried every `WAIT_INTERVAL`
+    seconds to fetch further pages once pages have been synced, and to move on to the next
+    phase once all pages of a phase have been synced"""
+    source: LDAPSource = LDAPSource.objects.filter(pk=source_pk).first()
+    if not source:
+        return
+    if not ldap_sync_step(source, state):
+        raise self.retry(args=(source_pk, state), countdown=WAIT_INTERVAL)
+
+
+def ldap_update_sync_state(source: LDAPSource, updates: dict[str, Any]):
+    """Update the incremental sync state of `source`"""
+    source.incremental_sync_state = {**source.incremental_sync_state, **updates}
+    # Update the state without saving the source, as that would trigger another sync
+    LDAPSource.objects.filter(pk=source.pk).update(
+        incremental_sync_state=source.incremental_sync_state
+    )
 
 
 @CELERY_APP.task(
@@ -110,8 +293,7 @@ def ldap_sync(self: SystemTask, source_pk: str, sync_class: str, page_cache_key:
         # to set the state with
         return
     sync: type[BaseLDAPSynchronizer] = path_to_class(sync_class)
-    uid = page_cache_key.replace(CACHE_KEY_PREFIX, "")
-    self.set_uid(f"{source.slug}:{sync.name()}:{uid}")
+    self.set_uid(ldap_sync_uid(source, sync, page_cache_key))
     try:
         sync_inst: BaseLDAPSynchronizer = sync(source)
         page = cache.get(page_cache_key)
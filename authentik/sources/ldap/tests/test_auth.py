@@ -2,13 +2,14 @@
 
 from unittest.mock import MagicMock, Mock, patch
 
+from django.core.cache import cache
 from django.db.models import Q
 from django.test import TestCase
 
 from authentik.blueprints.tests import apply_blueprint
 from authentik.core.models import User
-from authentik.lib.generators import generate_key
-from authentik.sources.ldap.auth import LDAPBackend
+from authentik.lib.generators import generate_id, generate_key
+from authentik.sources.ldap.auth import LDAPBackend, user_source_cache_key
 from authentik.sources.ldap.models import LDAPPropertyMapping, LDAPSource
 from authentik.sources.ldap.sync.users import UserLDAPSynchronizer
 from authentik.sources.ldap.tests.mock_ad import mock_ad_connection
@@ -61,6 +62,84 @@ class LDAPSyncTests(TestCase):
             )
             bind_mock.assert_not_called()
 
+    def test_auth_pooled_connection(self):
+        """Test that binds re-use pooled connections, which are re-bound as the bind user
+        before they're returned to the pool"""
+        self.source.bind_cn = "cn=user1,ou=users,dc=goauthentik,dc=io"
+        self.source.bind_password = "test1111"  # noqa # nosec
+        self.source.save()
+        self.source.property_mappings.set(
+            LDAPPropertyMapping.objects.filter(
+                Q(managed__startswith="goauthentik.io/sources/ldap/default-")
+                | Q(managed__startswith="goauthentik.io/sources/ldap/ms-")
+            )
+        )
+        raw_conn = mock_ad_connection(LDAP_PASSWORD)
+        rebind_mock = Mock(wraps=raw_conn.rebind)
+        raw_conn.rebind = rebind_mock
+        connection = MagicMock(return_value=raw_conn)
+        with patch("authentik.sources.ldap.models.LDAPSource.connection", connection):
+            user_sync = UserLDAPSynchronizer(self.source)
+            user_sync.sync_full()
+            user = User.objects.get(username="user0_sn")
+            self.assertEqual(cache.get(user_source_cache_key(user.pk)), self.source.pk)
+
+            backend = LDAPBackend()
+            connection.reset_mock()
+            for _ in range(2):
+                self.assertEqual(
+                    backend.authenticate(None, username="user0_sn", password=LDAP_PASSWORD),
+                    user,
+                )
+            # Only the first bind opens a connection, the second one re-binds it
+            connection.assert_called_once()
+            self.assertEqual(rebind_mock.call_count, 3)
+            self.assertEqual(raw_conn.user, self.source.bind_cn)
+            self.assertEqual(raw_conn.password, self.source.bind_password)
+
+    def test_auth_known_source(self):
+        """Test that only the user's known source is bound against"""
+        other_source = LDAPSource.objects.create(
+            name=generate_id(),
+            slug=generate_id(),
+            base_dn="dc=goauthentik,dc=io",
+        )
+        user = User.objects.create(
+            username=generate_id(),
+            attributes={"distinguishedName": "cn=user0,ou=foo,ou=users,dc=goauthentik,dc=io"},
+        )
+        cache.set(user_source_cache_key(user.pk), other_source.pk)
+        auth_user_by_bind = Mock(return_value=None)
+        with patch("authentik.sources.ldap.auth.LDAPBackend.auth_user_by_bind", auth_user_by_bind):
+            self.assertIsNone(
+                LDAPBackend().authenticate(None, username=user.username, password=LDAP_PASSWORD)
+            )
+        self.assertEqual(
+            [call.args[0] for call in auth_user_by_bind.call_args_list],
+            [other_source],
+        )
+
+    def test_auth_source_fallback(self):
+        """Test that all sources are tried when the user's source is unknown"""
+        other_source = LDAPSource.objects.create(
+            name=generate_id(),
+            slug=generate_id(),
+            base_dn="dc=goauthentik,dc=io",
+        )
+        user = User.objects.create(
+            username=generate_id(),
+            attributes={"distinguishedName": "cn=user0,ou=foo,ou=users,dc=goauthentik,dc=io"},
+        )
+        auth_user_by_bind = Mock(side_effect=[None, user])
+        with patch("authentik.sources.ldap.auth.LDAPBackend.auth_user_by_bind", auth_user_by_bind):
+            self.assertEqual(
+                LDAPBackend().authenticate(None, username=user.username, password=LDAP_PASSWORD),
+                user,
+            )
+        sources = sorted([self.source, other_source], key=lambda source: source.pk)
+        self.assertEqual([call.args[0] for call in auth_user_by_bind.call_args_list], sources)
+        self.assertEqual(cache.get(user_source_cache_key(user.pk)), sources[1].pk)
+
     def test_auth_synced_user_ad(self):
         """Test Cached auth"""
         self.source.property_mappings.set(
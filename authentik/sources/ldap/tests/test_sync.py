@@ -1,23 +1,39 @@
 """LDAP Source tests"""
 
+from collections import Counter
 from unittest.mock import MagicMock, patch
 
+from django.core.cache import cache
 from django.db.models import Q
+from django.db.models.signals import m2m_changed, post_save
 from django.test import TestCase
+from ldap3 import ALL_ATTRIBUTES
+from ldap3.core.exceptions import LDAPException
 
 from authentik.blueprints.tests import apply_blueprint
 from authentik.core.models import Group, User
 from authentik.core.tests.utils import create_test_admin_user
 from authentik.events.models import Event, EventAction, SystemTask
 from authentik.events.system_tasks import TaskStatus
+from authentik.lib.config import CONFIG
 from authentik.lib.generators import generate_id, generate_key
 from authentik.lib.sync.outgoing.exceptions import StopSync
 from authentik.lib.utils.reflection import class_to_path
 from authentik.sources.ldap.models import LDAPPropertyMapping, LDAPSource
+from authentik.sources.ldap.sync.attributes import ALL_LDAP_ATTRIBUTES, get_mapping_attributes
 from authentik.sources.ldap.sync.groups import GroupLDAPSynchronizer
 from authentik.sources.ldap.sync.membership import MembershipLDAPSynchronizer
 from authentik.sources.ldap.sync.users import UserLDAPSynchronizer
-from authentik.sources.ldap.tasks import ldap_sync, ldap_sync_all
+from authentik.sources.ldap.tasks import (
+    CACHE_KEY_PREFIX,
+    LAST_FULL_SYNC,
+    ldap_full_sync_due,
+    ldap_sync,
+    ldap_sync_all,
+    ldap_sync_single,
+    ldap_sync_step,
+    ldap_sync_stream,
+)
 from authentik.sources.ldap.tests.mock_ad import mock_ad_connection
 from authentik.sources.ldap.tests.mock_freeipa import mock_freeipa_connection
 from authentik.sources.ldap.tests.mock_slapd import mock_slapd_connection
@@ -129,6 +145,64 @@ class LDAPSyncTests(TestCase):
             self.assertEqual(user.path, "goauthentik.io/sources/ldap/users/foo")
             self.assertFalse(User.objects.filter(username="user1_sn").exists())
 
+    def test_sync_users_bulk_conflict(self):
+        """Test user sync, with a single conflicting user in a page"""
+        self.source.property_mappings.set(
+            LDAPPropertyMapping.objects.filter(
+                Q(managed__startswith="goauthentik.io/sources/ldap/default")
+                | Q(managed__startswith="goauthentik.io/sources/ldap/ms")
+            )
+        )
+        connection = MagicMock(return_value=mock_ad_connection(LDAP_PASSWORD))
+        # Existing user with the same username, but not linked to the LDAP object
+        User.objects.create(username="user2_sn")
+
+        with patch("authentik.sources.ldap.models.LDAPSource.connection", connection):
+            user_sync = UserLDAPSynchronizer(self.source)
+            user_sync.sync_full()
+            self.assertTrue(
+                User.objects.filter(
+                    username="user0_sn", attributes__ldap_uniq__isnull=False
+                ).exists()
+            )
+            self.assertEqual(User.objects.filter(username="user2_sn").count(), 1)
+            self.assertTrue(
+                Event.objects.filter(
+                    action=EventAction.CONFIGURATION_ERROR,
+                    context__message__contains="unique-test2222",
+                ).exists()
+            )
+            # Syncing again updates the existing users instead of creating new ones
+            user_count = User.objects.count()
+            user_sync.sync_full()
+            self.assertEqual(User.objects.count(), user_count)
+
+    def test_sync_users_bulk_fallback_signals(self):
+        """Test that post_save is sent once per user when the bulk write falls back to saving
+        users one by one"""
+        self.source.property_mappings.set(
+            LDAPPropertyMapping.objects.filter(
+                Q(managed__startswith="goauthentik.io/sources/ldap/default")
+                | Q(managed__startswith="goauthentik.io/sources/ldap/ms")
+            )
+        )
+        connection = MagicMock(return_value=mock_ad_connection(LDAP_PASSWORD))
+        # Conflicting user, which makes the bulk write fail
+        User.objects.create(username="user2_sn")
+        saved = Counter()
+
+        def receiver(sender, instance: User, **_):
+            saved[instance.username] += 1
+
+        post_save.connect(receiver, sender=User, weak=False)
+        try:
+            with patch("authentik.sources.ldap.models.LDAPSource.connection", connection):
+                UserLDAPSynchronizer(self.source).sync_full()
+        finally:
+            post_save.disconnect(receiver, sender=User)
+        self.assertEqual(saved["user0_sn"], 1)
+        self.assertEqual(max(saved.values()), 1)
+
     def test_sync_users_openldap(self):
         """Test user sync"""
         self.source.object_uniqueness_field = "uid"
@@ -238,6 +312,48 @@ class LDAPSyncTests(TestCase):
             posix_group = Group.objects.filter(name="group-posix").first()
             self.assertTrue(posix_group.users.filter(name="user-posix").exists())
 
+    def test_sync_membership_diff(self):
+        """Test membership sync only changes memberships managed by the source"""
+        self.source.object_uniqueness_field = "cn"
+        self.source.group_membership_field = "memberUid"
+        self.source.user_object_filter = "(objectClass=posixAccount)"
+        self.source.group_object_filter = "(objectClass=posixGroup)"
+        self.source.property_mappings.set(
+            LDAPPropertyMapping.objects.filter(
+                Q(managed__startswith="goauthentik.io/sources/ldap/default")
+                | Q(managed__startswith="goauthentik.io/sources/ldap/openldap")
+            )
+        )
+        self.source.property_mappings_group.set(
+            LDAPPropertyMapping.objects.filter(managed="goauthentik.io/sources/ldap/openldap-cn")
+        )
+        connection = MagicMock(return_value=mock_slapd_connection(LDAP_PASSWORD))
+        with patch("authentik.sources.ldap.models.LDAPSource.connection", connection):
+            self.source.save()
+            UserLDAPSynchronizer(self.source).sync_full()
+            GroupLDAPSynchronizer(self.source).sync_full()
+            posix_group = Group.objects.filter(name="group-posix").first()
+            local_user = User.objects.create(username=generate_id())
+            stale_user = User.objects.create(
+                username=generate_id(), attributes={"ldap_uniq": generate_id()}
+            )
+            posix_group.users.add(local_user, stale_user)
+            m2m_signal = MagicMock()
+            m2m_changed.connect(m2m_signal, sender=User.ak_groups.through)
+            try:
+                MembershipLDAPSynchronizer(self.source).sync_full()
+            finally:
+                m2m_changed.disconnect(m2m_signal, sender=User.ak_groups.through)
+            self.assertTrue(posix_group.users.filter(name="user-posix").exists())
+            self.assertTrue(posix_group.users.filter(pk=local_user.pk).exists())
+            self.assertFalse(posix_group.users.filter(pk=stale_user.pk).exists())
+            actions = [
+                call.kwargs["action"]
+                for call in m2m_signal.call_args_list
+                if call.kwargs["instance"] == posix_group
+            ]
+            self.assertEqual(sorted(actions), ["post_add", "post_remove"])
+
     def test_tasks_ad(self):
         """Test Scheduled tasks"""
         self.source.property_mappings.set(
@@ -251,6 +367,212 @@ class LDAPSyncTests(TestCase):
         with patch("authentik.sources.ldap.models.LDAPSource.connection", connection):
             ldap_sync_all.delay().get()
 
+    def test_tasks_stream(self):
+        """Test streaming pages to sync tasks, with membership synced afterwards"""
+        self.source.property_mappings.set(
+            LDAPPropertyMapping.objects.filter(
+                Q(managed__startswith="goauthentik.io/sources/ldap/default")
+                | Q(managed__startswith="goauthentik.io/sources/ldap/ms")
+            )
+        )
+        self.source.property_mappings_group.set(
+            LDAPPropertyMapping.objects.filter(managed="goauthentik.io/sources/ldap/default-name")
+        )
+        self.source.save()
+        connection = MagicMock(return_value=mock_ad_connection(LDAP_PASSWORD))
+        with (
+            patch("authentik.sources.ldap.models.LDAPSource.connection", connection),
+            CONFIG.patch("ldap.page_size", 1),
+        ):
+            self.assertTrue(
+                ldap_sync_stream(
+                    self.source,
+                    [UserLDAPSynchronizer, GroupLDAPSynchronizer],
+                    [MembershipLDAPSynchronizer],
+                )
+            )
+        self.assertTrue(User.objects.filter(username="user0_sn").exists())
+        self.assertTrue(Group.objects.filter(name="test-group").exists())
+        self.assertEqual(cache.keys(f"{CACHE_KEY_PREFIX}*"), [])
+
+    def test_tasks_stream_search_error(self):
+        """Test that an error while searching is handled and skips later phases"""
+        self.source.property_mappings.set(
+            LDAPPropertyMapping.objects.filter(
+                Q(managed__startswith="goauthentik.io/sources/ldap/default")
+                | Q(managed__startswith="goauthentik.io/sources/ldap/ms")
+            )
+        )
+        self.source.save()
+        connection = MagicMock(return_value=mock_ad_connection(LDAP_PASSWORD))
+        with (
+            patch("authentik.sources.ldap.models.LDAPSource.connection", connection),
+            patch(
+                "authentik.sources.ldap.sync.groups.GroupLDAPSynchronizer.get_objects",
+                MagicMock(side_effect=LDAPException("search failed")),
+            ),
+            patch("authentik.sources.ldap.tasks.ldap_sync_wait.apply_async") as wait,
+        ):
+            self.assertFalse(
+                ldap_sync_stream(
+                    self.source,
+                    [UserLDAPSynchronizer, GroupLDAPSynchronizer],
+                    [MembershipLDAPSynchronizer],
+                )
+            )
+        wait.assert_not_called()
+        self.assertTrue(User.objects.filter(username="user0_sn").exists())
+
+    def test_tasks_stream_bounded(self):
+        """Test that fetching pages stops once `ldap.max_pending_pages` pages are pending,
+        and is continued from the paged results cookie"""
+        self.source.property_mappings.set(
+            LDAPPropertyMapping.objects.filter(
+                Q(managed__startswith="goauthentik.io/sources/ldap/default")
+                | Q(managed__startswith="goauthentik.io/sources/ldap/ms")
+            )
+        )
+        self.source.property_mappings_group.set(
+            LDAPPropertyMapping.objects.filter(managed="goauthentik.io/sources/ldap/default-name")
+        )
+        self.source.save()
+        connection = MagicMock(return_value=mock_ad_connection(LDAP_PASSWORD))
+        with (
+            patch("authentik.sources.ldap.models.LDAPSource.connection", connection),
+            CONFIG.patch("ldap.page_size", 1),
+            CONFIG.patch("ldap.max_pending_pages", 1),
+        ):
+            with (
+                patch("authentik.sources.ldap.tasks.ldap_sync.apply_async") as sync,
+                patch("authentik.sources.ldap.tasks.ldap_sync_wait.apply_async") as wait,
+            ):
+                self.assertTrue(
+                    ldap_sync_stream(
+                        self.source,
+                        [UserLDAPSynchronizer, GroupLDAPSynchronizer],
+                        [MembershipLDAPSynchronizer],
+                    )
+                )
+            sync.assert_called_once()
+            self.assertEqual(len(cache.keys(f"{CACHE_KEY_PREFIX}*")), 1)
+            state = wait.call_args.args[0][1]
+            self.assertEqual(len(state["pending"]), 1)
+            self.assertIsNotNone(state["searches"][class_to_path(UserLDAPSynchronizer)]["cookie"])
+            cache.delete_many(cache.keys(f"{CACHE_KEY_PREFIX}*"))
+            # All pages are synced when continuing the search one page at a time
+            self.assertTrue(
+                ldap_sync_stream(
+                    self.source,
+                    [UserLDAPSynchronizer, GroupLDAPSynchronizer],
+                    [MembershipLDAPSynchronizer],
+                    inline=True,
+                )
+            )
+        self.assertTrue(User.objects.filter(username="user0_sn").exists())
+        self.assertTrue(Group.objects.filter(name="test-group").exists())
+        self.assertEqual(cache.keys(f"{CACHE_KEY_PREFIX}*"), [])
+
+    def test_tasks_stream_page_timeout(self):
+        """Test that a page task which never recorded its status is treated as failed"""
+        self.source.incremental_sync = True
+        self.source.save()
+        state = {
+            "phases": [],
+            "searches": {},
+            "pending": [[f"{self.source.slug}:users:{generate_id()}", 0]],
+            "marks": {},
+            "incremental": False,
+            "successful": True,
+        }
+        self.assertTrue(ldap_sync_step(self.source, state))
+        self.assertFalse(state["successful"])
+        self.source.refresh_from_db()
+        self.assertNotIn(LAST_FULL_SYNC, self.source.incremental_sync_state)
+
+    def test_tasks_incremental(self):
+        """Test incremental sync state"""
+        self.source.property_mappings.set(
+            LDAPPropertyMapping.objects.filter(
+                Q(managed__startswith="goauthentik.io/sources/ldap/default")
+                | Q(managed__startswith="goauthentik.io/sources/ldap/ms")
+            )
+        )
+        self.source.incremental_sync = True
+        self.source.save()
+        connection = MagicMock(return_value=mock_ad_connection(LDAP_PASSWORD))
+        with patch("authentik.sources.ldap.models.LDAPSource.connection", connection):
+            ldap_sync_single.delay(str(self.source.pk), full=False).get()
+        self.source.refresh_from_db()
+        self.assertIn(LAST_FULL_SYNC, self.source.incremental_sync_state)
+        self.assertFalse(ldap_full_sync_due(self.source))
+
+    def test_incremental_filter(self):
+        """Test search filter for incremental sync"""
+        user_sync = UserLDAPSynchronizer(self.source)
+        user_sync.changed_since = {"usn": 10, "server": "dc1"}
+        self.assertEqual(
+            user_sync._changed_since_filter("(objectClass=person)", "dc1"),
+            "(&(objectClass=person)(uSNChanged>=11))",
+        )
+        # Different domain controller, USNs can't be compared
+        self.assertEqual(
+            user_sync._changed_since_filter("(objectClass=person)", "dc2"),
+            "(objectClass=person)",
+        )
+        user_sync.changed_since = {"timestamp": "20240101000000Z"}
+        self.assertEqual(
+            user_sync._changed_since_filter("(objectClass=person)", None),
+            "(&(objectClass=person)(modifyTimestamp>=20240101000000Z))",
+        )
+        user_sync.high_water_mark = None
+        user_sync._update_timestamp_mark(
+            [
+                {"attributes": {"modifyTimestamp": "20240102000000Z"}},
+                {"attributes": {"modifyTimestamp": ["20240103000000Z"]}},
+                {"attributes": {}},
+            ]
+        )
+        self.assertEqual(user_sync.high_water_mark, {"timestamp": "20240103000000Z"})
+
+    def test_search_attributes(self):
+        """Test attributes fetched for property mappings"""
+        self.source.property_mappings.set(
+            LDAPPropertyMapping.objects.filter(
+                Q(managed__startswith="goauthentik.io/sources/ldap/default")
+                | Q(managed__startswith="goauthentik.io/sources/ldap/ms")
+            )
+        )
+        connection = MagicMock(return_value=mock_ad_connection(LDAP_PASSWORD))
+        with patch("authentik.sources.ldap.models.LDAPSource.connection", connection):
+            attributes = UserLDAPSynchronizer(self.source).get_search_attributes()
+            self.assertIn("sAMAccountName", attributes)
+            self.assertIn("objectSid", attributes)
+            self.assertNotIn(ALL_ATTRIBUTES, attributes)
+            # Dynamic access to `ldap` requires all attributes
+            self.source.property_mappings.add(
+                LDAPPropertyMapping.objects.create(
+                    name=generate_id(),
+                    object_field="attributes.all",
+                    expression="return {key: value for key, value in ldap.items()}",
+                )
+            )
+            self.assertEqual(
+                UserLDAPSynchronizer(self.source).get_search_attributes(), ALL_LDAP_ATTRIBUTES
+            )
+
+    def test_mapping_attributes(self):
+        """Test static analysis of property mappings"""
+        mapping = LDAPPropertyMapping(
+            expression=(
+                "if 'mail' in ldap:\n"
+                "    return ldap['mail']\n"
+                "return list_flatten(ldap.get('sn', ldap.get('cn')))"
+            )
+        )
+        self.assertEqual(get_mapping_attributes([mapping]), {"mail", "sn", "cn"})
+        mapping.expression = "key = 'mail'\nreturn ldap.get(key)"
+        self.assertIsNone(get_mapping_attributes([mapping]))
+
     def test_tasks_openldap(self):
         """Test Scheduled tasks"""
         self.source.object_uniqueness_field = "uid"
@@ -42,6 +42,10 @@ export class LDAPSourceForm extends BaseSourceForm<LDAPSource> {
     propertyMappings?: PaginatedLDAPPropertyMappingList;
 
     async send(data: LDAPSource): Promise<LDAPSource> {
+        data.additionalAttributes = ((data.additionalAttributes as unknown as string) || "")
+            .split(",")
+            .map((attribute) => attribute.trim())
+            .filter((attribute) => attribute !== "");
         if (this.instance) {
             return new SourcesApi(DEFAULT_CONFIG).sourcesLdapPartialUpdate({
                 slug: this.instance.slug,
@@ -158,6 +162,26 @@ export class LDAPSourceForm extends BaseSourceForm<LDAPSource> {
                     <span class="pf-c-switch__label">${msg("Sync groups")}</span>
                 </label>
             </ak-form-element-horizontal>
+            <ak-form-element-horizontal name="incrementalSync">
+                <label class="pf-c-switch">
+                    <input
+                        class="pf-c-switch__input"
+                        type="checkbox"
+                        ?checked=${first(this.instance?.incrementalSync, false)}
+                    />
+                    <span class="pf-c-switch__toggle">
+                        <span class="pf-c-switch__toggle-icon">
+                            <i class="fas fa-check" aria-hidden="true"></i>
+                        </span>
+                    </span>
+                    <span class="pf-c-switch__label">${msg("Incremental sync")}</span>
+                </label>
+                <p class="pf-c-form__helper-text">
+                    ${msg(
+                        "Only sync objects which have been changed since the last sync. A full sync is still done periodically.",
+                    )}
+                </p>
+            </ak-form-element-horizontal>
             <ak-form-group .expanded=${true}>
                 <span slot="header"> ${msg("Connection settings")} </span>
                 <div slot="body" class="pf-c-form">
@@ -479,6 +503,21 @@ export class LDAPSourceForm extends BaseSourceForm<LDAPSource> {
                             ${msg("Field which contains a unique Identifier.")}
                         </p>
                     </ak-form-element-horizontal>
+                    <ak-form-element-horizontal
+                        label=${msg("Additional attributes")}
+                        name="additionalAttributes"
+                    >
+                        <input
+                            type="text"
+                            value="${(this.instance?.additionalAttributes || []).join(", ")}"
+                            class="pf-c-form-control"
+                        />
+                        <p class="pf-c-form__helper-text">
+                            ${msg(
+                                "Comma-separated list of additional attributes to fetch when syncing. Attributes used by property mappings are detected automatically. Add '*' to fetch all attributes.",
+                            )}
+                        </p>
+                    </ak-form-element-horizontal>
                 </div>
             </ak-form-group>`;
     }